@@ -1,4 +1,5 @@
 from django.contrib import admin
+from marketplace.paginators import EstimatedCountPaginator
 from .models import Conversation, Message, Notification
 
 
@@ -12,6 +13,10 @@ class ConversationAdmin(admin.ModelAdmin):
         'product__title', 'buyer__username', 'seller__username'
     ]
     ordering = ['-updated_at']
+    list_select_related = ['product__seller', 'buyer', 'seller']
+    autocomplete_fields = ['product', 'buyer', 'seller']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
@@ -47,6 +52,12 @@ class MessageAdmin(admin.ModelAdmin):
         'conversation__product__title', 'sender__username', 'content'
     ]
     ordering = ['-created_at']
+    list_select_related = [
+        'conversation__product', 'conversation__buyer', 'conversation__seller', 'sender'
+    ]
+    autocomplete_fields = ['conversation', 'sender']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -86,6 +97,10 @@ class NotificationAdmin(admin.ModelAdmin):
         'recipient__username', 'sender__username', 'title', 'message'
     ]
     ordering = ['-created_at']
+    list_select_related = ['recipient']
+    autocomplete_fields = ['recipient', 'sender', 'related_product', 'related_conversation']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_directconversation_directmessage_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='seller_responded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_conversation_seller_responded_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('message', 'New Message'), ('offer', 'New Offer'), ('offer_accepted', 'Offer Accepted'), ('offer_rejected', 'Offer Rejected'), ('offer_expired', 'Offer Expired'), ('product_sold', 'Product Sold'), ('rating', 'New Rating'), ('verification', 'Verification Update')], max_length=20),
+        ),
+    ]
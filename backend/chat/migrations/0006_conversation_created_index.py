@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_notification_offer_expired'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['created_at'], name='conversations_created_idx'),
+        ),
+    ]
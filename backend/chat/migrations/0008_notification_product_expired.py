@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('message', 'New Message'), ('offer', 'New Offer'), ('offer_accepted', 'Offer Accepted'), ('offer_rejected', 'Offer Rejected'), ('offer_expired', 'Offer Expired'), ('product_sold', 'Product Sold'), ('product_expired', 'Product Expired'), ('rating', 'New Rating'), ('verification', 'Verification Update'), ('saved_search', 'Saved Search Match')], max_length=20),
+        ),
+    ]
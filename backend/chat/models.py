@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
-from users.models import User
+from users.models import SellerReputation, User
 from products.models import Product
 
 
@@ -10,6 +10,8 @@ class Conversation(models.Model):
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='buyer_conversations')
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='seller_conversations')
     is_active = models.BooleanField(default=True)
+    # When the seller first replied; drives their response-rate reputation
+    seller_responded_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -17,10 +19,20 @@ class Conversation(models.Model):
         unique_together = ('product', 'buyer', 'seller')
         db_table = 'conversations'
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='conversations_created_idx'),
+        ]
     
     def __str__(self):
         return f"Chat between {self.buyer.username} and {self.seller.username} about {self.product.title}"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                SellerReputation.record_conversation(self.seller_id)
+    
     def get_other_user(self, current_user):
         """Get the other user in the conversation"""
         if current_user == self.buyer:
@@ -64,6 +76,27 @@ class Message(models.Model):
     def __str__(self):
         return f"Message from {self.sender.username} in {self.conversation}"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                self._record_seller_response()
+    
+    def _record_seller_response(self):
+        """Count the seller's first reply in a conversation towards their response rate"""
+        conversation = self.conversation
+        if self.sender_id != conversation.seller_id or conversation.seller_responded_at is not None:
+            return
+        first_reply = Conversation.objects.filter(
+            pk=conversation.pk, seller_responded_at__isnull=True
+        ).update(seller_responded_at=self.created_at)
+        if first_reply:
+            conversation.seller_responded_at = self.created_at
+            SellerReputation.record_response(
+                self.sender_id, (self.created_at - conversation.created_at).total_seconds()
+            )
+    
     def mark_as_read(self):
         self.is_read = True
         self.save(update_fields=['is_read'])
@@ -96,9 +129,13 @@ class Notification(models.Model):
         ('offer', 'New Offer'),
         ('offer_accepted', 'Offer Accepted'),
         ('offer_rejected', 'Offer Rejected'),
+        ('offer_expired', 'Offer Expired'),
         ('product_sold', 'Product Sold'),
+        ('product_expired', 'Product Expired'),
         ('rating', 'New Rating'),
         ('verification', 'Verification Update'),
+        ('saved_search', 'Saved Search Match'),
+        ('report_escalated', 'Report Escalated'),
     ]
     
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
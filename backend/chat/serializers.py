@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Conversation, Message, Notification, DirectConversation, DirectMessage
-from users.serializers import UserProfileSerializer
+from users.serializers import public_profile
 from products.serializers import ProductListSerializer
 
 
@@ -144,8 +144,8 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
     
     def get_other_user(self, obj):
         current_user = self.context['request'].user
-        other_user = obj.get_other_user(current_user)
-        return UserProfileSerializer(other_user, context=self.context).data
+        other_user_id = obj.seller_id if current_user.id == obj.buyer_id else obj.buyer_id
+        return public_profile(other_user_id, self.context['request'])
 
 
 class ConversationCreateSerializer(serializers.ModelSerializer):
@@ -224,5 +224,5 @@ class DirectConversationDetailSerializer(serializers.ModelSerializer):
     
     def get_other_user(self, obj):
         current_user = self.context['request'].user
-        other_user = obj.get_other_user(current_user)
-        return UserProfileSerializer(other_user).data
\ No newline at end of file
+        other_user_id = obj.participant2_id if current_user.id == obj.participant1_id else obj.participant1_id
+        return public_profile(other_user_id, self.context['request'])
\ No newline at end of file
@@ -1,3 +1,23 @@
-from django.test import TestCase
+from marketplace.factories import AdminChangelistQueryTestCase
+from .models import Conversation, Message, Notification
 
-# Create your tests here.
+
+class AdminChangelistQueryTests(AdminChangelistQueryTestCase):
+    app_label = 'chat'
+
+    @classmethod
+    def create_row(cls, index, seller, buyer, product):
+        conversation = Conversation.objects.create(product=product, buyer=buyer, seller=seller)
+        Message.objects.create(conversation=conversation, sender=buyer, content='Is it available?')
+        Notification.objects.create(
+            recipient=seller, sender=buyer, notification_type='message', title='New message', message='Hi'
+        )
+
+    def test_conversation_changelist(self):
+        self.assertChangelistQueries('conversation', 4)
+
+    def test_message_changelist(self):
+        self.assertChangelistQueries('message', 4)
+
+    def test_notification_changelist(self):
+        self.assertChangelistQueries('notification', 4)
@@ -78,6 +78,7 @@ class MessageCreateView(generics.CreateAPIView):
     """Send a message in a conversation"""
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'message'
     
     def perform_create(self, serializer):
         conversation = serializer.validated_data['conversation']
@@ -192,9 +193,8 @@ def unread_counts(request):
     # Count unread messages
     unread_messages = Message.objects.filter(
         Q(conversation__buyer=user) | Q(conversation__seller=user),
-        sender__ne=user,
         is_read=False
-    ).count()
+    ).exclude(sender=user).count()
     
     # Count unread notifications
     unread_notifications = Notification.objects.filter(
@@ -363,6 +363,7 @@ class DirectMessageCreateView(generics.CreateAPIView):
     """Send a direct message"""
     serializer_class = DirectMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'message'
     
     def perform_create(self, serializer):
         conversation = serializer.validated_data['conversation']
@@ -0,0 +1,255 @@
+"""
+In-process API benchmark. Scenarios drive the main endpoints through
+Django's test client, so a timing is the whole server-side cost of a
+request (middleware, JWT authentication, throttling, view, serialization)
+without network or server overhead. Queries are counted per request with a
+connection execute wrapper.
+
+Runs are comparable between commits: actors and targets are drawn from
+seeded random streams over a dataset made by marketplace.loadgen, and every
+write happens inside one transaction that is rolled back at the end, so
+each run starts from the same data. Write latencies therefore exclude the
+cost of committing.
+"""
+import json
+import random
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from marketplace.loadgen import BUYER_LINES, CATALOG, HOT_PRODUCT_EXPONENT, SELLER_EXPONENT, SELLER_LINES, power_law
+
+# Actors and targets drawn from the dataset
+ACTORS = 500
+SELLERS = 200
+CONVERSATIONS = 2000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Actors:
+    """Who makes the requests and what they touch, loaded once from the dataset"""
+
+    def __init__(self, prefix, seed):
+        from chat.models import Conversation
+        from products.models import Product
+        from users.models import User
+        rng = random.Random(f'{seed}:actors')
+        users = User.objects.filter(username__startswith=prefix)
+
+        buyers = list(users.filter(user_type='buyer').order_by('id').values_list('id', flat=True))
+        self.buyers = rng.sample(buyers, min(ACTORS, len(buyers)))
+        # Biggest shops first, so power-law picks favour them
+        self.sellers = list(
+            Product.objects.filter(seller__in=users).values('seller').annotate(listings=Count('id'))
+            .order_by('-listings', 'seller').values_list('seller', flat=True)[:SELLERS]
+        )
+        # (id, seller_id, price) of visible listings, most viewed first
+        self.products = list(
+            Product.objects.filter(seller__in=users, is_active=True, status='active', is_verified=True)
+            .order_by('-views_count', 'id').values_list('id', 'seller_id', 'price')
+        )
+        conversation_ids = list(
+            Conversation.objects.filter(buyer__in=users).order_by('id').values_list('id', flat=True)
+        )
+        sample = rng.sample(conversation_ids, min(CONVERSATIONS, len(conversation_ids)))
+        self.conversations = list(
+            Conversation.objects.filter(id__in=sample).order_by('id').values_list('id', 'buyer_id', 'seller_id')
+        )
+        self.words = sorted({brand for _, leaves in CATALOG for _, brands, _ in leaves for brand in brands})
+        if not (self.buyers and self.sellers and self.products and self.conversations):
+            raise ValueError(f"The {prefix}* dataset has no buyers, sellers, listings or conversations to use")
+
+    def hot_product(self, rng):
+        return self.products[power_law(rng, len(self.products), HOT_PRODUCT_EXPONENT)]
+
+    def participant(self, rng):
+        conversation_id, buyer_id, seller_id = rng.choice(self.conversations)
+        return conversation_id, rng.choice((buyer_id, seller_id))
+
+
+# Each scenario turns (actors, rng) into (user id or None for anonymous, path, JSON body or None).
+# Setup done there (such as creating the order to approve) is not timed or counted.
+
+def _product_list(actors, rng):
+    return None, f'/api/products/?page={1 + power_law(rng, 10, 1.5)}', None
+
+
+def _product_search(actors, rng):
+    return None, f'/api/products/search/?query={rng.choice(actors.words)}', None
+
+
+def _product_detail(actors, rng):
+    product_id, _, _ = actors.hot_product(rng)
+    return None, f'/api/products/{product_id}/', None
+
+
+def _favorite_toggle(actors, rng):
+    product_id, _, _ = actors.hot_product(rng)
+    return rng.choice(actors.buyers), f'/api/products/{product_id}/toggle-favorite/', {}
+
+
+def _offer_create(actors, rng):
+    product_id, _, price = rng.choice(actors.products)
+    amount = (price * Decimal(rng.choice(('0.7', '0.8', '0.9')))).quantize(Decimal('0.01'))
+    return rng.choice(actors.buyers), '/api/products/offers/create/', {'product': product_id, 'amount': str(amount)}
+
+
+def _shipping(rng):
+    return {
+        'shipping_address': f'{rng.randrange(1, 200)} Market Street', 'shipping_city': 'Berlin',
+        'shipping_country': 'Germany', 'shipping_postal_code': '10115', 'shipping_phone': '+493012345678',
+        'shipping_method': rng.choice(('post', 'pickup', 'delivery')),
+    }
+
+
+def _order_create(actors, rng):
+    product_id, _, _ = rng.choice(actors.products)
+    return rng.choice(actors.buyers), '/api/orders/create/', {'product': product_id, **_shipping(rng)}
+
+
+def _order_approve(actors, rng):
+    from orders.models import Order
+    product_id, seller_id, price = rng.choice(actors.products)
+    shipping = _shipping(rng)
+    order = Order.objects.create(
+        buyer_id=rng.choice(actors.buyers), seller_id=seller_id, product_id=product_id,
+        unit_price=price, total_amount=price, **shipping,
+    )
+    return seller_id, f'/api/orders/{order.pk}/approve/', {'action': 'approve'}
+
+
+def _chat_send(actors, rng):
+    conversation_id, user_id = actors.participant(rng)
+    return user_id, '/api/chat/messages/create/', {
+        'conversation': conversation_id, 'content': rng.choice(BUYER_LINES + SELLER_LINES),
+    }
+
+
+def _inbox(actors, rng):
+    _, user_id = actors.participant(rng)
+    return user_id, '/api/chat/conversations/', None
+
+
+def _unread_counts(actors, rng):
+    _, user_id = actors.participant(rng)
+    return user_id, '/api/chat/unread-counts/', None
+
+
+def _user_dashboard(actors, rng):
+    return rng.choice(actors.buyers), '/api/users/dashboard/', None
+
+
+def _seller_dashboard(actors, rng):
+    return actors.sellers[power_law(rng, len(actors.sellers), SELLER_EXPONENT)], '/api/users/seller-dashboard/', None
+
+
+SCENARIOS = {
+    'product_list': ('GET', _product_list),
+    'product_search': ('GET', _product_search),
+    'product_detail': ('GET', _product_detail),
+    'favorite_toggle': ('POST', _favorite_toggle),
+    'offer_create': ('POST', _offer_create),
+    'order_create': ('POST', _order_create),
+    'order_approve': ('POST', _order_approve),
+    'chat_send': ('POST', _chat_send),
+    'inbox': ('GET', _inbox),
+    'unread_counts': ('GET', _unread_counts),
+    'user_dashboard': ('GET', _user_dashboard),
+    'seller_dashboard': ('GET', _seller_dashboard),
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run(actors, names, iterations, warmup, seed, progress=None):
+    """Time `iterations` requests of each named scenario after `warmup` untimed ones"""
+    from users.models import User
+    # Record server errors as 500s instead of aborting the run
+    client = Client(raise_request_exception=False)
+    tokens = {}
+    counter = QueryCounter()
+    results = {}
+
+    def authorization(user_id):
+        if user_id not in tokens:
+            tokens[user_id] = f'Bearer {AccessToken.for_user(User(pk=user_id))}'
+        return {'HTTP_AUTHORIZATION': tokens[user_id]}
+
+    with connection.execute_wrapper(counter):
+        for name in names:
+            method, build = SCENARIOS[name]
+            rng = random.Random(f'{seed}:{name}')
+            latencies, queries, statuses = [], [], Counter()
+            for attempt in range(warmup + iterations):
+                user_id, path, body = build(actors, rng)
+                headers = authorization(user_id) if user_id else {}
+                counter.count = 0
+                start = time.perf_counter()
+                if method == 'GET':
+                    response = client.get(path, **headers)
+                else:
+                    response = client.post(path, json.dumps(body), content_type='application/json', **headers)
+                elapsed = time.perf_counter() - start
+                if attempt >= warmup:
+                    latencies.append(elapsed * 1000)
+                    queries.append(counter.count)
+                    statuses[response.status_code] += 1
+            results[name] = summarize(method, latencies, queries, statuses)
+            if progress:
+                progress(name, results[name])
+    return results
+
+
+def summarize(method, latencies, queries, statuses):
+    return {
+        'method': method,
+        'requests': len(latencies),
+        'errors': sum(count for code, count in statuses.items() if code >= 400),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries': {'mean': round(sum(queries) / len(queries), 2), 'max': max(queries)},
+        # One client in one process: requests per second of server time
+        'throughput_rps': round(len(latencies) / (sum(latencies) / 1000), 1),
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    (endpoint, field, before, after, regressed) for each endpoint in both
+    runs. Latency regresses when p95 grows by more than `threshold` (a
+    fraction); queries regress when the mean grows at all.
+    """
+    rows = []
+    for name, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        for field in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'][field], after['latency_ms'][field]
+            rows.append((name, field, old, new, field == 'p95' and new > old * (1 + threshold)))
+        old, new = before['queries']['mean'], after['queries']['mean']
+        rows.append((name, 'queries', old, new, new > old))
+    return rows
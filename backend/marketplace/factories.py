@@ -0,0 +1,87 @@
+"""
+Fixtures shared by the app test suites: minimal users, listings and orders,
+and a base class for admin changelist query budgets.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+PASSWORD = 'password123'
+
+
+def make_user(username, **fields):
+    from users.models import User
+    return User.objects.create_user(username, f'{username}@example.com', PASSWORD, **fields)
+
+
+def make_admin():
+    """The marketplace admin account that users.views.IsAdminUser recognises"""
+    return make_user('Amirreza938938', user_type='admin')
+
+
+def make_category(name='Phones', **fields):
+    from products.models import Category
+    return Category.objects.get_or_create(name=name, defaults=fields)[0]
+
+
+def make_product(seller, category=None, **fields):
+    """A listing that is live unless `status`/`is_verified` say otherwise"""
+    from products.models import Product
+    values = {
+        'title': 'Phone', 'description': 'Works', 'condition': 'good', 'price': Decimal('100.00'),
+        'location': 'Centre', 'city': 'Berlin', 'country': 'DE', 'status': 'active', 'is_verified': True,
+    }
+    values.update(fields)
+    return Product.objects.create(seller=seller, category=category or make_category(), **values)
+
+
+def make_order(buyer, product, **fields):
+    from orders.models import Order
+    values = {
+        'unit_price': product.price, 'total_amount': product.price, 'shipping_address': 'Main St 1',
+        'shipping_city': 'Berlin', 'shipping_country': 'DE', 'shipping_postal_code': '10115',
+        'shipping_phone': '123', 'shipping_method': 'post',
+    }
+    values.update(fields)
+    return Order.objects.create(buyer=buyer, seller=product.seller, product=product, **values)
+
+
+class CacheClearingTestCase(TestCase):
+    """The cache outlives test transactions; start every test from an empty one"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+class AdminChangelistQueryTestCase(TestCase):
+    """Changelist pages run a fixed number of queries however many rows they show"""
+    ROWS = 5
+    app_label = None
+
+    @classmethod
+    def setUpTestData(cls):
+        from users.models import User
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', PASSWORD)
+        for index in range(cls.ROWS):
+            seller = make_user(f'seller{index}', user_type='seller')
+            buyer = make_user(f'buyer{index}')
+            product = make_product(seller, make_category(f'Category {index}'), title=f'Phone {index}')
+            cls.create_row(index, seller, buyer, product)
+
+    @classmethod
+    def create_row(cls, index, seller, buyer, product):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertChangelistQueries(self, model_name, budget):
+        with self.assertNumQueries(budget):
+            response = self.client.get(reverse(f'admin:{self.app_label}_{model_name}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, self.ROWS)
+        return response
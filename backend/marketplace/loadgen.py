@@ -0,0 +1,648 @@
+"""
+Synthetic marketplace data for load testing.
+
+generate() fills the database with users, categories, listings with
+images, favorites, offers, conversations with messages, orders and
+notifications, sized by a LoadPlan. Everything derives from the plan's
+seed: each table is generated in fixed-size chunks with their own random
+stream, so a seed gives the same rows whether one process or many do the
+work.
+
+The data is skewed the way marketplace traffic is. A few sellers own most
+listings (power-law shop sizes), a few listings draw most views, favorites,
+offers and chats (hot products), and buyer activity is long-tailed. Each
+sold listing has one buyer, drawn up front, who alone holds its accepted
+offer and live order; everyone else's orders for it are cancelled.
+
+Rows go in with bulk_create, so model save() hooks do not run. generate()
+recomputes the counters they would have kept (favorites, offer summaries,
+seller reputation) and rebuilds search suggestions and popularity
+rankings. No network access is needed: every image points at one
+placeholder file in MEDIA_ROOT.
+"""
+import math
+import multiprocessing
+import random
+import struct
+import zlib
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+# Rows per users/products task and users per activity task. Chunk
+# boundaries are part of the data's identity: changing them changes the rows.
+CHUNK_SIZE = 5000
+ACTIVITY_CHUNK_SIZE = 1000
+BATCH_SIZE = 5000
+
+PASSWORD = 'password123'
+PLACEHOLDER_IMAGE = 'product_images/load-placeholder.png'
+
+# Power-law exponents. Below 1, rank k gets a share of about k ** -exponent:
+# with 100k sellers the median one lists a few items and the largest thousands.
+SELLER_EXPONENT = 0.8
+HOT_PRODUCT_EXPONENT = 0.9
+CATEGORY_EXPONENT = 0.8
+CITY_EXPONENT = 0.9
+# Pareto shape of per-buyer activity (mean 1 after scaling)
+ACTIVITY_SHAPE = 1.5
+MAX_ACTIONS_PER_USER = 200
+MAX_MESSAGES_PER_CONVERSATION = 60
+
+CITIES = [
+    ('Berlin', 'Germany', 52.520, 13.405), ('Hamburg', 'Germany', 53.551, 9.994),
+    ('Munich', 'Germany', 48.137, 11.576), ('Cologne', 'Germany', 50.938, 6.960),
+    ('Frankfurt', 'Germany', 50.110, 8.682), ('Stuttgart', 'Germany', 48.776, 9.183),
+    ('Vienna', 'Austria', 48.208, 16.374), ('Zurich', 'Switzerland', 47.377, 8.542),
+    ('Amsterdam', 'Netherlands', 52.368, 4.904), ('Paris', 'France', 48.857, 2.352),
+    ('Lyon', 'France', 45.764, 4.836), ('Madrid', 'Spain', 40.417, -3.704),
+    ('Barcelona', 'Spain', 41.385, 2.173), ('Milan', 'Italy', 45.464, 9.190),
+    ('Warsaw', 'Poland', 52.230, 21.012), ('Prague', 'Czechia', 50.076, 14.438),
+]
+
+# (top-level category, [(subcategory, brands, items)])
+CATALOG = [
+    ('Electronics', [
+        ('Phones', ('Apple', 'Samsung', 'Google', 'Xiaomi', 'Nokia'), ('phone', 'smartphone', 'charger', 'phone case')),
+        ('Laptops', ('Apple', 'Dell', 'Lenovo', 'HP', 'Asus'), ('laptop', 'notebook', 'ultrabook', 'docking station')),
+        ('Audio', ('Sony', 'Bose', 'JBL', 'Sennheiser'), ('headphones', 'speaker', 'soundbar', 'earbuds')),
+        ('Cameras', ('Canon', 'Nikon', 'Fujifilm', 'GoPro'), ('camera', 'lens', 'tripod', 'action camera')),
+        ('Gaming', ('Sony', 'Nintendo', 'Microsoft', 'Logitech'), ('console', 'controller', 'gaming headset', 'game')),
+    ]),
+    ('Home & Garden', [
+        ('Furniture', ('Ikea', 'Muji', 'Vitra', 'Hay'), ('sofa', 'table', 'chair', 'bookshelf', 'wardrobe')),
+        ('Kitchen', ('Bosch', 'Philips', 'DeLonghi', 'WMF'), ('coffee machine', 'blender', 'kettle', 'pan set')),
+        ('Garden', ('Gardena', 'Bosch', 'Weber', 'Makita'), ('lawn mower', 'grill', 'hose', 'hedge trimmer')),
+    ]),
+    ('Clothing', [
+        ('Jackets', ('Patagonia', 'Zara', 'Levis', 'North Face'), ('jacket', 'parka', 'raincoat', 'blazer')),
+        ('Shoes', ('Nike', 'Adidas', 'Puma', 'Birkenstock'), ('sneakers', 'boots', 'running shoes', 'sandals')),
+        ('Fashion Accessories', ('Ray-Ban', 'Fossil', 'Eastpak', 'Casio'), ('watch', 'sunglasses', 'backpack', 'belt')),
+    ]),
+    ('Sports & Outdoors', [
+        ('Bikes', ('Trek', 'Cube', 'Canyon', 'Specialized'), ('road bike', 'mountain bike', 'helmet', 'bike lock')),
+        ('Camping', ('Vaude', 'Deuter', 'Coleman', 'MSR'), ('tent', 'sleeping bag', 'backpack', 'camping stove')),
+        ('Fitness', ('Decathlon', 'Kettler', 'Reebok', 'Garmin'), ('dumbbells', 'yoga mat', 'treadmill', 'fitness watch')),
+    ]),
+    ('Books & Media', [
+        ('Books', ('Penguin', 'OReilly', 'Springer', 'Taschen'), ('novel', 'cookbook', 'textbook', 'art book')),
+        ('Vinyl', ('Blue Note', 'Motown', 'Columbia', 'Decca'), ('record', 'LP', 'box set', 'turntable')),
+    ]),
+    ('Automotive', [
+        ('Car Parts', ('Bosch', 'Continental', 'Brembo', 'Valeo'), ('brake pads', 'headlight', 'battery', 'wiper set')),
+        ('Tyres', ('Michelin', 'Continental', 'Pirelli', 'Goodyear'), ('winter tyres', 'summer tyres', 'rims', 'tyre set')),
+        ('Car Accessories', ('Thule', 'Garmin', 'Nextbase', 'Osram'), ('roof box', 'dash cam', 'navigation unit', 'phone holder')),
+    ]),
+]
+LEAVES = [leaf for _, leaves in CATALOG for leaf in leaves]
+
+ADJECTIVES = (
+    'vintage', 'compact', 'wireless', 'large', 'small', 'black', 'white', 'red', 'refurbished',
+    'classic', 'portable', 'premium', 'original', 'boxed', 'lightweight', 'sturdy',
+)
+# (condition, cumulative share)
+CONDITIONS = (('new', 0.10), ('like_new', 0.35), ('good', 0.70), ('fair', 0.88), ('poor', 0.96), ('needs_repair', 1.0))
+CONDITION_PHRASES = {
+    'new': 'Brand new, never used, still in the original packaging.',
+    'like_new': 'Used a handful of times and looks like new.',
+    'good': 'In good condition with light signs of use.',
+    'fair': 'Works fine, some visible wear.',
+    'poor': 'Heavily used but working.',
+    'needs_repair': 'Needs a repair, sold as is.',
+}
+SHIPPING_OPTIONS = (['post'], ['pickup'], ['post', 'pickup'], ['post', 'delivery'], ['delivery'])
+FIRST_NAMES = ('Anna', 'Ben', 'Clara', 'David', 'Elif', 'Felix', 'Greta', 'Hugo', 'Ines', 'Jonas', 'Karla', 'Luca', 'Mia', 'Noah', 'Olga', 'Paul')
+LAST_NAMES = ('Schmidt', 'Meyer', 'Rossi', 'Dubois', 'Novak', 'Garcia', 'Jansen', 'Kowalski', 'Weber', 'Fischer', 'Moreau', 'Bianchi')
+BUYER_LINES = (
+    'Hi, is this still available?', 'Would you take a bit less?', 'Can I pick it up this weekend?',
+    'Does it come with the original box?', 'Could you ship it to me?', 'Great, I will take it.',
+)
+SELLER_LINES = (
+    'Yes, still available.', 'I can do a small discount.', 'Saturday works for me.',
+    'It comes with everything shown in the photos.', 'Shipping is possible, I will send you the details.',
+    'Thanks, it is yours.',
+)
+
+# Product status mix: (status, cumulative share)
+STATUSES = (('active', 0.80), ('sold', 0.88), ('expired', 0.94), ('pending_verification', 0.98), ('inactive', 1.0))
+ORDER_STATUSES = (
+    ('pending', 0.15), ('approved', 0.25), ('processing', 0.35), ('shipped', 0.55),
+    ('delivered', 0.90), ('cancelled', 0.95), ('rejected', 1.0),
+)
+# The order that bought a sold listing got at least as far as approval
+SALE_STATUSES = (('approved', 0.05), ('processing', 0.10), ('shipped', 0.25), ('delivered', 1.0))
+
+
+def power_law(rng, n, exponent):
+    """An index in [0, n), index k drawn with weight about (k + 1) ** -exponent"""
+    a = 1.0 - exponent
+    x = (((n + 1) ** a - 1) * rng.random() + 1) ** (1 / a)
+    return min(int(x), n) - 1
+
+
+def _pick(rng, cumulative):
+    """A value from ((value, cumulative share), ...)"""
+    draw = rng.random()
+    for value, share in cumulative:
+        if draw < share:
+            return value
+    return cumulative[-1][0]
+
+
+def _stride(n):
+    """A step coprime with n, so (rank * step) % n visits every index once"""
+    step = int(n * 0.6180339887) | 1
+    while math.gcd(step, n) != 1:
+        step += 1
+    return step
+
+
+def _placeholder_png():
+    """A 1x1 grey PNG"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    header = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b'\x00\x80')) + chunk(b'IEND', b'')
+
+
+class LoadPlan:
+    """
+    How much to generate, and the per-product facts every task needs
+    (seller, category, price, age, status), drawn once up front by prepare().
+    """
+
+    def __init__(self, seed=42, users=1_000_000, seller_share=0.1, products=1_000_000, favorites=3_000_000,
+                 offers=1_000_000, conversations=1_000_000, orders=300_000, days=90, prefix='load'):
+        if users < 2 or products < 1:
+            raise ValueError("Need at least 2 users and 1 product")
+        self.seed = seed
+        self.users = users
+        self.sellers = min(users - 1, max(1, round(users * seller_share)))
+        self.products = products
+        self.favorites = favorites
+        self.offers = offers
+        self.conversations = conversations
+        self.orders = orders
+        self.days = days
+        self.prefix = prefix
+
+    def rng(self, *stream):
+        # String seeds are hashed with SHA-512, so streams are stable across processes and runs
+        return random.Random(':'.join(map(str, (self.seed, *stream))))
+
+    def user_type(self, index):
+        if index >= self.sellers:
+            return 'buyer'
+        return 'both' if index % 2 else 'seller'
+
+    def is_buyer(self, index):
+        return self.user_type(index) != 'seller'
+
+    def user_id(self, index):
+        return self.user_base + 1 + index
+
+    def product_id(self, index):
+        return self.product_base + 1 + index
+
+    def hot_product(self, rng):
+        """A product index, hot ones far more often"""
+        return power_law(rng, self.products, HOT_PRODUCT_EXPONENT) * self.hot_step % self.products
+
+    def hot_rank(self, index):
+        return index * self.hot_inverse % self.products
+
+    def ago(self, seconds):
+        return self.now - timedelta(seconds=seconds)
+
+    def prepare(self):
+        from products.models import Product
+        from users.models import User
+        self.now = timezone.now()
+        self.span = self.days * 24 * 60 * 60
+        self.user_base = User.objects.aggregate(top=Max('pk'))['top'] or 0
+        self.product_base = Product.objects.aggregate(top=Max('pk'))['top'] or 0
+        self.password = make_password(PASSWORD)
+        self.category_ids = _categories()
+        self.hot_step = _stride(self.products)
+        self.hot_inverse = pow(self.hot_step, -1, self.products) if self.products > 1 else 0
+
+        rng = self.rng('sellers')
+        self.seller_city = bytes(power_law(rng, len(CITIES), CITY_EXPONENT) for _ in range(self.sellers))
+
+        rng = self.rng('products')
+        self.seller_of = array('l')
+        self.leaf_of = array('H')
+        self.price_of = array('q')
+        self.age_of = array('d')
+        self.status_of = []
+        for _ in range(self.products):
+            self.seller_of.append(power_law(rng, self.sellers, SELLER_EXPONENT))
+            leaf = power_law(rng, len(LEAVES), CATEGORY_EXPONENT)
+            self.leaf_of.append(leaf)
+            # Log-normal prices, a few hundred on average, dearer in the first (electronics) leaves
+            self.price_of.append(max(100, round(rng.lognormvariate(3.8 + (leaf < 5), 1.1) * 100)))
+            status = _pick(rng, STATUSES)
+            # Listings still waiting for review are recent; the rest skew recent too
+            age = rng.random() * 3 * 24 * 60 * 60 if status == 'pending_verification' else self.span * rng.random() ** 1.5
+            self.age_of.append(age)
+            self.status_of.append(status)
+
+        # Each sold listing went to one buyer, drawn here so every activity chunk agrees on who
+        rng = self.rng('sales')
+        self.purchases = {}
+        for index, status in enumerate(self.status_of):
+            if status != 'sold':
+                continue
+            buyer = rng.randrange(self.users)
+            while not self.is_buyer(buyer) or buyer == self.seller_of[index]:
+                buyer = rng.randrange(self.users)
+            self.purchases.setdefault(buyer, []).append(index)
+        sales = sum(map(len, self.purchases.values()))
+
+        buyers = sum(1 for index in range(self.users) if self.is_buyer(index))
+        self.rates = {
+            'favorites': self.favorites / buyers, 'offers': self.offers / buyers,
+            'conversations': self.conversations / buyers, 'orders': max(0, self.orders - sales) / buyers,
+        }
+
+    def is_visible(self, index):
+        return self.status_of[index] == 'active'
+
+
+def _categories():
+    """Ids of the leaf categories in LEAVES order, creating the catalog where missing"""
+    from products.models import Category
+    ids = {}
+    for top, leaves in CATALOG:
+        parent = Category.objects.filter(name=top).first() or Category.objects.create(name=top)
+        for name, _, _ in leaves:
+            leaf = Category.objects.filter(name=name).first() or Category.objects.create(name=name, parent=parent)
+            ids[name] = leaf.pk
+    return [ids[name] for name, _, _ in LEAVES]
+
+
+_TIMESTAMPED = (
+    ('users', 'User'), ('products', 'Product'), ('products', 'ProductImage'), ('products', 'Favorite'),
+    ('products', 'Offer'), ('chat', 'Conversation'), ('chat', 'Message'), ('chat', 'Notification'),
+    ('orders', 'Order'), ('orders', 'OrderStatus'),
+)
+
+
+@contextmanager
+def _explicit_timestamps():
+    """Let bulk_create keep the generated created_at/updated_at instead of stamping now"""
+    fields = [
+        field for label in _TIMESTAMPED for field in apps.get_model(*label)._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _users_chunk(plan, chunk):
+    from users.models import User
+    rng = plan.rng('users', chunk)
+    rows = []
+    for index in range(chunk * CHUNK_SIZE, min(plan.users, (chunk + 1) * CHUNK_SIZE)):
+        user_type = plan.user_type(index)
+        seller = user_type != 'buyer'
+        city, country, _, _ = CITIES[plan.seller_city[index] if seller else power_law(rng, len(CITIES), CITY_EXPONENT)]
+        # Everyone joined before the oldest generated listing
+        joined = plan.ago(plan.span + rng.random() * plan.span)
+        username = f'{plan.prefix}{index}'
+        rows.append(User(
+            id=plan.user_id(index), username=username, email=f'{username}@example.com', password=plan.password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), user_type=user_type,
+            city=city, country=country, phone_number=f'+49{rng.randrange(10 ** 9, 10 ** 10)}',
+            verification_status='verified' if seller else 'not_required', account_approved=True,
+            verification_date=joined if seller else None, is_active_seller=seller,
+            date_joined=joined, created_at=joined, updated_at=joined,
+        ))
+    User.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return Counter(users=len(rows))
+
+
+def _products_chunk(plan, chunk):
+    from products import geo
+    from products.models import Product, ProductImage
+    rng = plan.rng('products', chunk)
+    products, images = [], []
+    listing_days = settings.PRODUCT_LISTING_DAYS
+    for index in range(chunk * CHUNK_SIZE, min(plan.products, (chunk + 1) * CHUNK_SIZE)):
+        seller = plan.seller_of[index]
+        _, brands, items = LEAVES[plan.leaf_of[index]]
+        brand, item, adjective = rng.choice(brands), rng.choice(items), rng.choice(ADJECTIVES)
+        model = f'{brand[:2].upper()}-{rng.randrange(100, 10000)}'
+        condition = _pick(rng, CONDITIONS)
+        status = plan.status_of[index]
+        price = Decimal(plan.price_of[index]) / 100
+        created = plan.ago(plan.age_of[index])
+
+        # Listings are placed around their seller's home city
+        city, country, latitude, longitude = CITIES[plan.seller_city[seller]]
+        located = rng.random() < 0.9
+        latitude = round(latitude + rng.gauss(0, 0.08), 6) if located else None
+        longitude = round(longitude + rng.gauss(0, 0.12), 6) if located else None
+
+        verified = status in ('active', 'sold', 'expired')
+        verified_at = created + timedelta(seconds=rng.random() * 24 * 60 * 60) if verified else None
+        if status == 'active':
+            # Older listings are still up because their sellers renewed them
+            expires_at = plan.now + timedelta(days=1 + rng.random() * (listing_days - 1))
+        elif status == 'expired':
+            expires_at = min(verified_at + timedelta(days=listing_days), plan.now - timedelta(seconds=rng.random() * 24 * 60 * 60))
+        elif verified:
+            expires_at = verified_at + timedelta(days=listing_days)
+        else:
+            expires_at = None
+
+        products.append(Product(
+            id=plan.product_id(index), seller_id=plan.user_id(seller), category_id=plan.category_ids[plan.leaf_of[index]],
+            title=f'{adjective.capitalize()} {brand} {item} {model}',
+            description=(
+                f"{CONDITION_PHRASES[condition]} {brand} {item}, {adjective}, model {model}. "
+                f"{rng.choice(('Smoke-free home.', 'Receipt available.', 'Collection preferred.', 'Fast shipping.'))}"
+            ),
+            condition=condition, brand=brand, model=model, price=price,
+            original_price=(price * Decimal(rng.choice(('1.2', '1.5', '2.0')))).quantize(Decimal('0.01')) if rng.random() < 0.4 else None,
+            is_negotiable=rng.random() < 0.7, location=f'{rng.randrange(1, 200)} Main Street', city=city, country=country,
+            latitude=None if latitude is None else Decimal(str(latitude)),
+            longitude=None if longitude is None else Decimal(str(longitude)),
+            geohash=geo.encode(latitude, longitude) if located else None,
+            shipping_options=rng.choice(SHIPPING_OPTIONS), shipping_cost=Decimal(rng.choice((0, 399, 499, 699, 999))) / 100,
+            status=status, is_active=status != 'inactive', is_featured=rng.random() < 0.01,
+            is_verified=verified, verified_at=verified_at,
+            rejection_reason='Listing does not meet the guidelines' if status == 'inactive' else None,
+            views_count=int(5 * (plan.products / (plan.hot_rank(index) + 1)) ** 0.6 * rng.random() * 2),
+            created_at=created, updated_at=verified_at or created, expires_at=expires_at,
+        ))
+        for position in range(rng.choice((1, 1, 2, 3))):
+            images.append(ProductImage(
+                product_id=plan.product_id(index), image=PLACEHOLDER_IMAGE, is_main=position == 0,
+                alt_text=f'{brand} {item}', created_at=created,
+            ))
+    with transaction.atomic():
+        Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+        ProductImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+    return Counter(products=len(products), images=len(images))
+
+
+def _actions(plan, rng, kind, weight):
+    """How many actions of a kind a buyer of the given activity weight takes"""
+    expected = plan.rates[kind] * weight
+    return min(MAX_ACTIONS_PER_USER, int(expected) + (rng.random() < expected % 1))
+
+
+def _distinct_products(plan, rng, count, buyer_id, accept):
+    """Up to `count` different hot products, not the buyer's own, passing accept(index)"""
+    chosen = []
+    seen = set()
+    for _ in range(count * 4):
+        if len(chosen) == count:
+            break
+        index = plan.hot_product(rng)
+        if index in seen or plan.user_id(plan.seller_of[index]) == buyer_id or not accept(index):
+            continue
+        seen.add(index)
+        chosen.append(index)
+    return chosen
+
+
+def _after(plan, rng, index, within=None):
+    """A moment between the product's listing and now, or within the last `within` seconds"""
+    age = plan.age_of[index]
+    return plan.ago(rng.random() * min(age, within or age))
+
+
+def _activity_chunk(plan, chunk):
+    from chat.models import Conversation, Message, Notification
+    from orders.models import Order, OrderStatus
+    from products.models import Favorite, Offer
+    rng = plan.rng('activity', chunk)
+    favorites, offers, conversations, threads, orders, statuses, notifications = [], [], [], [], [], [], []
+    offer_hours = settings.OFFER_EXPIRY_HOURS
+
+    for user in range(chunk * ACTIVITY_CHUNK_SIZE, min(plan.users, (chunk + 1) * ACTIVITY_CHUNK_SIZE)):
+        if not plan.is_buyer(user):
+            continue
+        buyer_id = plan.user_id(user)
+        weight = rng.paretovariate(ACTIVITY_SHAPE) * (ACTIVITY_SHAPE - 1) / ACTIVITY_SHAPE
+        city = CITIES[power_law(rng, len(CITIES), CITY_EXPONENT)]
+
+        for index in _distinct_products(plan, rng, _actions(plan, rng, 'favorites', weight), buyer_id, plan.is_visible):
+            favorites.append(Favorite(user_id=buyer_id, product_id=plan.product_id(index), created_at=_after(plan, rng, index)))
+
+        # Listings this buyer bought; only they hold its accepted offer and live order
+        purchases = plan.purchases.get(user, [])
+
+        offered = _distinct_products(plan, rng, _actions(plan, rng, 'offers', weight), buyer_id,
+                                     lambda index: plan.status_of[index] in ('active', 'sold') and index not in purchases)
+        # About a third of sales went through an offer
+        offered += [index for index in purchases if rng.random() < 0.3]
+        for index in offered:
+            price = plan.price_of[index]
+            amount = Decimal(max(100, round(price * rng.uniform(0.6, 0.98)))) / 100
+            if index in purchases:
+                status = 'accepted'
+                created = _after(plan, rng, index)
+            elif plan.is_visible(index) and rng.random() < 0.4:
+                status = 'pending'
+                created = _after(plan, rng, index, within=offer_hours * 60 * 60)
+            else:
+                status = rng.choice(('rejected', 'expired'))
+                created = _after(plan, rng, index)
+            seller_id = plan.user_id(plan.seller_of[index])
+            offers.append(Offer(
+                product_id=plan.product_id(index), buyer_id=buyer_id, amount=amount, status=status,
+                message=rng.choice(('', 'Would you accept this?', 'Can pick up today.')) or None,
+                created_at=created, updated_at=created, expires_at=created + timedelta(hours=offer_hours),
+            ))
+            notifications.append(Notification(
+                recipient_id=seller_id, sender_id=buyer_id, notification_type='offer', title='New offer',
+                message=f'You received an offer of ${amount}', related_product_id=plan.product_id(index),
+                is_read=status != 'pending', created_at=created,
+            ))
+            if status in ('accepted', 'rejected'):
+                notifications.append(Notification(
+                    recipient_id=buyer_id, sender_id=seller_id, notification_type=f'offer_{status}',
+                    title=f'Offer {status}', message=f'Your offer of ${amount} was {status}',
+                    related_product_id=plan.product_id(index), is_read=rng.random() < 0.8,
+                    created_at=created + timedelta(hours=rng.random() * offer_hours),
+                ))
+
+        for index in _distinct_products(plan, rng, _actions(plan, rng, 'conversations', weight), buyer_id,
+                                        lambda index: plan.status_of[index] in ('active', 'sold', 'expired')):
+            seller_id = plan.user_id(plan.seller_of[index])
+            started = _after(plan, rng, index)
+            sent, lines = started, []
+            for position in range(1 + power_law(rng, MAX_MESSAGES_PER_CONVERSATION, 1.6)):
+                from_seller = position % 2 == 1 if rng.random() < 0.8 else rng.random() < 0.5
+                lines.append((seller_id if from_seller else buyer_id, rng.choice(SELLER_LINES if from_seller else BUYER_LINES), sent))
+                sent = min(plan.now, sent + timedelta(seconds=rng.expovariate(1 / 7200)))
+            last = lines[-1][2]
+            conversations.append(Conversation(
+                product_id=plan.product_id(index), buyer_id=buyer_id, seller_id=seller_id,
+                is_active=rng.random() < 0.95, created_at=started, updated_at=last,
+                seller_responded_at=next((at for sender, _, at in lines if sender == seller_id), None),
+            ))
+            # Only the tail of a recent conversation is still unread
+            recent = (plan.now - last).days < 2
+            threads.append([
+                (sender, content, at, not (recent and position >= len(lines) - 2))
+                for position, (sender, content, at) in enumerate(lines)
+            ])
+
+        ordered = _distinct_products(plan, rng, _actions(plan, rng, 'orders', weight), buyer_id,
+                                     lambda index: plan.status_of[index] in ('active', 'sold') and index not in purchases)
+        for position, index in enumerate(ordered + purchases):
+            if index in purchases:
+                status = _pick(rng, SALE_STATUSES)
+            elif plan.status_of[index] == 'sold':
+                # Someone else bought it first
+                status = 'cancelled'
+            else:
+                status = _pick(rng, ORDER_STATUSES)
+            created = _after(plan, rng, index)
+            unit_price = Decimal(plan.price_of[index]) / 100
+            shipping_cost = Decimal(rng.choice((0, 499, 699))) / 100
+            shipped = created + timedelta(days=1 + rng.random() * 2) if status in ('shipped', 'delivered') else None
+            orders.append(Order(
+                order_number=f'LD{buyer_id:X}-{position:X}',
+                buyer_id=buyer_id, seller_id=plan.user_id(plan.seller_of[index]), product_id=plan.product_id(index),
+                unit_price=unit_price, shipping_cost=shipping_cost, total_amount=unit_price + shipping_cost,
+                shipping_address=f'{rng.randrange(1, 200)} Market Street', shipping_city=city[0],
+                shipping_country=city[1], shipping_postal_code=f'{rng.randrange(10000, 99999)}',
+                shipping_phone=f'+49{rng.randrange(10 ** 9, 10 ** 10)}',
+                shipping_method=rng.choice(('post', 'pickup', 'delivery')),
+                tracking_number=f'TRK{rng.randrange(10 ** 11, 10 ** 12)}' if shipped else None,
+                status=status, payment_status='paid' if status in ('processing', 'shipped', 'delivered') else 'pending',
+                created_at=created, updated_at=shipped or created, shipped_at=shipped,
+                delivered_at=shipped + timedelta(days=1 + rng.random() * 4) if status == 'delivered' else None,
+            ))
+
+    with transaction.atomic():
+        Favorite.objects.bulk_create(favorites, batch_size=BATCH_SIZE)
+        Offer.objects.bulk_create(offers, batch_size=BATCH_SIZE)
+        # bulk_create sets the new primary keys on PostgreSQL and SQLite, which messages and history need
+        Conversation.objects.bulk_create(conversations, batch_size=BATCH_SIZE)
+        messages = []
+        for conversation, thread in zip(conversations, threads):
+            for sender_id, content, at, is_read in thread:
+                messages.append(Message(conversation_id=conversation.pk, sender_id=sender_id, content=content, is_read=is_read, created_at=at))
+            notifications.append(Notification(
+                recipient_id=conversation.seller_id, sender_id=conversation.buyer_id, notification_type='message',
+                title='New message', message=thread[0][1], related_product_id=conversation.product_id,
+                related_conversation_id=conversation.pk, is_read=thread[-1][3], created_at=thread[0][2],
+            ))
+        Message.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+        Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+        for order in orders:
+            statuses.append(OrderStatus(order_id=order.pk, status=order.status, created_at=order.updated_at))
+        OrderStatus.objects.bulk_create(statuses, batch_size=BATCH_SIZE)
+        Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+    return Counter(
+        favorites=len(favorites), offers=len(offers), conversations=len(conversations), messages=len(messages),
+        orders=len(orders), notifications=len(notifications),
+    )
+
+
+PHASES = {'users': _users_chunk, 'products': _products_chunk, 'activity': _activity_chunk}
+
+_plan = None
+
+
+def _init_worker(plan):
+    global _plan
+    if not apps.ready:
+        django.setup()
+    _plan = plan
+
+
+def _run_chunk(task):
+    phase, chunk = task
+    with _explicit_timestamps():
+        return PHASES[phase](_plan, chunk)
+
+
+def _run(plan, phase, chunks, workers):
+    tasks = [(phase, chunk) for chunk in range(chunks)]
+    if workers <= 1:
+        _init_worker(plan)
+        yield from map(_run_chunk, tasks)
+        return
+    # Children must open their own connections, not share the parent's
+    connections.close_all()
+    with multiprocessing.get_context().Pool(workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        yield from pool.imap_unordered(_run_chunk, tasks)
+
+
+def _ranges(first, last, size=1000):
+    for start in range(first, last + 1, size):
+        yield range(start, min(last, start + size - 1) + 1)
+
+
+def generate(plan, workers=1, similar=False, progress=None):
+    """
+    Generate everything the plan describes. Table-by-table phases run one
+    after another (rows reference the previous phases' rows); the chunks of
+    a phase are spread over `workers` processes. progress(phase, done,
+    total) is called after each chunk. Returns row counts per table.
+    """
+    from chat.models import Conversation, Message
+    from products import popularity, similar as similar_products, suggest
+    from products.models import Favorite, Product
+    from users.models import SellerReputation, User, UserRating
+    from users.reputation import rebuild_reputations
+
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise RuntimeError("The database must return primary keys from bulk inserts")
+    plan.prepare()
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(_placeholder_png()))
+
+    totals = Counter()
+    for phase, chunks in (
+        ('users', math.ceil(plan.users / CHUNK_SIZE)),
+        ('products', math.ceil(plan.products / CHUNK_SIZE)),
+        ('activity', math.ceil(plan.users / ACTIVITY_CHUNK_SIZE)),
+    ):
+        for done, counts in enumerate(_run(plan, phase, chunks, workers), 1):
+            totals.update(counts)
+            if progress:
+                progress(phase, done, chunks)
+
+    if connection.vendor == 'postgresql':
+        # Users and products were inserted with explicit ids
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Product]):
+                cursor.execute(sql)
+
+    # The counters save() would have kept
+    for ids in _ranges(plan.product_id(0), plan.product_id(plan.products - 1)):
+        Favorite.recount(ids)
+        Product.refresh_offer_summary(ids)
+    rebuild_reputations(User, UserRating, SellerReputation, Conversation, Message)
+    suggest.rebuild()
+    popularity.refresh()
+    if similar:
+        similar_products.rebuild()
+    return totals
@@ -0,0 +1,187 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Message
+from orders.models import Order
+from products.models import Offer, Product
+from users.models import User
+from .db import PrimaryReplicaRouter, ReplicaRoutingMiddleware, parse_database_url
+from .factories import CacheClearingTestCase
+from .loadgen import LoadPlan, generate
+from .throttling import SlidingWindowLimiter, throttle_stats
+
+
+class DatabaseUrlTests(SimpleTestCase):
+    def test_postgresql_url(self):
+        config = parse_database_url('postgresql://app:s%40cret@db:6432/market?sslmode=require', conn_max_age=60)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['USER'], config['PASSWORD'], config['HOST'], config['PORT']), ('app', 's@cret', 'db', '6432'))
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require'})
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    def test_sqlite_url(self):
+        self.assertEqual(parse_database_url('sqlite:////tmp/app.sqlite3')['NAME'], '/tmp/app.sqlite3')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(CacheClearingTestCase):
+    """Which database each request reads from, decided without running queries"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def bearer(self, user_id):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(User(pk=user_id))}'}
+
+    def route(self, method='get', model=Product, **headers):
+        """The alias a read of `model` would use while handling the request"""
+        seen = []
+        middleware = ReplicaRoutingMiddleware(lambda request: seen.append(self.router.db_for_read(model)))
+        middleware(getattr(self.factory, method)('/api/products/', **headers))
+        return seen[0]
+
+    def test_safe_requests_read_catalog_models_from_replicas(self):
+        self.assertEqual(self.route(**self.bearer(1)), 'replica1')
+        self.assertIsNone(self.route(model=Message, **self.bearer(1)))
+        self.assertIsNone(self.route('post', **self.bearer(1)))
+
+    def test_writer_is_pinned_to_primary_across_token_rotation(self):
+        self.route('post', **self.bearer(1))
+
+        # A freshly issued token for the same user is still pinned
+        self.assertIsNone(self.route(**self.bearer(1)))
+        self.assertEqual(self.route(**self.bearer(2)), 'replica1')
+
+    def test_session_and_anonymous_clients_are_pinned_separately(self):
+        self.factory.cookies['sessionid'] = 'abc'
+        self.route('post')
+        self.assertIsNone(self.route())
+        del self.factory.cookies['sessionid']
+        self.assertEqual(self.route(REMOTE_ADDR='10.0.0.2'), 'replica1')
+
+    def test_invalid_token_falls_back_to_client_address(self):
+        self.route('post', HTTP_AUTHORIZATION='Bearer forged', REMOTE_ADDR='10.0.0.3')
+        self.assertIsNone(self.route(REMOTE_ADDR='10.0.0.3'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_reads_primary(self):
+        self.assertIsNone(self.route(**self.bearer(1)))
+
+
+class SlidingWindowLimiterTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.limiter = SlidingWindowLimiter('test', limit=4, window=10)
+
+    def test_allows_up_to_the_limit_within_a_window(self):
+        for _ in range(4):
+            self.assertEqual(self.limiter.consume('a', now=1000), 0)
+        # Full until the window rolls over at 1010, and the 4 hits then weigh 4 until just after
+        self.assertEqual(self.limiter.consume('a', now=1002), 9)
+        self.assertEqual(self.limiter.wait('a', now=1011), 0)
+        self.assertEqual(self.limiter.wait('b', now=1002), 0)
+
+    def test_previous_window_weight_decays(self):
+        for _ in range(5):
+            self.limiter.hit('a', now=1009)
+        # 10% into the next window the 5 old hits weigh 4.5, over the limit of 4;
+        # they decay to 4 at 20% in and fit just after
+        self.assertEqual(self.limiter.wait('a', now=1011), 2)
+        self.assertEqual(self.limiter.wait('a', now=1013), 0)
+        self.assertEqual(self.limiter.wait('a', now=1018), 0)
+
+    def test_refused_hits_are_not_counted(self):
+        for _ in range(20):
+            self.limiter.consume('a', now=1000)
+        self.assertEqual(self.limiter.wait('a', now=1011), 0)
+
+    def test_reset_clears_both_windows(self):
+        for _ in range(4):
+            self.limiter.hit('a', now=1009)
+        self.limiter.reset('a', now=1011)
+        self.assertEqual(self.limiter.wait('a', now=1011), 0)
+
+
+@override_settings(API_THROTTLE_RATES={
+    'anon': {'burst': (100, 10), 'sustained': (1000, 3600)},
+    'user': {'burst': (100, 10), 'sustained': (1000, 3600)},
+    'search': {'burst': (2, 10), 'sustained': (3, 3600)},
+})
+class ApiThrottleTests(CacheClearingTestCase):
+    def search(self, **extra):
+        return self.client.get(reverse('search-products'), {'query': 'phone'}, **extra)
+
+    def test_scope_burst_returns_retry_after_and_is_counted(self):
+        self.assertEqual([self.search().status_code for _ in range(2)], [200, 200])
+        response = self.search()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(throttle_stats()['search'], 1)
+        # Each client has its own budget
+        self.assertEqual(self.search(REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_sustained_budget_outlasts_the_burst_window(self):
+        start = time.time()
+        with mock.patch('marketplace.throttling.time.time', return_value=start):
+            self.assertEqual([self.search().status_code for _ in range(2)], [200, 200])
+        with mock.patch('marketplace.throttling.time.time', return_value=start + 60):
+            self.assertEqual(self.search().status_code, 200)
+            # The burst window has room again; the wait is the sustained one's
+            self.assertGreater(int(self.search()['Retry-After']), 10)
+
+    def test_retry_after_holds_after_a_burst_of_refused_requests(self):
+        start = 1_000_000_000.5
+        with mock.patch('marketplace.throttling.time.time', return_value=start):
+            statuses = [self.search().status_code for _ in range(20)]
+            retry_after = int(self.search()['Retry-After'])
+            # Refused searches did not use up the client's own budget either
+            self.assertEqual(cache.get(f'ratelimit:anon-burst:ip:127.0.0.1:{int(start // 10)}'), 2)
+        self.assertEqual(statuses, [200] * 2 + [429] * 18)
+        self.assertLessEqual(retry_after, 10)
+
+        with mock.patch('marketplace.throttling.time.time', return_value=start + retry_after):
+            self.assertEqual(self.search().status_code, 200)
+
+    def test_unscoped_views_only_use_the_client_budget(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('category-list')).status_code, 200)
+
+
+class LoadGenerationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_each_sold_listing_has_one_buyer(self):
+        plan = LoadPlan(seed=7, users=300, products=400, favorites=500, offers=3000, conversations=100, orders=3000)
+        generate(plan)
+
+        sold = Product.objects.filter(status='sold')
+        self.assertTrue(sold.exists())
+        accepted = Offer.objects.filter(status='accepted')
+        live = Order.objects.exclude(status='cancelled').filter(product__status='sold')
+        self.assertFalse(accepted.exclude(product__status='sold').exists())
+        # Popular sold listings drew offers and orders from several buyers
+        self.assertTrue(Order.objects.filter(product__status='sold').values('product').annotate(
+            buyers=Count('buyer', distinct=True)).filter(buyers__gt=1).exists())
+        for rows in (accepted, live):
+            self.assertFalse(rows.values('product').annotate(n=Count('pk')).filter(n__gt=1).exists())
+        self.assertEqual(live.count(), sold.count())
+        buyer_of = dict(live.values_list('product', 'buyer'))
+        for product, buyer in accepted.values_list('product', 'buyer'):
+            self.assertEqual(buyer_of[product], buyer)
+        self.assertFalse(live.filter(Q(status='pending') | Q(status='rejected')).exists())
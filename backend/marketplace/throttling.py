@@ -0,0 +1,188 @@
+"""
+API throttling. Every request is checked against the budget of its client
+class ('user' or 'anon') and, if the view declares a `throttle_scope`,
+against that scope's budget too. Each budget has a short burst window and a
+long sustained window, which together behave like a token bucket: the burst
+window is the bucket size, the sustained window the refill rate.
+
+Windows are sliding, approximated from two fixed-window counters bumped with
+atomic cache increments, so limits hold across workers when the cache is
+Redis. Only allowed requests are counted. Throttled requests get a 429 with
+Retry-After, and are counted per scope for `throttle_stats`.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` hits per `window` seconds for each identifier"""
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, ident, index):
+        return f'ratelimit:{self.scope}:{ident}:{index}'
+
+    def _wait(self, current, previous, fraction):
+        def weighted(seconds):
+            at = fraction + seconds / self.window
+            if at >= 1:
+                # This window has rolled over into the previous one
+                return current * max(0, 2 - at)
+            return current + previous * (1 - at)
+
+        if weighted(0) < self.limit:
+            return 0
+        if current >= self.limit:
+            # Full until this window rolls over, then it decays as the previous one
+            until = 1 + max(0, 1 - self.limit / current)
+        else:
+            # The previous window's weight decays linearly; find when it fits
+            until = 1 - (self.limit - current) / previous
+        seconds = max(1, math.ceil((until - fraction) * self.window))
+        # Landing exactly on the limit is still full
+        while weighted(seconds) >= self.limit:
+            seconds += 1
+        return seconds
+
+    def _incr(self, key):
+        if cache.add(key, 1, self.window * 2):
+            return 1
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, self.window * 2)
+            return 1
+
+    def _decr(self, key):
+        try:
+            cache.decr(key)
+        except ValueError:
+            # Expired meanwhile, taking the hit with it
+            pass
+
+    def wait(self, ident, now=None):
+        """Seconds until the next hit is allowed, or 0 if it is allowed now"""
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, self.window)
+        index = int(index)
+        keys = [self._key(ident, index), self._key(ident, index - 1)]
+        counts = cache.get_many(keys)
+        return self._wait(counts.get(keys[0], 0), counts.get(keys[1], 0), elapsed / self.window)
+
+    def hit(self, ident, now=None):
+        now = time.time() if now is None else now
+        self._incr(self._key(ident, int(now // self.window)))
+
+    def unhit(self, ident, now=None):
+        """Take back a hit counted at `now`"""
+        now = time.time() if now is None else now
+        self._decr(self._key(ident, int(now // self.window)))
+
+    def consume(self, ident, now=None):
+        """
+        Count a hit and return 0, or return how long to wait if it would go
+        over the limit. The increment happens first, so concurrent requests
+        cannot all slip through on the same stale count; an increment that
+        went over is taken back, so refused hits use up no budget.
+        """
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, self.window)
+        index = int(index)
+        key = self._key(ident, index)
+        current = self._incr(key)
+        previous = cache.get(self._key(ident, index - 1), 0)
+        wait = self._wait(current - 1, previous, elapsed / self.window)
+        if wait:
+            self._decr(key)
+        return wait
+
+    def reset(self, ident, now=None):
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        cache.delete_many([self._key(ident, index), self._key(ident, index - 1)])
+
+
+def throttled_metric_key(scope):
+    return f'throttle:throttled:{scope}'
+
+
+def throttle_stats():
+    """How many requests each configured scope has throttled"""
+    scopes = list(settings.API_THROTTLE_RATES)
+    counts = cache.get_many([throttled_metric_key(scope) for scope in scopes])
+    return {scope: counts.get(throttled_metric_key(scope), 0) for scope in scopes}
+
+
+def throttle_scope(scope):
+    """
+    Give an @api_view function view a throttle scope. Apply it above
+    @api_view, since it sets the attribute on the generated view class.
+    """
+    def decorator(view):
+        view.cls.throttle_scope = scope
+        return view
+    return decorator
+
+
+class BurstSustainedThrottle(BaseThrottle):
+    """Client-class budget plus the view's throttle_scope budget, if any"""
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_scopes(self, request, view):
+        scopes = ['user' if request.user.is_authenticated else 'anon']
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            scopes.append(scope)
+        return scopes
+
+    def allow_request(self, request, view):
+        if request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        now = time.time()
+        limiters = [
+            (scope, SlidingWindowLimiter(f'{scope}-{window}', limit, seconds))
+            for scope in self.get_scopes(request, view)
+            for window, (limit, seconds) in settings.API_THROTTLE_RATES.get(scope, {}).items()
+        ]
+
+        # Check every window before counting, like DRF's throttles, so a refused
+        # request uses up no budget and Retry-After covers the longest wait
+        wait, scope = max((limiter.wait(ident, now), scope) for scope, limiter in limiters) if limiters else (0, None)
+        if not wait:
+            counted = []
+            for scope, limiter in limiters:
+                wait = limiter.consume(ident, now)
+                if wait:
+                    # A concurrent request took the last of this budget
+                    for other in counted:
+                        other.unhit(ident, now)
+                    break
+                counted.append(limiter)
+        if wait:
+            self.retry_after = wait
+            self._record_throttled(scope)
+            return False
+        return True
+
+    def _record_throttled(self, scope):
+        key = throttled_metric_key(scope)
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    def wait(self):
+        return self.retry_after
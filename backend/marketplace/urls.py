@@ -51,6 +51,7 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/chat/', include('chat.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/uploads/', include('uploads.urls')),
     
     # api documentation:
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'),
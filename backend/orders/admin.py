@@ -1,4 +1,5 @@
 from django.contrib import admin
+from marketplace.paginators import EstimatedCountPaginator
 from .models import Order, OrderStatus, ShippingMethod, Dispute, DisputeMessage
 
 
@@ -22,6 +23,10 @@ class OrderAdmin(admin.ModelAdmin):
         'order_number', 'product__title', 'buyer__username', 'seller__username'
     ]
     ordering = ['-created_at']
+    list_select_related = ['product__seller', 'buyer', 'seller']
+    autocomplete_fields = ['product', 'accepted_offer', 'buyer', 'seller']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = [
         'order_number', 'created_at', 'updated_at', 'shipped_at', 'delivered_at'
     ]
@@ -96,6 +101,10 @@ class OrderStatusAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['order__order_number', 'notes']
     ordering = ['-created_at']
+    list_select_related = ['order__product']
+    autocomplete_fields = ['order']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -133,29 +142,40 @@ class DisputeMessageInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['created_at']
     fields = ['sender', 'message', 'is_admin_message', 'created_at']
+    autocomplete_fields = ['sender']
 
 
 @admin.register(Dispute)
 class DisputeAdmin(admin.ModelAdmin):
     list_display = [
-        'order', 'complainant', 'dispute_type', 'status', 'created_at'
+        'order', 'complainant', 'dispute_type', 'status', 'age_bucket',
+        'sla_breached', 'created_at'
     ]
-    list_filter = ['dispute_type', 'status', 'created_at']
+    list_filter = ['dispute_type', 'status', 'age_bucket', 'sla_breached', 'created_at']
     search_fields = [
         'order__order_number', 'complainant__username', 'description'
     ]
     ordering = ['-created_at']
+    list_select_related = ['order__product', 'complainant']
+    autocomplete_fields = ['order', 'complainant']
     readonly_fields = [
-        'created_at', 'updated_at', 'resolved_at', 'resolved_by'
+        'created_at', 'updated_at', 'resolved_at', 'resolved_by',
+        'buyer', 'seller', 'age_bucket', 'sla_due_at', 'sla_breached'
     ]
     
     fieldsets = (
         ('Dispute Information', {
             'fields': ('order', 'complainant', 'dispute_type', 'description', 'evidence')
         }),
+        ('Parties', {
+            'fields': ('buyer', 'seller')
+        }),
         ('Resolution', {
             'fields': ('status', 'resolution', 'resolved_by')
         }),
+        ('Triage', {
+            'fields': ('age_bucket', 'sla_due_at', 'sla_breached')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'resolved_at'),
             'classes': ('collapse',)
@@ -179,7 +199,8 @@ class DisputeAdmin(admin.ModelAdmin):
     mark_as_under_review.short_description = "Mark selected disputes as under review"
     
     def mark_as_resolved(self, request, queryset):
-        updated = queryset.update(status='resolved')
+        from django.utils import timezone
+        updated = queryset.update(status='resolved', resolved_at=timezone.now())
         self.message_user(request, f'{updated} disputes have been marked as resolved.')
     mark_as_resolved.short_description = "Mark selected disputes as resolved"
     
@@ -199,6 +220,8 @@ class DisputeMessageAdmin(admin.ModelAdmin):
         'dispute__order__order_number', 'sender__username', 'message'
     ]
     ordering = ['-created_at']
+    list_select_related = ['dispute__order', 'sender']
+    autocomplete_fields = ['dispute', 'sender']
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from orders.models import Dispute
+
+
+class Command(BaseCommand):
+    help = "Refresh dispute age buckets and SLA timers, and publish queue stats. Run periodically (e.g. every 5 minutes from cron)."
+
+    def handle(self, *args, **options):
+        result = Dispute.refresh_queue()
+        stats = Dispute.queue_stats()
+        cache.set(Dispute.QUEUE_STATS_CACHE_KEY, stats, settings.DISPUTE_QUEUE_STATS_TTL)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-bucketed {result['rebucketed']} disputes, "
+            f"{result['breached']} newly past SLA, "
+            f"{stats['sla_breached']} open disputes breaching SLA."
+        ))
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+
+def backfill_dispute_queue(apps, schema_editor):
+    """Copy order participants onto existing disputes and start their SLA timers"""
+    Dispute = apps.get_model('orders', 'Dispute')
+    Order = apps.get_model('orders', 'Order')
+    order = Order.objects.filter(pk=models.OuterRef('order_id'))
+    Dispute.objects.update(
+        buyer_id=models.Subquery(order.values('buyer_id')[:1]),
+        seller_id=models.Subquery(order.values('seller_id')[:1]),
+        sla_due_at=models.F('created_at') + timedelta(hours=settings.DISPUTE_SLA_HOURS),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0005_alter_order_status_alter_orderstatus_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispute',
+            name='age_bucket',
+            field=models.CharField(choices=[('new', 'Under 1 Day'), ('aging', '1-3 Days'), ('stale', '3-7 Days'), ('overdue', 'Over 7 Days')], default='new', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='dispute',
+            name='buyer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disputes_as_buyer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dispute',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disputes_as_seller', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dispute',
+            name='sla_breached',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='dispute',
+            name='sla_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['complainant', '-created_at'], name='disputes_complainant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['buyer', '-created_at'], name='disputes_buyer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['seller', '-created_at'], name='disputes_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['status', '-created_at'], name='disputes_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['status', 'age_bucket'], name='disputes_triage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['status', 'sla_due_at'], name='disputes_sla_idx'),
+        ),
+        migrations.RunPython(backfill_dispute_queue, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from users.models import User
 from products.models import Product, Offer
@@ -75,6 +77,12 @@ class Order(models.Model):
                     self.order_number = order_number
                     break
         super().save(*args, **kwargs)
+        if self.accepted_offer_id and self.status in ('cancelled', 'rejected'):
+            # The offer stops holding the product, so it can take and accept new offers
+            from django.utils import timezone
+            Offer.objects.filter(pk=self.accepted_offer_id, status='accepted').update(
+                status='rejected', updated_at=timezone.now()
+            )
     
     def mark_as_shipped(self, tracking_number=None):
         from django.utils import timezone
@@ -143,8 +151,28 @@ class Dispute(models.Model):
         ('closed', 'Closed'),
     ]
     
+    AGE_BUCKET_CHOICES = [
+        ('new', 'Under 1 Day'),
+        ('aging', '1-3 Days'),
+        ('stale', '3-7 Days'),
+        ('overdue', 'Over 7 Days'),
+    ]
+    
+    # Statuses that still need admin attention
+    OPEN_STATUSES = ['open', 'under_review']
+    
+    # Upper age bound (in days) of each bucket, oldest bucket last
+    AGE_BUCKET_LIMITS = [('new', 1), ('aging', 3), ('stale', 7), ('overdue', None)]
+    
+    QUEUE_STATS_CACHE_KEY = 'disputes:queue_stats'
+    
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='disputes')
     complainant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='disputes_filed')
+    
+    # Order participants copied from the order so participant lookups skip the join
+    buyer = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name='disputes_as_buyer')
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name='disputes_as_seller')
+    
     dispute_type = models.CharField(max_length=30, choices=DISPUTE_TYPES)
     description = models.TextField()
     evidence = models.FileField(upload_to='dispute_evidence/', blank=True, null=True)
@@ -155,13 +183,36 @@ class Dispute(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(blank=True, null=True)
     
+    # Triage fields, kept current by the refresh_dispute_queue command
+    age_bucket = models.CharField(max_length=10, choices=AGE_BUCKET_CHOICES, default='new')
+    sla_due_at = models.DateTimeField(blank=True, null=True)
+    sla_breached = models.BooleanField(default=False)
+    
     class Meta:
         db_table = 'disputes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['complainant', '-created_at'], name='disputes_complainant_idx'),
+            models.Index(fields=['buyer', '-created_at'], name='disputes_buyer_idx'),
+            models.Index(fields=['seller', '-created_at'], name='disputes_seller_idx'),
+            models.Index(fields=['status', '-created_at'], name='disputes_status_idx'),
+            models.Index(fields=['status', 'age_bucket'], name='disputes_triage_idx'),
+            models.Index(fields=['status', 'sla_due_at'], name='disputes_sla_idx'),
+        ]
     
     def __str__(self):
         return f"Dispute for Order {self.order.order_number} - {self.get_dispute_type_display()}"
     
+    def save(self, *args, **kwargs):
+        if self.buyer_id is None or self.seller_id is None:
+            self.buyer_id = self.order.buyer_id
+            self.seller_id = self.order.seller_id
+        if self.sla_due_at is None:
+            from django.utils import timezone
+            opened_at = self.created_at or timezone.now()
+            self.sla_due_at = opened_at + timedelta(hours=settings.DISPUTE_SLA_HOURS)
+        super().save(*args, **kwargs)
+    
     def resolve(self, resolution, resolved_by):
         from django.utils import timezone
         self.status = 'resolved'
@@ -169,6 +220,72 @@ class Dispute(models.Model):
         self.resolved_by = resolved_by
         self.resolved_at = timezone.now()
         self.save()
+    
+    @classmethod
+    def involving(cls, user):
+        """Disputes the user filed or is a party to, using the denormalized columns"""
+        return cls.objects.filter(
+            models.Q(complainant=user) | models.Q(buyer=user) | models.Q(seller=user)
+        )
+    
+    @classmethod
+    def refresh_queue(cls, now=None):
+        """Recompute age buckets and SLA breaches for open disputes in bulk"""
+        from django.utils import timezone
+        now = now or timezone.now()
+        open_disputes = cls.objects.filter(status__in=cls.OPEN_STATUSES)
+        
+        updated = 0
+        newer_than = None
+        for bucket, max_days in cls.AGE_BUCKET_LIMITS:
+            in_bucket = open_disputes.exclude(age_bucket=bucket)
+            if max_days is not None:
+                in_bucket = in_bucket.filter(created_at__gt=now - timedelta(days=max_days))
+            if newer_than is not None:
+                in_bucket = in_bucket.filter(created_at__lte=now - timedelta(days=newer_than))
+            updated += in_bucket.update(age_bucket=bucket)
+            newer_than = max_days
+        
+        breached = open_disputes.filter(sla_breached=False, sla_due_at__lt=now).update(sla_breached=True)
+        return {'rebucketed': updated, 'breached': breached}
+    
+    @classmethod
+    def queue_stats(cls):
+        """Grouped triage counts and resolution metrics for the admin dashboard"""
+        from django.db.models import Avg, Count, F, Q
+        buckets = {
+            status: {bucket: 0 for bucket, _ in cls.AGE_BUCKET_CHOICES}
+            for status in cls.OPEN_STATUSES
+        }
+        rows = cls.objects.filter(status__in=cls.OPEN_STATUSES).values(
+            'status', 'age_bucket'
+        ).annotate(count=Count('id'))
+        for row in rows:
+            buckets[row['status']][row['age_bucket']] = row['count']
+        
+        totals = cls.objects.aggregate(
+            total=Count('id'),
+            settled=Count('id', filter=Q(status__in=['resolved', 'closed'])),
+            breached=Count('id', filter=Q(status__in=cls.OPEN_STATUSES, sla_breached=True)),
+            avg_resolution=Avg(F('resolved_at') - F('created_at'), filter=Q(resolved_at__isnull=False)),
+        )
+        avg_resolution = totals['avg_resolution']
+        return {
+            'buckets': buckets,
+            'sla_breached': totals['breached'],
+            'avg_resolution_time': round(avg_resolution.total_seconds() / 86400, 1) if avg_resolution else 0,
+            'resolution_rate': round(totals['settled'] * 100 / totals['total'], 1) if totals['total'] else 0,
+        }
+    
+    @classmethod
+    def cached_queue_stats(cls):
+        """Queue stats as published by the last refresh, computed on a cold cache"""
+        from django.core.cache import cache
+        stats = cache.get(cls.QUEUE_STATS_CACHE_KEY)
+        if stats is None:
+            stats = cls.queue_stats()
+            cache.set(cls.QUEUE_STATS_CACHE_KEY, stats, settings.DISPUTE_QUEUE_STATS_TTL)
+        return stats
 
 
 class DisputeMessage(models.Model):
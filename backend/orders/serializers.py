@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from django.utils import timezone
 from .models import Order, OrderStatus, ShippingMethod, Dispute, DisputeMessage
-from users.serializers import UserProfileSerializer
+from users.serializers import PublicProfileField
 from products.serializers import ProductListSerializer
 
 
@@ -45,8 +46,8 @@ class OrderListSerializer(serializers.ModelSerializer):
 class OrderDetailSerializer(serializers.ModelSerializer):
     """Serializer for order details"""
     product = ProductListSerializer(read_only=True)
-    seller = UserProfileSerializer(read_only=True)
-    buyer = UserProfileSerializer(read_only=True)
+    seller = PublicProfileField(source='seller_id')
+    buyer = PublicProfileField(source='buyer_id')
     status_history = OrderStatusSerializer(many=True, read_only=True)
     
     class Meta:
@@ -190,7 +191,8 @@ class DisputeListSerializer(serializers.ModelSerializer):
         model = Dispute
         fields = [
             'id', 'order_number', 'product_title', 'complainant_name',
-            'dispute_type', 'status', 'created_at'
+            'dispute_type', 'status', 'age_bucket', 'sla_due_at', 'sla_breached',
+            'created_at'
         ]
 
 
@@ -216,7 +218,7 @@ class DisputeMessageSerializer(serializers.ModelSerializer):
 
 class DisputeDetailSerializer(serializers.ModelSerializer):
     """Serializer for dispute details"""
-    complainant = UserProfileSerializer(read_only=True)
+    complainant = PublicProfileField(source='complainant_id')
     order = OrderListSerializer(read_only=True)
     messages = DisputeMessageSerializer(many=True, read_only=True)
     resolved_by_name = serializers.CharField(source='resolved_by.username', read_only=True)
@@ -244,7 +246,9 @@ class DisputeResolutionSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         if validated_data.get('status') == 'resolved':
-            validated_data['resolved_by'] = self.context['request'].user
+            if 'resolved_by' not in validated_data:
+                validated_data['resolved_by'] = self.context['request'].user
+            validated_data['resolved_at'] = timezone.now()
         return super().update(instance, validated_data)
 
 
@@ -1,3 +1,114 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from marketplace.factories import (
+    AdminChangelistQueryTestCase, CacheClearingTestCase, make_order, make_product, make_user,
+)
+from users.models import User
+from .models import Dispute, DisputeMessage, OrderStatus
+
+
+class AdminChangelistQueryTests(AdminChangelistQueryTestCase):
+    app_label = 'orders'
+
+    @classmethod
+    def create_row(cls, index, seller, buyer, product):
+        order = make_order(buyer, product)
+        OrderStatus.objects.create(order=order, status='pending')
+        dispute = Dispute.objects.create(order=order, complainant=buyer, dispute_type='other', description='Late')
+        DisputeMessage.objects.create(dispute=dispute, sender=buyer, message='Still waiting')
+
+    def test_order_changelist(self):
+        self.assertChangelistQueries('order', 5)
+
+    def test_orderstatus_changelist(self):
+        self.assertChangelistQueries('orderstatus', 4)
+
+    def test_dispute_changelist(self):
+        self.assertChangelistQueries('dispute', 5)
+
+    def test_disputemessage_changelist(self):
+        self.assertChangelistQueries('disputemessage', 5)
+
+
+class DisputeQueueTests(CacheClearingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.seller = make_user('seller', user_type='seller')
+        cls.buyer = make_user('buyer')
+        cls.order = make_order(cls.buyer, make_product(cls.seller))
+
+    def open_dispute(self, days_old=0, **fields):
+        dispute = Dispute.objects.create(
+            order=self.order, complainant=self.buyer, dispute_type='other', description='Late', **fields
+        )
+        if days_old:
+            created_at = timezone.now() - timedelta(days=days_old)
+            Dispute.objects.filter(pk=dispute.pk).update(
+                created_at=created_at, sla_due_at=created_at + timedelta(hours=settings.DISPUTE_SLA_HOURS)
+            )
+        return dispute
+
+    def test_save_copies_parties_and_sets_sla(self):
+        dispute = self.open_dispute()
+        self.assertEqual((dispute.buyer_id, dispute.seller_id), (self.buyer.id, self.seller.id))
+        self.assertAlmostEqual(
+            dispute.sla_due_at, dispute.created_at + timedelta(hours=settings.DISPUTE_SLA_HOURS),
+            delta=timedelta(seconds=5),
+        )
+        self.assertEqual(list(Dispute.involving(self.seller)), [dispute])
+
+    def test_refresh_moves_open_disputes_between_buckets(self):
+        ages = {'new': 0.5, 'aging': 2, 'stale': 5, 'overdue': 10}
+        disputes = {bucket: self.open_dispute(days) for bucket, days in ages.items()}
+        resolved = self.open_dispute(10, status='resolved')
+
+        result = Dispute.refresh_queue()
+
+        self.assertEqual(result['rebucketed'], 3)
+        for bucket, dispute in disputes.items():
+            dispute.refresh_from_db()
+            self.assertEqual(dispute.age_bucket, bucket)
+        resolved.refresh_from_db()
+        self.assertEqual(resolved.age_bucket, 'new')
+        # Nothing left to move on a second pass
+        self.assertEqual(Dispute.refresh_queue()['rebucketed'], 0)
+
+    def test_refresh_flags_sla_breaches_once(self):
+        overdue = self.open_dispute(days_old=settings.DISPUTE_SLA_HOURS / 24 + 1)
+        on_time = self.open_dispute()
+
+        self.assertEqual(Dispute.refresh_queue()['breached'], 1)
+        self.assertEqual(Dispute.refresh_queue()['breached'], 0)
+        overdue.refresh_from_db()
+        on_time.refresh_from_db()
+        self.assertTrue(overdue.sla_breached)
+        self.assertFalse(on_time.sla_breached)
+
+    def test_queue_stats_and_admin_endpoints(self):
+        self.open_dispute(10)
+        self.open_dispute(10, status='under_review')
+        self.open_dispute()
+        self.open_dispute(status='resolved')
+        Dispute.refresh_queue()
+
+        stats = Dispute.queue_stats()
+        self.assertEqual(stats['buckets']['open'], {'new': 1, 'aging': 0, 'stale': 0, 'overdue': 1})
+        self.assertEqual(stats['buckets']['under_review']['overdue'], 1)
+        self.assertEqual(stats['sla_breached'], 2)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(reverse('dispute-queue'), {'sla_breached': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        response = client.get(reverse('dispute-queue-summary'))
+        self.assertEqual(response.data['sla_breached'], 2)
+
+        client.force_authenticate(self.buyer)
+        self.assertEqual(client.get(reverse('dispute-queue')).status_code, 403)
@@ -31,6 +31,8 @@ urlpatterns = [
     path('disputes/', views.DisputeListView.as_view(), name='dispute-list'),
     path('disputes/create/', views.DisputeCreateView.as_view(), name='dispute-create'),
     path('disputes/<int:pk>/', views.DisputeDetailView.as_view(), name='dispute-detail'),
+    path('disputes/queue/', views.DisputeQueueView.as_view(), name='dispute-queue'),
+    path('disputes/queue/summary/', views.dispute_queue_summary, name='dispute-queue-summary'),
     path('disputes/<int:dispute_id>/resolve/', views.resolve_dispute, name='resolve-dispute'),
     
     # Dispute messages
@@ -185,9 +185,8 @@ class DisputeListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        return Dispute.objects.filter(
-            Q(complainant=user) | Q(order__seller=user) | Q(order__buyer=user)
+        return Dispute.involving(self.request.user).select_related(
+            'complainant', 'order__product'
         ).order_by('-created_at')
 
 
@@ -197,10 +196,7 @@ class DisputeDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        return Dispute.objects.filter(
-            Q(complainant=user) | Q(order__seller=user) | Q(order__buyer=user)
-        )
+        return Dispute.involving(self.request.user)
 
 
 class DisputeMessageCreateView(generics.CreateAPIView):
@@ -211,9 +207,8 @@ class DisputeMessageCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         dispute = serializer.validated_data['dispute']
         # Check if user is involved in the dispute
-        if (dispute.complainant != self.request.user and 
-            dispute.order.seller != self.request.user and 
-            dispute.order.buyer != self.request.user):
+        user_id = self.request.user.id
+        if user_id not in (dispute.complainant_id, dispute.seller_id, dispute.buyer_id):
             raise PermissionError("You are not involved in this dispute")
         
         serializer.save(sender=self.request.user)
@@ -229,14 +224,43 @@ class DisputeMessageListView(generics.ListAPIView):
         dispute = get_object_or_404(Dispute, id=dispute_id)
         
         # Check if user is involved in the dispute
-        if (dispute.complainant != self.request.user and 
-            dispute.order.seller != self.request.user and 
-            dispute.order.buyer != self.request.user):
+        user_id = self.request.user.id
+        if user_id not in (dispute.complainant_id, dispute.seller_id, dispute.buyer_id):
             return DisputeMessage.objects.none()
         
         return DisputeMessage.objects.filter(dispute=dispute).order_by('created_at')
 
 
+class DisputeQueueView(generics.ListAPIView):
+    """Admin work queue of open disputes, most urgent SLA first"""
+    serializer_class = DisputeListSerializer
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        status_filter = params.get('status')
+        statuses = [status_filter] if status_filter else Dispute.OPEN_STATUSES
+        queryset = Dispute.objects.filter(status__in=statuses)
+        
+        age_bucket = params.get('age_bucket')
+        if age_bucket:
+            queryset = queryset.filter(age_bucket=age_bucket)
+        
+        if params.get('sla_breached') in ('true', '1'):
+            queryset = queryset.filter(sla_breached=True)
+        
+        return queryset.select_related(
+            'complainant', 'order__product'
+        ).order_by('sla_due_at', 'id')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def dispute_queue_summary(request):
+    """Open dispute counts per status and age bucket, as of the last queue refresh"""
+    return Response(Dispute.cached_queue_stats())
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def resolve_dispute(request, dispute_id):
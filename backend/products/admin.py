@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Count, Q
+from marketplace.paginators import EstimatedCountPaginator
 from .models import (
     Category, Product, ProductImage, Offer, Favorite, 
-    ProductRating, ProductReport
+    ProductRating, ProductReport, SavedSearch
 )
 
 
@@ -21,6 +22,8 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'created_at', 'parent')
     search_fields = ('name', 'description')
     ordering = ('name',)
+    list_select_related = ('parent',)
+    autocomplete_fields = ('parent',)
     prepopulated_fields = {'name': ('name',)}
     
     fieldsets = (
@@ -42,7 +45,7 @@ class CategoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     
     def products_count(self, obj):
-        return obj.get_products_count()
+        return obj.products__count
     products_count.short_description = 'Active Products'
     products_count.admin_order_field = 'products__count'
     
@@ -68,6 +71,10 @@ class ProductAdmin(admin.ModelAdmin):
     )
     search_fields = ('title', 'description', 'seller__username', 'brand', 'model')
     ordering = ('-created_at',)
+    list_select_related = ('seller', 'category')
+    autocomplete_fields = ('seller', 'category', 'verified_by')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [ProductImageInline]
     
     fieldsets = (
@@ -124,19 +131,17 @@ class ProductAdmin(admin.ModelAdmin):
     verification_status.admin_order_field = 'is_verified'
     
     def verify_products(self, request, queryset):
-        count = 0
-        for product in queryset.filter(is_verified=False):
-            product.verify_product(request.user, "Bulk verified by admin")
-            count += 1
-        self.message_user(request, f'{count} products were verified.')
+        verified = Product.verify_many(
+            list(queryset.filter(is_verified=False).values_list('pk', flat=True)), request.user, "Bulk verified by admin"
+        )
+        self.message_user(request, f'{len(verified)} products were verified.')
     verify_products.short_description = "Verify selected products"
     
     def reject_products(self, request, queryset):
-        count = 0
-        for product in queryset.filter(is_verified=False):
-            product.reject_product(request.user, "Bulk rejected by admin")
-            count += 1
-        self.message_user(request, f'{count} products were rejected.')
+        rejected = Product.reject_many(
+            list(queryset.filter(is_verified=False).values_list('pk', flat=True)), request.user, "Bulk rejected by admin"
+        )
+        self.message_user(request, f'{len(rejected)} products were rejected.')
     reject_products.short_description = "Reject selected products"
     
     def make_featured(self, request, queryset):
@@ -148,11 +153,6 @@ class ProductAdmin(admin.ModelAdmin):
         count = queryset.update(is_featured=False)
         self.message_user(request, f'{count} products were removed from featured.')
     remove_featured.short_description = "Remove featured status"
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'seller', 'category', 'verified_by'
-        )
 
 
 @admin.register(ProductImage)
@@ -161,6 +161,8 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_filter = ('is_main', 'created_at')
     search_fields = ('product__title', 'alt_text')
     ordering = ('-created_at',)
+    list_select_related = ('product__seller',)
+    autocomplete_fields = ('product',)
     
     def image_preview(self, obj):
         if obj.image_url_or_file:
@@ -180,6 +182,8 @@ class OfferAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at', 'product__category')
     search_fields = ('product__title', 'buyer__username', 'message')
     ordering = ('-created_at',)
+    list_select_related = ('product__seller', 'buyer')
+    autocomplete_fields = ('product', 'buyer')
     
     fieldsets = (
         ('Offer Information', {
@@ -216,11 +220,6 @@ class OfferAdmin(admin.ModelAdmin):
             count += 1
         self.message_user(request, f'{count} offers were rejected.')
     reject_offers.short_description = "Reject selected offers"
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'product', 'buyer'
-        )
 
 
 @admin.register(Favorite)
@@ -229,11 +228,19 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'product__category')
     search_fields = ('user__username', 'product__title')
     ordering = ('-created_at',)
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'user', 'product'
-        )
+    list_select_related = ('user', 'product__seller')
+    autocomplete_fields = ('user', 'product')
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'query', 'category', 'alerts_enabled', 'last_match_at', 'created_at')
+    list_filter = ('alerts_enabled', 'created_at')
+    search_fields = ('user__username', 'name', 'query')
+    readonly_fields = ('anchor', 'last_match_at', 'created_at', 'updated_at')
+    autocomplete_fields = ('user', 'category')
+    ordering = ('-created_at',)
+    list_select_related = ('user', 'category')
 
 
 @admin.register(ProductRating)
@@ -242,6 +249,8 @@ class ProductRatingAdmin(admin.ModelAdmin):
     list_filter = ('rating', 'created_at', 'product__category')
     search_fields = ('product__title', 'user__username', 'review')
     ordering = ('-created_at',)
+    list_select_related = ('product__seller', 'user')
+    autocomplete_fields = ('product', 'user')
     
     fieldsets = (
         ('Rating Information', {
@@ -254,11 +263,6 @@ class ProductRatingAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ('created_at', 'updated_at')
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'product', 'user'
-        )
 
 
 @admin.register(ProductReport)
@@ -270,6 +274,8 @@ class ProductReportAdmin(admin.ModelAdmin):
     list_filter = ('report_type', 'status', 'created_at')
     search_fields = ('product__title', 'reporter__username', 'description')
     ordering = ('-created_at',)
+    list_select_related = ('product__seller', 'reporter', 'reviewed_by')
+    autocomplete_fields = ('product', 'reporter', 'reviewed_by')
     
     fieldsets = (
         ('Report Information', {
@@ -311,11 +317,6 @@ class ProductReportAdmin(admin.ModelAdmin):
             count += 1
         self.message_user(request, f'{count} reports were dismissed.')
     dismiss_reports.short_description = "Dismiss selected reports"
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'reporter', 'product', 'reviewed_by'
-        )
 
 
 # Custom admin site configuration
@@ -0,0 +1,121 @@
+"""
+Facet counts for product listings: how many visible products match each
+category, condition, price bucket, city and country, returned next to the
+results so a filter sidebar needs no extra requests.
+
+Each facet is counted with every active filter applied except its own, so
+picking a category still shows how many products the other categories
+have. A facet is one grouped aggregation (price buckets are one
+conditional aggregate), and the whole set is cached per query signature
+for FACET_CACHE_TTL seconds.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Product
+
+# (min, max) price ranges; min inclusive, max exclusive, None is open-ended
+PRICE_BUCKETS = [
+    (None, 25), (25, 50), (50, 100), (100, 250), (250, 500), (500, 1000), (1000, None),
+]
+
+# Query parameters each facet filters on, which its own counts ignore
+FACET_PARAMS = {
+    'category': ('category',),
+    'condition': ('condition',),
+    'price': ('min_price', 'max_price'),
+    'city': ('city',),
+    'country': ('country',),
+}
+
+# Parameters that change neither the matching products nor the counts
+IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'sort_by', 'facets', 'format'}
+
+# Most common values listed for free-text facets
+TOP_LOCATIONS = 20
+
+
+def without_facet(params, facet):
+    """Copy of the query params with the facet's own filters removed"""
+    params = params.copy()
+    for key in FACET_PARAMS[facet]:
+        params.pop(key, None)
+    return params
+
+
+def signature(scope, params):
+    normalized = {}
+    for key in sorted(params):
+        if key in IGNORED_PARAMS:
+            continue
+        values = params.getlist(key) if hasattr(params, 'getlist') else [params[key]]
+        normalized[key] = sorted(str(value).strip().lower() for value in values)
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f'facets:v1:{scope}:{digest}'
+
+
+def facet_counts(scope, params, queryset_for):
+    """
+    Counts for every facet. queryset_for(facet) must return the visible
+    products matching the request's filters except that facet's own.
+    """
+    key = signature(scope, params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = {
+            'category': _category_counts(queryset_for('category')),
+            'condition': _condition_counts(queryset_for('condition')),
+            'price': _price_counts(queryset_for('price')),
+            'city': _value_counts(queryset_for('city'), 'city'),
+            'country': _value_counts(queryset_for('country'), 'country'),
+        }
+        cache.set(key, facets, settings.FACET_CACHE_TTL)
+    return facets
+
+
+def _category_counts(queryset):
+    rows = (
+        queryset.order_by().values('category_id', 'category__name')
+        .annotate(count=Count('id')).order_by('-count', 'category__name')
+    )
+    return [
+        {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']}
+        for row in rows
+    ]
+
+
+def _condition_counts(queryset):
+    labels = dict(Product.CONDITION_CHOICES)
+    rows = queryset.order_by().values('condition').annotate(count=Count('id')).order_by('-count')
+    return [
+        {'value': row['condition'], 'label': labels.get(row['condition'], row['condition']), 'count': row['count']}
+        for row in rows
+    ]
+
+
+def _price_counts(queryset):
+    buckets = {}
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        buckets[f'bucket_{index}'] = Count('id', filter=condition)
+    counts = queryset.order_by().aggregate(**buckets)
+    return [
+        {'min': low, 'max': high, 'count': counts[f'bucket_{index}']}
+        for index, (low, high) in enumerate(PRICE_BUCKETS)
+    ]
+
+
+def _value_counts(queryset, field):
+    rows = (
+        queryset.order_by().exclude(**{field: ''}).values(field)
+        .annotate(count=Count('id')).order_by('-count', field)[:TOP_LOCATIONS]
+    )
+    return [{'value': row[field], 'count': row['count']} for row in rows]
@@ -0,0 +1,124 @@
+"""
+Geohash helpers for nearby-listing search. A product's coordinates are
+stored as a geohash on save; a search covers the query point's geohash cell
+and its eight neighbours at a precision whose cells are at least as large
+as the search radius, so the database can answer it with indexed prefix
+matches. Candidates are then checked with the exact haversine distance.
+Works the same on SQLite and PostgreSQL.
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            interval[0] = mid
+        else:
+            value *= 2
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covered_radius_km(latitude, precision):
+    """
+    Distance from a point that the 3x3 block of cells around it is
+    guaranteed to contain: one cell in every direction, with the width
+    measured at the block's widest latitude.
+    """
+    height, width = cell_size(precision)
+    edge_latitude = min(90.0, abs(latitude) + 2 * height)
+    return min(height * KM_PER_DEGREE_LAT, width * KM_PER_DEGREE_LON * math.cos(math.radians(edge_latitude)))
+
+
+def precision_for_radius(latitude, radius_km):
+    """The finest precision whose 3x3 block still covers radius_km, or 0 if none does"""
+    for precision in range(PRECISION, 0, -1):
+        if covered_radius_km(latitude, precision) >= radius_km:
+            return precision
+    return 0
+
+
+def neighbours(latitude, longitude, precision):
+    """The geohash cell of a point and the eight cells around it"""
+    height, width = cell_size(precision)
+    cells = set()
+    for d_lat in (-height, 0, height):
+        lat = max(-90.0, min(90.0, latitude + d_lat))
+        for d_lon in (-width, 0, width):
+            lon = (longitude + d_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) around a circle; longitude is None when it wraps"""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+    d_lon = radius_km / (KM_PER_DEGREE_LON * math.cos(math.radians(max(abs(min_lat), abs(max_lat)))))
+    min_lon, max_lon = longitude - d_lon, longitude + d_lon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def prefix_range(prefix):
+    """
+    [low, high) bounds of every geohash starting with prefix, so prefix
+    matches can use a plain B-tree range scan on any backend. high is None
+    when the prefix is all 'z'.
+    """
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return prefix, ''.join(chars)
+        chars.pop()
+    return prefix, None
+
+
+def cell_ranges(latitude, longitude, precision):
+    """prefix_range() of each cell around a point, with adjacent ranges merged"""
+    ranges = []
+    for cell in neighbours(latitude, longitude, precision):
+        low, high = prefix_range(cell)
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
@@ -0,0 +1,112 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from products import geo
+from products.models import Category, Product
+from users.models import User
+
+PREFIX = 'bench_geo_'
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark nearby search: loads synthetic located listings (clustered around cities, "
+        "plus a uniform background), then times radius and k-nearest queries through the "
+        "geohash index against a bounding-box-only scan. Use --keep to reuse the listings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--radius", type=float, default=10.0, help="Radius in km for radius queries.")
+        parser.add_argument("--k", type=int, default=20, help="Results per k-nearest query.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="Keep the listings for the next run.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cities = [(rng.uniform(-40, 60), rng.uniform(-120, 140)) for _ in range(50)]
+
+        seller = User.objects.filter(username=f'{PREFIX}seller').first()
+        if seller is None:
+            seller = self.create_listings(options["listings"], cities, rng)
+        else:
+            self.stdout.write(f"Reusing {Product.objects.filter(seller=seller).count()} existing listings")
+
+        try:
+            # The same filter the endpoint uses, so run this on a database without other located listings
+            queryset = Product.objects.filter(is_active=True, status='active', is_verified=True)
+            points = [self.query_point(cities, rng) for _ in range(options["queries"])]
+            radius, k = options["radius"], options["k"]
+
+            self.report("radius (geohash)", points, lambda lat, lon: Product.nearby(
+                lat, lon, radius_km=radius, limit=10_000, queryset=queryset))
+            self.report("radius (bbox only)", points, lambda lat, lon: Product._within(
+                queryset, lat, lon, radius, 0))
+            self.report(f"k={k} nearest (geohash)", points, lambda lat, lon: Product.nearby(
+                lat, lon, limit=k, queryset=queryset))
+        finally:
+            if not options["keep"]:
+                self.delete_listings(seller)
+
+    def query_point(self, cities, rng):
+        lat, lon = rng.choice(cities)
+        return lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)
+
+    def create_listings(self, count, cities, rng):
+        if count <= 0:
+            raise CommandError("--listings must be positive")
+        seller = User.objects.create(username=f'{PREFIX}seller', user_type='seller')
+        category = Category.objects.create(name=f'{PREFIX}category')
+
+        start = time.perf_counter()
+        batch = []
+        for i in range(count):
+            if rng.random() < 0.8:
+                city_lat, city_lon = rng.choice(cities)
+                lat = max(-89.9, min(89.9, rng.gauss(city_lat, 0.3)))
+                lon = (rng.gauss(city_lon, 0.3) + 180) % 360 - 180
+            else:
+                lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            lat, lon = round(lat, 6), round(lon, 6)
+            batch.append(Product(
+                seller=seller, category=category, title=f'{PREFIX}{i}', description='-',
+                condition='good', price=Decimal('10'), location='-', city='-', country='-',
+                latitude=Decimal(str(lat)), longitude=Decimal(str(lon)), geohash=geo.encode(lat, lon),
+                status='active', is_verified=True,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+        self.stdout.write(f"Created {count} listings in {time.perf_counter() - start:.1f}s")
+        return seller
+
+    def delete_listings(self, seller):
+        # The listings have no related rows, so skip the ORM's cascade collection
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Product._meta.db_table} WHERE seller_id = %s', [seller.pk])
+        seller.delete()
+        Category.objects.filter(name=f'{PREFIX}category').delete()
+
+    def report(self, label, points, search):
+        timings, found = [], 0
+        for lat, lon in points:
+            start = time.perf_counter()
+            found += len(search(lat, lon))
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{label:<24} p50={_percentile(timings, 50):8.2f} ms  p95={_percentile(timings, 95):8.2f} ms  "
+            f"p99={_percentile(timings, 99):8.2f} ms  avg results={found / len(points):.1f}"
+        )
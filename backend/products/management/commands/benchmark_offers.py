@@ -0,0 +1,140 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.utils import timezone
+
+from products.models import Category, Offer, Product
+from users.models import User
+
+PREFIX = 'bench_offers_'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the offer engine: concurrent accepts racing on one product (exactly one must win) "
+        "and batch expiry throughput. Creates and deletes its own fixture rows; run it against a "
+        "scratch PostgreSQL database, since SQLite serializes writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=50, help="Competing offers on the raced product.")
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent accept attempts.")
+        parser.add_argument("--expire", type=int, default=5000, help="Offers to create for the expiry run.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f"Leftover {PREFIX}* users found; delete them before benchmarking.")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("SQLite serializes writers; accept latencies will not reflect PostgreSQL."))
+
+        try:
+            seller, buyers, category = self.create_fixtures(max(options["offers"], options["threads"]))
+            self.benchmark_accept(seller, buyers, category, options["offers"], options["threads"])
+            self.benchmark_expiry(seller, buyers, category, options["expire"], options["batch_size"])
+        finally:
+            Product.objects.filter(seller__username__startswith=PREFIX).delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Category.objects.filter(name__startswith=PREFIX).delete()
+
+    def create_fixtures(self, buyer_count):
+        seller = User.objects.create(
+            username=f'{PREFIX}seller', user_type='seller',
+            verification_status='verified', account_approved=True,
+        )
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}buyer{i}', user_type='buyer') for i in range(buyer_count)
+        ])
+        buyers = list(User.objects.filter(username__startswith=f'{PREFIX}buyer').order_by('id'))
+        category = Category.objects.create(name=f'{PREFIX}category')
+        return seller, buyers, category
+
+    def create_product(self, seller, category, title):
+        return Product.objects.create(
+            seller=seller, category=category, title=title, description=title,
+            condition='good', price=Decimal('100'), location='-', city='-', country='-',
+            is_verified=True,
+        )
+
+    def benchmark_accept(self, seller, buyers, category, offer_count, thread_count):
+        product = self.create_product(seller, category, f'{PREFIX}raced')
+        Offer.objects.bulk_create([
+            Offer(product=product, buyer=buyer, amount=Decimal('90'), expires_at=timezone.now() + timedelta(days=1))
+            for buyer in buyers[:offer_count]
+        ])
+        offer_ids = list(Offer.objects.filter(product=product).values_list('id', flat=True))
+
+        barrier = threading.Barrier(thread_count)
+        results = []
+        lock = threading.Lock()
+
+        def attempt(offer_id):
+            try:
+                barrier.wait()
+                start = time.perf_counter()
+                try:
+                    Offer.objects.get(pk=offer_id).accept()
+                    won = True
+                except ValueError:
+                    won = False
+                except DatabaseError:
+                    # e.g. SQLite's "database is locked"; counted separately
+                    won = None
+                with lock:
+                    results.append((won, time.perf_counter() - start))
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=attempt, args=(offer_ids[i % len(offer_ids)],))
+            for i in range(thread_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = sum(1 for won, _ in results if won)
+        errors = sum(1 for won, _ in results if won is None)
+        statuses = dict(
+            (status, Offer.objects.filter(product=product, status=status).count())
+            for status in ('accepted', 'rejected', 'pending')
+        )
+        latencies = sorted(duration * 1000 for _, duration in results)
+        self.stdout.write(
+            f"Accept race: {thread_count} threads, {len(offer_ids)} offers -> {winners} winner(s), "
+            f"statuses {statuses}, {errors} database error(s)"
+        )
+        if latencies:
+            self.stdout.write(
+                f"  accept latency ms: median={statistics.median(latencies):.1f} max={latencies[-1]:.1f}"
+            )
+        if winners != 1 or statuses['accepted'] != 1 or statuses['pending'] != 0:
+            self.stdout.write(self.style.ERROR("  FAILED: expected exactly one accepted offer and none pending"))
+        else:
+            self.stdout.write(self.style.SUCCESS("  OK: exactly one offer accepted"))
+
+    def benchmark_expiry(self, seller, buyers, category, count, batch_size):
+        past = timezone.now() - timedelta(minutes=1)
+        products = [
+            self.create_product(seller, category, f'{PREFIX}expiry{i}')
+            for i in range(max(1, count // len(buyers) + 1))
+        ]
+        offers = [
+            Offer(product=products[i // len(buyers)], buyer=buyers[i % len(buyers)], amount=Decimal('50'), expires_at=past)
+            for i in range(count)
+        ]
+        Offer.objects.bulk_create(offers, batch_size=1000)
+
+        start = time.perf_counter()
+        expired = Offer.expire_due(batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Expiry: {expired} offers in {elapsed:.2f}s ({expired / elapsed if elapsed else 0:.0f} offers/s, "
+            f"batch size {batch_size})"
+        )
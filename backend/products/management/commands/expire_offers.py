@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Offer
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire pending offers past their expiry, and accepted ones nobody ordered from in time, and notify the "
+        "buyers. Run periodically (e.g. every 5 minutes from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="How many offers to expire per UPDATE.")
+
+    def handle(self, *args, **options):
+        expired = Offer.expire_due(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} offers."))
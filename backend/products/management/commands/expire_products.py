@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Hide active listings past their expiry date and notify their sellers. "
+        "Run periodically (e.g. every 10 minutes from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="How many listings to expire per UPDATE.")
+
+    def handle(self, *args, **options):
+        expired = Product.expire_due(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} listings."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.models import VerifiedProductQueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit newly verified products into the similar-product lists and alert matching saved searches. "
+        "Run periodically (e.g. every minute from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="How many products to process per transaction.")
+
+    def handle(self, *args, **options):
+        processed = VerifiedProductQueue.process(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} verified products."))
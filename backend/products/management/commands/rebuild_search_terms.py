@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import suggest
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute search suggestions from the visible products, refreshing their popularity weights. "
+        "Run periodically (e.g. hourly from cron)."
+    )
+
+    def handle(self, *args, **options):
+        terms = suggest.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {terms} search terms."))
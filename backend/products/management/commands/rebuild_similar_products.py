@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the similar products of every visible product from their text, category and price. "
+        "Run nightly from cron; in between, process_verified_products fits in newly verified products."
+    )
+
+    def handle(self, *args, **options):
+        listed = similar.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Stored similar products for {listed} products."))
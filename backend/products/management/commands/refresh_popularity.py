@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the decayed popularity and trending scores of visible products and republish "
+        "the popular and trending rankings. Run periodically (e.g. every 10 minutes from cron)."
+    )
+
+    def handle(self, *args, **options):
+        scored = popularity.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} products."))
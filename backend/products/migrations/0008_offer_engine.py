@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:17
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def prepare_pending_offers(apps, schema_editor):
+    """Give pending offers an expiry and keep only each buyer's latest pending offer per product"""
+    Offer = apps.get_model('products', 'Offer')
+    now = timezone.now()
+    Offer.objects.filter(status='pending', expires_at__isnull=True).update(
+        expires_at=now + timedelta(hours=settings.OFFER_EXPIRY_HOURS)
+    )
+    
+    latest = (
+        Offer.objects.filter(status='pending')
+        .values('product_id', 'buyer_id')
+        .annotate(latest_id=Max('id'))
+        .values_list('latest_id', flat=True)
+    )
+    Offer.objects.filter(status='pending').exclude(id__in=list(latest)).update(status='expired', updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_is_verified_product_rejection_reason_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(prepare_pending_offers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['product', 'status'], name='offers_product_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['status', 'expires_at'], name='offers_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='offer',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('product', 'buyer'), name='offers_one_pending_per_buyer'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:21
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_offer_summary(apps, schema_editor):
+    Offer = apps.get_model('products', 'Offer')
+    Product = apps.get_model('products', 'Product')
+    offers = Offer.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    pending = offers.filter(status='pending')
+    Product.objects.filter(pk__in=Offer.objects.values('product_id')).update(
+        pending_offers_count=Coalesce(Subquery(pending.annotate(n=Count('id')).values('n')), 0),
+        highest_offer=Subquery(pending.annotate(top=Max('amount')).values('top')),
+        last_offer_at=Subquery(offers.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_offer_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='highest_offer',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='last_offer_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='pending_offers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_offer_summary, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['seller', '-last_offer_at'], name='products_offer_inbox_idx'),
+        ),
+    ]
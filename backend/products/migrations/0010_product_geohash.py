@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+from products import geo
+
+
+def backfill_geohash(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    located = Product.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for product_id, latitude, longitude in located.values_list('id', 'latitude', 'longitude').iterator(chunk_size=1000):
+        batch.append(Product(pk=product_id, geohash=geo.encode(float(latitude), float(longitude))))
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_offer_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:45
+
+from django.db import migrations, models
+
+from products.suggest import rebuild_terms
+
+
+def backfill_search_terms(apps, schema_editor):
+    rebuild_terms(apps.get_model('products', 'Product'), apps.get_model('products', 'SearchTerm'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=200)),
+                ('text', models.CharField(max_length=200)),
+                ('kind', models.CharField(choices=[('title', 'Title'), ('brand', 'Brand'), ('model', 'Model'), ('category', 'Category')], max_length=20)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('weight', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'search_terms',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'kind'), name='search_terms_term_kind_uniq'),
+        ),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
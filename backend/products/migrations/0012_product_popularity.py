@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_search_terms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPopularity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='products.product')),
+                ('popular_score', models.FloatField(default=0)),
+                ('trending_score', models.FloatField(default=0)),
+                ('views_seen', models.PositiveIntegerField(default=0)),
+                ('scored_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'product_popularity',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['created_at'], name='favorites_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['created_at'], name='offers_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='productpopularity',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category'),
+        ),
+        migrations.AddIndex(
+            model_name='productpopularity',
+            index=models.Index(fields=['-popular_score'], name='popularity_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productpopularity',
+            index=models.Index(fields=['-trending_score'], name='popularity_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productpopularity',
+            index=models.Index(fields=['category', '-popular_score'], name='popularity_cat_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productpopularity',
+            index=models.Index(fields=['category', '-trending_score'], name='popularity_cat_trending_idx'),
+        ),
+    ]
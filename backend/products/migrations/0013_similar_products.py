@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_products', to='products.product')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='products.product')),
+            ],
+            options={
+                'db_table': 'similar_products',
+                'ordering': ['product', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='similar_products_rank_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:04
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Listings already past their period get this long before the first sweep hides them
+GRACE_DAYS = 7
+
+
+def backfill_expires_at(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    live = Product.objects.filter(status='active', expires_at__isnull=True)
+    live.update(expires_at=Coalesce('verified_at', 'created_at') + timedelta(days=settings.PRODUCT_LISTING_DAYS))
+    grace = timezone.now() + timedelta(days=GRACE_DAYS)
+    Product.objects.filter(status='active', expires_at__lt=grace).update(expires_at=grace)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'expires_at'], name='products_expiry_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:09
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    ProductReport = apps.get_model('products', 'ProductReport')
+    ProductReportSummary = apps.get_model('products', 'ProductReportSummary')
+    summaries = {}
+    rows = ProductReport.objects.order_by().values('product_id', 'report_type', 'status').annotate(
+        n=Count('id'), last=Max('created_at')
+    )
+    for row in rows:
+        summary = summaries.setdefault(row['product_id'], ProductReportSummary(product_id=row['product_id']))
+        summary.total_count += row['n']
+        if row['status'] == 'pending':
+            summary.open_count += row['n']
+            field = f"{row['report_type']}_reports"
+            if hasattr(summary, field):
+                setattr(summary, field, getattr(summary, field) + row['n'])
+        if summary.last_reported_at is None or row['last'] > summary.last_reported_at:
+            summary.last_reported_at = row['last']
+    ProductReportSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_product_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductReportSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_summary', serialize=False, to='products.product')),
+                ('irrelevant_reports', models.PositiveIntegerField(default=0)),
+                ('harassment_reports', models.PositiveIntegerField(default=0)),
+                ('spam_reports', models.PositiveIntegerField(default=0)),
+                ('inappropriate_reports', models.PositiveIntegerField(default=0)),
+                ('fake_reports', models.PositiveIntegerField(default=0)),
+                ('fraud_reports', models.PositiveIntegerField(default=0)),
+                ('duplicate_reports', models.PositiveIntegerField(default=0)),
+                ('other_reports', models.PositiveIntegerField(default=0)),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('last_reported_at', models.DateTimeField(blank=True, null=True)),
+                ('escalated_at', models.DateTimeField(blank=True, null=True)),
+                ('hidden_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'product_report_summaries',
+                'indexes': [models.Index(fields=['-open_count', '-last_reported_at'], name='report_summaries_queue_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
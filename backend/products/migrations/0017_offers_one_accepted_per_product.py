@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:49
+
+from django.db import migrations, models
+
+
+def reject_extra_accepted_offers(apps, schema_editor):
+    # Keep the first offer accepted on each product, preferring one an order was placed from
+    Offer = apps.get_model('products', 'Offer')
+    Order = apps.get_model('orders', 'Order')
+    ordered = set(Order.objects.exclude(accepted_offer=None).values_list('accepted_offer_id', flat=True))
+    kept, extra = {}, []
+    for offer_id, product_id in Offer.objects.filter(status='accepted').order_by('updated_at', 'id').values_list('id', 'product_id'):
+        if product_id not in kept:
+            kept[product_id] = offer_id
+        elif offer_id in ordered and kept[product_id] not in ordered:
+            extra.append(kept[product_id])
+            kept[product_id] = offer_id
+        else:
+            extra.append(offer_id)
+    Offer.objects.filter(id__in=extra).update(status='rejected')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_product_report_summaries'),
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_extra_accepted_offers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='offer',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'accepted')), fields=('product',), name='offers_one_accepted_per_product'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_offers_one_accepted_per_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerifiedProductQueue',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='products.product')),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'verified_product_queue',
+                'indexes': [models.Index(fields=['queued_at'], name='verified_queue_queued_idx')],
+            },
+        ),
+    ]
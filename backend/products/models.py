@@ -1,7 +1,18 @@
-from django.db import models
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from users.models import User
 
+from . import geo, similar, suggest
+
 
 class Category(models.Model):
     """Product categories"""
@@ -44,6 +55,9 @@ class Product(models.Model):
         ('pending_verification', 'Pending Verification'),  # New status
     ]
     
+    # Fields behind search_state(); see SearchTerm
+    SEARCH_STATE_FIELDS = {'title', 'brand', 'model', 'category_id', 'status', 'is_active', 'is_verified'}
+    
     # Basic product information
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
@@ -64,6 +78,8 @@ class Product(models.Model):
     country = models.CharField(max_length=100)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    # Derived from latitude/longitude on save; indexed for nearby search
+    geohash = models.CharField(max_length=geo.PRECISION, blank=True, null=True, db_index=True, editable=False)
     
     # Shipping options
     shipping_options = models.JSONField(default=list)  # ['post', 'pickup', 'delivery']
@@ -89,6 +105,11 @@ class Product(models.Model):
     views_count = models.PositiveIntegerField(default=0)
     favorites_count = models.PositiveIntegerField(default=0)
     
+    # Offer summary for the seller's inbox, kept up to date by Offer
+    pending_offers_count = models.PositiveIntegerField(default=0)
+    highest_offer = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    last_offer_at = models.DateTimeField(blank=True, null=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -101,16 +122,97 @@ class Product(models.Model):
     class Meta:
         db_table = 'products'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['seller', '-last_offer_at'], name='products_offer_inbox_idx'),
+            models.Index(fields=['status', 'expires_at'], name='products_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.seller.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.SEARCH_STATE_FIELDS.issubset(field_names):
+            # Remember what the row contributed to search suggestions
+            instance._search_state = instance.search_state()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        
+        old_state = None if self._state.adding else getattr(self, '_search_state', False)
+        super().save(*args, **kwargs)
+        
+        # Rows loaded without the search fields are left to rebuild_search_terms
+        new_state = self.search_state()
+        if old_state is not False and old_state != new_state:
+            SearchTerm.product_changed(self, old_state, new_state)
+        self._search_state = new_state
+    
+    def search_state(self):
+        """The fields that decide which suggestion terms this product contributes"""
+        return (self.is_available(), self.title, self.brand, self.model, self.category_id)
+    
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return geo.encode(float(self.latitude), float(self.longitude))
+    
+    @classmethod
+    def nearby(cls, latitude, longitude, radius_km=None, limit=20, queryset=None):
+        """
+        (product_id, distance_km) pairs nearest first, at most `limit`.
+        With radius_km, only products within it; without, the `limit`
+        nearest anywhere, widening the search cell by cell until they are
+        certain.
+        """
+        queryset = (cls.objects.all() if queryset is None else queryset).filter(geohash__isnull=False)
+        if radius_km is not None:
+            precision = geo.precision_for_radius(latitude, radius_km)
+            return cls._within(queryset, latitude, longitude, radius_km, precision)[:limit]
+        
+        for precision in range(7, -1, -1):
+            radius = geo.covered_radius_km(latitude, precision) if precision else None
+            found = cls._within(queryset, latitude, longitude, radius, precision)
+            if len(found) >= limit or not precision:
+                return found[:limit]
+    
+    @staticmethod
+    def _within(queryset, latitude, longitude, radius_km, precision):
+        if precision:
+            cells = Q()
+            for low, high in geo.cell_ranges(latitude, longitude, precision):
+                cells |= Q(geohash__gte=low, geohash__lt=high) if high else Q(geohash__gte=low)
+            queryset = queryset.filter(cells)
+        if radius_km is not None:
+            min_lat, max_lat, min_lon, max_lon = geo.bounding_box(latitude, longitude, radius_km)
+            queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+            if min_lon is not None:
+                queryset = queryset.filter(longitude__range=(min_lon, max_lon))
+        
+        found = []
+        rows = queryset.order_by().values_list('id', 'latitude', 'longitude')
+        for product_id, lat, lon in rows.iterator(chunk_size=2000):
+            distance = geo.haversine_km(latitude, longitude, float(lat), float(lon))
+            if radius_km is None or distance <= radius_km:
+                found.append((product_id, distance))
+        found.sort(key=lambda pair: pair[1])
+        return found
+    
     def increment_views(self):
         self.views_count += 1
         self.save(update_fields=['views_count'])
     
     def get_main_image(self):
         """Get the main product image"""
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            # Pick from prefetched images instead of querying per product
+            images = sorted(self.images.all(), key=lambda image: image.pk)
+            return next((image for image in images if image.is_main), None) or next(iter(images), None)
         return self.images.filter(is_main=True).first() or self.images.first()
     
     def get_all_images(self):
@@ -134,8 +236,10 @@ class Product(models.Model):
         self.verification_notes = notes
         self.status = 'active'  # Set to active when verified
         self.rejection_reason = None  # Clear any previous rejection reason
+        self.expires_at = self.verified_at + timedelta(days=settings.PRODUCT_LISTING_DAYS)
         self.save(update_fields=['is_verified', 'verified_by', 'verified_at', 
-                                'verification_notes', 'status', 'rejection_reason'])
+                                'verification_notes', 'status', 'rejection_reason', 'expires_at'])
+        VerifiedProductQueue.add([self.pk])
     
     def reject_product(self, admin_user, reason):
         """Reject the product with a reason"""
@@ -148,6 +252,120 @@ class Product(models.Model):
         self.save(update_fields=['is_verified', 'verified_by', 'verified_at', 
                                 'status', 'rejection_reason'])
     
+    @classmethod
+    def verify_many(cls, product_ids, admin_user, notes=None):
+        """
+        Verify the given products that are not verified yet with one UPDATE
+        (what verify_product does to each). Returns (id, seller_id,
+        title) of the products verified.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            pending = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=product_ids, is_verified=False)
+                .values_list('id', 'seller_id', 'title')
+            )
+            ids = [product_id for product_id, _, _ in pending]
+            cls.objects.filter(pk__in=ids).update(
+                is_verified=True, verified_by=admin_user, verified_at=now, verification_notes=notes,
+                status='active', rejection_reason=None, updated_at=now,
+                expires_at=now + timedelta(days=settings.PRODUCT_LISTING_DAYS),
+            )
+            SearchTerm.products_shown(ids)
+            VerifiedProductQueue.add(ids)
+        return pending
+    
+    @classmethod
+    def reject_many(cls, product_ids, admin_user, reason):
+        """
+        Reject the given products that are awaiting verification with one
+        UPDATE (what reject_product does to each). Live listings are left
+        alone. Returns (id, seller_id, title) of the products rejected.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            rejected = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=product_ids, status='pending_verification')
+                .values_list('id', 'seller_id', 'title')
+            )
+            ids = [product_id for product_id, _, _ in rejected]
+            cls.objects.filter(pk__in=ids).update(
+                is_verified=False, verified_by=admin_user, verified_at=now,
+                status='inactive', rejection_reason=reason, updated_at=now,
+            )
+        return rejected
+    
+    def can_renew(self):
+        """Sellers can renew verified listings that are live or have expired"""
+        return self.is_verified and self.is_active and self.status in ('active', 'expired')
+    
+    def renew(self):
+        """Keep the listing up for another PRODUCT_LISTING_DAYS, bringing it back if it expired"""
+        self.expires_at = timezone.now() + timedelta(days=settings.PRODUCT_LISTING_DAYS)
+        self.status = 'active'
+        self.save(update_fields=['expires_at', 'status'])
+    
+    @classmethod
+    def expire_due(cls, now=None, batch_size=1000):
+        """
+        Mark active listings past expires_at as expired, a batch per UPDATE,
+        and tell each seller once per batch. Returns the number expired.
+        """
+        from chat.models import Notification
+        now = now or timezone.now()
+        expired = 0
+        
+        while True:
+            with transaction.atomic():
+                due = list(
+                    cls.objects.select_for_update(skip_locked=True)
+                    .filter(status='active', expires_at__lte=now)
+                    .values_list('id', 'seller_id', 'title')
+                    .order_by('expires_at')[:batch_size]
+                )
+                if not due:
+                    break
+                ids = [product_id for product_id, _, _ in due]
+                SearchTerm.products_hidden(ids)
+                cls.objects.filter(id__in=ids).update(status='expired', updated_at=now)
+                
+                by_seller = {}
+                for product_id, seller_id, title in due:
+                    by_seller.setdefault(seller_id, []).append((product_id, title))
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=seller_id,
+                        notification_type='product_expired',
+                        title='Your listing expired' if len(listings) == 1 else f'{len(listings)} of your listings expired',
+                        message=(
+                            f'"{listings[0][1]}" is no longer shown to buyers. Renew it to list it again.'
+                            if len(listings) == 1 else
+                            'They are no longer shown to buyers. Renew them from My Products to list them again.'
+                        ),
+                        related_product_id=listings[0][0] if len(listings) == 1 else None,
+                    )
+                    for seller_id, listings in by_seller.items()
+                ])
+            expired += len(due)
+        return expired
+    
+    @classmethod
+    def refresh_offer_summary(cls, product_ids):
+        """
+        Recompute the offer summary of the given products in one UPDATE.
+        Needed when offers stop being pending, since the highest pending
+        amount cannot be maintained by decrementing.
+        """
+        offers = Offer.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        pending = offers.filter(status='pending')
+        cls.objects.filter(pk__in=set(product_ids)).update(
+            pending_offers_count=Coalesce(Subquery(pending.annotate(n=Count('id')).values('n')), 0),
+            highest_offer=Subquery(pending.annotate(top=Max('amount')).values('top')),
+            last_offer_at=Subquery(offers.annotate(last=Max('created_at')).values('last')),
+        )
+    
     def update_rating(self):
         """Update product average rating based on all ratings"""
         from django.db.models import Avg
@@ -162,6 +380,224 @@ class Product(models.Model):
         self.save(update_fields=['average_rating', 'total_ratings'])
 
 
+class SearchTerm(models.Model):
+    """A search suggestion: a normalized title, brand, model or category name of visible products"""
+    KIND_CHOICES = [
+        ('title', 'Title'),
+        ('brand', 'Brand'),
+        ('model', 'Model'),
+        ('category', 'Category'),
+    ]
+    
+    term = models.CharField(max_length=suggest.TERM_LENGTH)
+    text = models.CharField(max_length=suggest.TERM_LENGTH)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    product_count = models.PositiveIntegerField(default=0)
+    weight = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'search_terms'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'kind'], name='search_terms_term_kind_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.text} ({self.kind})"
+    
+    @classmethod
+    def product_changed(cls, product, old_state, new_state):
+        """
+        Move a product's contribution from the terms of its old state to
+        those of its new one (a state is Product.search_state(); None for a
+        product that did not exist).
+        """
+        category_ids = {state[4] for state in (old_state, new_state) if state and state[0]}
+        names = dict(Category.objects.filter(pk__in=category_ids).values_list('pk', 'name')) if category_ids else {}
+        
+        def terms(state):
+            if not state or not state[0]:
+                return {}
+            _, title, brand, model, category_id = state
+            return {
+                (kind, term): text
+                for kind, term, text in suggest.product_terms(title, brand, model, names.get(category_id))
+            }
+        
+        old_terms, new_terms = terms(old_state), terms(new_state)
+        removed = set(old_terms) - set(new_terms)
+        added = set(new_terms) - set(old_terms)
+        if not (removed or added):
+            return
+        weight = suggest.popularity(product.views_count, product.favorites_count)
+        
+        with transaction.atomic():
+            for kind, term in removed:
+                cls.objects.filter(kind=kind, term=term).update(
+                    product_count=Greatest(F('product_count') - 1, Value(0)),
+                    weight=Greatest(F('weight') - weight, Value(0)),
+                )
+            if removed:
+                lookup = Q()
+                for kind, term in removed:
+                    lookup |= Q(kind=kind, term=term)
+                cls.objects.filter(lookup, product_count=0).delete()
+            for kind, term in added:
+                search_term, created = cls.objects.get_or_create(
+                    kind=kind, term=term,
+                    defaults={'text': new_terms[(kind, term)], 'product_count': 1, 'weight': weight},
+                )
+                if not created:
+                    cls.objects.filter(pk=search_term.pk).update(
+                        product_count=F('product_count') + 1, weight=F('weight') + weight
+                    )
+        
+        changed = {term for _, term in removed | added}
+        transaction.on_commit(lambda: suggest.invalidate(changed))
+    
+    @classmethod
+    def products_hidden(cls, product_ids):
+        """
+        Take the contributions of visible products that are about to be
+        hidden by a queryset update (which skips Product.save), with one
+        UPDATE per affected term.
+        """
+        changes = cls._contributions(product_ids)
+        if not changes:
+            return
+        lookup = Q()
+        for (kind, term), (_, count, weight) in changes.items():
+            cls.objects.filter(kind=kind, term=term).update(
+                product_count=Greatest(F('product_count') - count, Value(0)),
+                weight=Greatest(F('weight') - weight, Value(0)),
+            )
+            lookup |= Q(kind=kind, term=term)
+        cls.objects.filter(lookup, product_count=0).delete()
+        
+        changed = {term for _, term in changes}
+        transaction.on_commit(lambda: suggest.invalidate(changed))
+    
+    @classmethod
+    def products_shown(cls, product_ids):
+        """Add the contributions of products just made visible by a queryset update"""
+        changes = cls._contributions(product_ids)
+        missing = []
+        for (kind, term), (text, count, weight) in changes.items():
+            updated = cls.objects.filter(kind=kind, term=term).update(
+                product_count=F('product_count') + count, weight=F('weight') + weight
+            )
+            if not updated:
+                missing.append(cls(kind=kind, term=term, text=text, product_count=count, weight=weight))
+        cls.objects.bulk_create(missing)
+        
+        changed = {term for _, term in changes}
+        transaction.on_commit(lambda: suggest.invalidate(changed))
+    
+    @staticmethod
+    def _contributions(product_ids):
+        """{(kind, term): [text, product count, weight]} summed over the given products that are visible"""
+        totals = defaultdict(lambda: [None, 0, 0])
+        rows = Product.objects.filter(pk__in=product_ids, is_active=True, status='active', is_verified=True).values_list(
+            'title', 'brand', 'model', 'category__name', 'views_count', 'favorites_count'
+        )
+        for title, brand, model, category_name, views_count, favorites_count in rows:
+            weight = suggest.popularity(views_count, favorites_count)
+            for kind, term, text in suggest.product_terms(title, brand, model, category_name):
+                entry = totals[(kind, term)]
+                entry[0] = entry[0] or text
+                entry[1] += 1
+                entry[2] += weight
+        return totals
+
+
+class ProductPopularity(models.Model):
+    """Decayed popularity and trending scores of a visible product, maintained by popularity.refresh()"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    # Copied from the product so per-category rankings read one index
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    popular_score = models.FloatField(default=0)
+    trending_score = models.FloatField(default=0)
+    # The product's views_count when last scored; later views are added on the next refresh
+    views_seen = models.PositiveIntegerField(default=0)
+    scored_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'product_popularity'
+        indexes = [
+            models.Index(fields=['-popular_score'], name='popularity_popular_idx'),
+            models.Index(fields=['-trending_score'], name='popularity_trending_idx'),
+            models.Index(fields=['category', '-popular_score'], name='popularity_cat_popular_idx'),
+            models.Index(fields=['category', '-trending_score'], name='popularity_cat_trending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: popular {self.popular_score:.1f}, trending {self.trending_score:.1f}"
+
+
+class SimilarProduct(models.Model):
+    """One of a product's most similar products, maintained by the similar module"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_products')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        db_table = 'similar_products'
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='similar_products_rank_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} ~ {self.similar_id} (#{self.rank + 1})"
+
+
+class VerifiedProductQueue(models.Model):
+    """
+    Newly verified products still to be fitted into the similar-product
+    lists and matched against saved searches. Verifying only queues the
+    product; process_verified_products does the work outside the admin's
+    request.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    queued_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'verified_product_queue'
+        indexes = [
+            models.Index(fields=['queued_at'], name='verified_queue_queued_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Product {self.product_id} queued at {self.queued_at}"
+    
+    @classmethod
+    def add(cls, product_ids):
+        cls.objects.bulk_create([cls(product_id=product_id) for product_id in product_ids], ignore_conflicts=True)
+    
+    @classmethod
+    def process(cls, batch_size=100):
+        """
+        Work through the queue oldest first, a batch per transaction. Rows
+        being processed elsewhere are skipped, so several workers can run
+        at once. Returns the number of products processed.
+        """
+        processed = 0
+        while True:
+            with transaction.atomic():
+                product_ids = list(
+                    cls.objects.select_for_update(skip_locked=True)
+                    .order_by('queued_at').values_list('product_id', flat=True)[:batch_size]
+                )
+                if not product_ids:
+                    break
+                for product in Product.objects.filter(pk__in=product_ids):
+                    similar.update_product(product)
+                    SavedSearch.notify_matches(product)
+                cls.objects.filter(product_id__in=product_ids).delete()
+            processed += len(product_ids)
+        return processed
+
+
 class ProductImage(models.Model):
     """Product images"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -214,22 +650,134 @@ class Offer(models.Model):
     class Meta:
         db_table = 'offers'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'status'], name='offers_product_status_idx'),
+            models.Index(fields=['status', 'expires_at'], name='offers_expiry_idx'),
+            models.Index(fields=['created_at'], name='offers_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'buyer'],
+                condition=Q(status='pending'),
+                name='offers_one_pending_per_buyer',
+            ),
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=Q(status='accepted'),
+                name='offers_one_accepted_per_product',
+            ),
+        ]
     
     def __str__(self):
         return f"${self.amount} offer by {self.buyer.username} for {self.product.title}"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if is_new and self.expires_at is None:
+            self.expires_at = timezone.now() + timedelta(hours=settings.OFFER_EXPIRY_HOURS)
+        super().save(*args, **kwargs)
+        
+        if is_new and self.status == 'pending':
+            # Fold the new offer into the product's summary in place
+            Product.objects.filter(pk=self.product_id).update(
+                pending_offers_count=F('pending_offers_count') + 1,
+                highest_offer=Greatest(Coalesce(F('highest_offer'), Value(self.amount)), Value(self.amount)),
+                last_offer_at=self.created_at,
+            )
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Product.refresh_offer_summary([self.product_id])
+        return result
+    
     def accept(self):
-        # Only allow accepting offers for verified products
-        if not self.product.is_verified:
-            raise ValueError("Cannot accept offers for unverified products")
+        """
+        Accept this offer and reject every other pending offer on the product
+        in one statement. The product row is locked so concurrent accepts on
+        the same product are serialized and only one can win; a product never
+        has more than one accepted offer. The buyer then has the usual offer
+        window to order before expire_due releases the product. Returns the
+        (id, buyer_id) pairs of the rejected competing offers.
+        """
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(pk=self.product_id)
+            # Only allow accepting offers for verified products
+            if not product.is_verified:
+                raise ValueError("Cannot accept offers for unverified products")
+            if Offer.objects.filter(product=product, status='accepted').exists():
+                raise ValueError("Another offer on this product was already accepted")
+            
+            now = timezone.now()
+            expires_at = now + timedelta(hours=settings.OFFER_EXPIRY_HOURS)
+            if not Offer.objects.filter(pk=self.pk, status='pending').update(
+                status='accepted', updated_at=now, expires_at=expires_at
+            ):
+                raise ValueError("Offer is no longer pending")
+            
+            competing = Offer.objects.filter(product=product, status='pending').exclude(pk=self.pk)
+            rejected = list(competing.values_list('id', 'buyer_id'))
+            if rejected:
+                Offer.objects.filter(id__in=[offer_id for offer_id, _ in rejected]).update(
+                    status='rejected', updated_at=now
+                )
+            # Nothing is pending on the product any more
+            Product.objects.filter(pk=product.pk).update(pending_offers_count=0, highest_offer=None)
+        
         self.status = 'accepted'
-        self.save()
+        self.updated_at = now
+        self.expires_at = expires_at
         # Do NOT update product status to sold here
         # Product will be marked as sold only when order is approved by seller
+        return rejected
     
     def reject(self):
         self.status = 'rejected'
         self.save()
+        Product.refresh_offer_summary([self.product_id])
+    
+    @classmethod
+    def expire_due(cls, now=None, batch_size=1000):
+        """
+        Expire offers past expires_at, a batch per UPDATE, and tell their
+        buyers with one bulk insert per batch: pending offers nobody answered,
+        and accepted ones no live order was placed from, which would
+        otherwise hold the product forever. Returns the number expired.
+        """
+        from chat.models import Notification
+        from orders.models import Order
+        now = now or timezone.now()
+        expired = 0
+        live_orders = Order.objects.filter(accepted_offer=OuterRef('pk')).exclude(status__in=('cancelled', 'rejected'))
+        lapsed = Q(status='pending') | Q(status='accepted') & ~Exists(live_orders)
+        
+        while True:
+            with transaction.atomic():
+                due = list(
+                    cls.objects.select_for_update(skip_locked=True, of=('self',))
+                    .filter(lapsed, expires_at__lte=now)
+                    .values_list('id', 'buyer_id', 'product_id', 'product__title', 'amount', 'status')
+                    .order_by('expires_at')[:batch_size]
+                )
+                if not due:
+                    break
+                cls.objects.filter(id__in=[row[0] for row in due]).update(status='expired', updated_at=now)
+                Product.refresh_offer_summary(row[2] for row in due)
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=buyer_id,
+                        notification_type='offer_expired',
+                        title='Your offer expired',
+                        message=(
+                            f'Your accepted offer of ${amount} for "{title}" expired before you ordered'
+                            if offer_status == 'accepted' else
+                            f'Your offer of ${amount} for "{title}" expired without a response'
+                        ),
+                        related_product_id=product_id,
+                    )
+                    for _, buyer_id, product_id, title, amount, offer_status in due
+                ])
+            expired += len(due)
+        return expired
 
 
 class Favorite(models.Model):
@@ -241,6 +789,9 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ('user', 'product')
         db_table = 'favorites'
+        indexes = [
+            models.Index(fields=['created_at'], name='favorites_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} favorited {self.product.title}"
@@ -255,14 +806,218 @@ class Favorite(models.Model):
         
         if is_new:
             # Update product favorites count
-            self.product.favorites_count += 1
-            self.product.save(update_fields=['favorites_count'])
+            Product.objects.filter(pk=self.product_id).update(favorites_count=F('favorites_count') + 1)
+            Favorite.invalidate_ids(self.user_id)
     
     def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
         # Update product favorites count
-        self.product.favorites_count = max(0, self.product.favorites_count - 1)
-        self.product.save(update_fields=['favorites_count'])
-        super().delete(*args, **kwargs)
+        Product.objects.filter(pk=self.product_id, favorites_count__gt=0).update(
+            favorites_count=F('favorites_count') - 1
+        )
+        Favorite.invalidate_ids(self.user_id)
+        return result
+    
+    @staticmethod
+    def ids_cache_key(user_id):
+        return f'favorites:ids:v1:{user_id}'
+    
+    @classmethod
+    def ids_for(cls, user_id):
+        """The ids of every product the user has favorited, cached as a set"""
+        key = cls.ids_cache_key(user_id)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(cls.objects.filter(user_id=user_id).values_list('product_id', flat=True))
+            cache.set(key, ids, settings.FAVORITE_IDS_CACHE_TTL)
+        return ids
+    
+    @classmethod
+    def invalidate_ids(cls, user_id):
+        """Drop the user's cached favorite set once the current transaction commits"""
+        transaction.on_commit(lambda: cache.delete(cls.ids_cache_key(user_id)))
+    
+    @staticmethod
+    def recount(product_ids):
+        """
+        Reset favorites_count of the given products from the favorites table,
+        in one UPDATE. This counts every favorite of each product, so it is
+        for repairing drift; normal traffic adjusts the counters by delta.
+        """
+        favorites = Favorite.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        Product.objects.filter(pk__in=product_ids).update(
+            favorites_count=Coalesce(Subquery(favorites.annotate(n=Count('id')).values('n')), 0)
+        )
+    
+    @classmethod
+    def add_many(cls, user, product_ids):
+        """
+        Favorite several products at once. Unverified or missing products and
+        ones already favorited are skipped. Returns the ids actually added.
+        """
+        with transaction.atomic():
+            wanted = set(
+                Product.objects.filter(pk__in=product_ids, is_verified=True).values_list('pk', flat=True)
+            )
+            added = wanted - set(
+                cls.objects.filter(user=user, product_id__in=wanted).values_list('product_id', flat=True)
+            )
+            if added:
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create([cls(user=user, product_id=product_id) for product_id in added])
+                except IntegrityError:
+                    # A concurrent request favorited some of them first; add the rest and repair the counts
+                    cls.objects.bulk_create(
+                        [cls(user=user, product_id=product_id) for product_id in added], ignore_conflicts=True
+                    )
+                    cls.recount(added)
+                else:
+                    Product.objects.filter(pk__in=added).update(favorites_count=F('favorites_count') + 1)
+                cls.invalidate_ids(user.pk)
+        return added
+    
+    @classmethod
+    def remove_many(cls, user, product_ids):
+        """Unfavorite several products at once. Returns the ids actually removed."""
+        with transaction.atomic():
+            favorites = cls.objects.filter(user=user, product_id__in=product_ids)
+            removed = set(favorites.values_list('product_id', flat=True))
+            if removed:
+                deleted, _ = favorites.filter(product_id__in=removed).delete()
+                if deleted == len(removed):
+                    Product.objects.filter(pk__in=removed, favorites_count__gt=0).update(
+                        favorites_count=F('favorites_count') - 1
+                    )
+                else:
+                    # A concurrent request removed some of them first
+                    cls.recount(removed)
+                cls.invalidate_ids(user.pk)
+        return removed
+
+
+class SavedSearch(models.Model):
+    """
+    A search a user wants to hear about new listings for. Every criterion
+    left empty matches anything; the query matches listings that contain
+    each of its words in their title, description, brand or model.
+    
+    Each search is filed under one anchor key: its longest word, else its
+    category, else its condition, else 'any'. A newly visible listing only
+    looks at the searches filed under its own words, category and condition
+    (one indexed lookup), so matching cost follows the number of candidate
+    searches rather than all of them.
+    """
+    KEYWORD_LENGTH = 100
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=100, blank=True)
+    query = models.CharField(max_length=200, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    condition = models.CharField(max_length=20, choices=Product.CONDITION_CHOICES, blank=True)
+    location = models.CharField(max_length=100, blank=True)
+    alerts_enabled = models.BooleanField(default=True)
+    anchor = models.CharField(max_length=KEYWORD_LENGTH + 10, editable=False)
+    last_match_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'saved_searches'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['anchor', 'alerts_enabled'], name='saved_searches_anchor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.name or self.query or 'all listings'}"
+    
+    def save(self, *args, **kwargs):
+        self.anchor = self.compute_anchor()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'query', 'category', 'condition'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'anchor'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def keywords(cls, text):
+        return {word[:cls.KEYWORD_LENGTH] for word in re.findall(r'\w+', (text or '').lower())}
+    
+    def compute_anchor(self):
+        words = self.keywords(self.query)
+        if words:
+            return 'word:' + max(words, key=lambda word: (len(word), word))
+        if self.category_id:
+            return f'category:{self.category_id}'
+        if self.condition:
+            return f'condition:{self.condition}'
+        return 'any'
+    
+    @classmethod
+    def product_anchors(cls, product, words):
+        return [f'word:{word}' for word in words] + [
+            f'category:{product.category_id}', f'condition:{product.condition}', 'any',
+        ]
+    
+    @classmethod
+    def matching(cls, product):
+        """The enabled saved searches of other users that the product matches (an iterator)"""
+        words = cls.keywords(' '.join(filter(None, (product.title, product.description, product.brand, product.model))))
+        place = ' '.join(filter(None, (product.city, product.country, product.location))).lower()
+        candidates = (
+            cls.objects
+            .filter(anchor__in=cls.product_anchors(product, words), alerts_enabled=True)
+            .filter(Q(category__isnull=True) | Q(category_id=product.category_id))
+            .filter(Q(condition='') | Q(condition=product.condition))
+            .filter(Q(min_price__isnull=True) | Q(min_price__lte=product.price))
+            .filter(Q(max_price__isnull=True) | Q(max_price__gte=product.price))
+            .exclude(user_id=product.seller_id)
+            .only('id', 'user_id', 'name', 'query', 'location')
+            .order_by()
+        )
+        for search in candidates.iterator(chunk_size=2000):
+            # The words and location are checked here; the database did the rest
+            if cls.keywords(search.query) <= words and search.location.lower() in place:
+                yield search
+    
+    @classmethod
+    def notify_matches(cls, product, batch_size=1000):
+        """
+        Tell the owners of matching saved searches about a newly visible
+        product: one notification per user, bulk inserted a batch at a time.
+        Returns the number of users notified.
+        """
+        from chat.models import Notification
+        if not product.is_available():
+            return 0
+        now = timezone.now()
+        notified, batch, matched = set(), [], []
+        
+        def flush():
+            with transaction.atomic():
+                Notification.objects.bulk_create(batch)
+                cls.objects.filter(pk__in=matched).update(last_match_at=now)
+            batch.clear()
+            matched.clear()
+        
+        for search in cls.matching(product):
+            matched.append(search.pk)
+            if search.user_id not in notified:
+                notified.add(search.user_id)
+                batch.append(Notification(
+                    recipient_id=search.user_id,
+                    notification_type='saved_search',
+                    title='New listing for your saved search',
+                    message=f'"{product.title}" matches "{search.name or search.query or "your search"}"',
+                    related_product=product,
+                ))
+            if len(matched) >= batch_size:
+                flush()
+        if matched:
+            flush()
+        return len(notified)
 
 
 class ProductRating(models.Model):
@@ -342,26 +1097,184 @@ class ProductReport(models.Model):
     def __str__(self):
         return f"{self.get_report_type_display()} report by {self.reporter.username} for {self.product.title}"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                ProductReportSummary.record_report(self.product_id, self.report_type)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.status == 'pending':
+                ProductReportSummary.record_report(self.product_id, self.report_type, closed=True)
+        return result
+    
+    def _close(self, status, admin_user, notes):
+        with transaction.atomic():
+            was_pending = ProductReport.objects.select_for_update().filter(pk=self.pk, status='pending').exists()
+            self.status = status
+            self.reviewed_by = admin_user
+            if notes:
+                self.admin_notes = notes
+            self.save(update_fields=['status', 'reviewed_by', 'admin_notes', 'updated_at'])
+            if was_pending:
+                ProductReportSummary.record_report(
+                    self.product_id, self.report_type, closed=True, restore=status == 'dismissed'
+                )
+    
     def mark_reviewed(self, admin_user, notes=None):
         """Mark report as reviewed by admin"""
-        self.status = 'reviewed'
-        self.reviewed_by = admin_user
-        if notes:
-            self.admin_notes = notes
-        self.save(update_fields=['status', 'reviewed_by', 'admin_notes', 'updated_at'])
+        self._close('reviewed', admin_user, notes)
     
     def resolve(self, admin_user, notes=None):
         """Mark report as resolved"""
-        self.status = 'resolved'
-        self.reviewed_by = admin_user
-        if notes:
-            self.admin_notes = notes
-        self.save(update_fields=['status', 'reviewed_by', 'admin_notes', 'updated_at'])
+        self._close('resolved', admin_user, notes)
     
     def dismiss(self, admin_user, notes=None):
         """Dismiss the report"""
-        self.status = 'dismissed'
-        self.reviewed_by = admin_user
-        if notes:
-            self.admin_notes = notes
-        self.save(update_fields=['status', 'reviewed_by', 'admin_notes', 'updated_at'])
\ No newline at end of file
+        self._close('dismissed', admin_user, notes)
+
+
+class ProductReportSummary(models.Model):
+    """
+    Running report counters for a product, kept in step with its reports
+    so moderators see one row per reported listing: how many reports are
+    open in total and per type. Enough open reports escalate the listing
+    to staff (REPORT_ESCALATION_THRESHOLD) and then take it offline until
+    a moderator looks at it (REPORT_HIDE_THRESHOLD).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='report_summary')
+    
+    # Open (pending) reports per type
+    irrelevant_reports = models.PositiveIntegerField(default=0)
+    harassment_reports = models.PositiveIntegerField(default=0)
+    spam_reports = models.PositiveIntegerField(default=0)
+    inappropriate_reports = models.PositiveIntegerField(default=0)
+    fake_reports = models.PositiveIntegerField(default=0)
+    fraud_reports = models.PositiveIntegerField(default=0)
+    duplicate_reports = models.PositiveIntegerField(default=0)
+    other_reports = models.PositiveIntegerField(default=0)
+    open_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+    
+    last_reported_at = models.DateTimeField(null=True, blank=True)
+    escalated_at = models.DateTimeField(null=True, blank=True)
+    # Set when the reports took the listing offline; dismissals bring it back
+    # once the open reports fall below the escalation threshold
+    hidden_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'product_report_summaries'
+        indexes = [
+            models.Index(fields=['-open_count', '-last_reported_at'], name='report_summaries_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.open_count} open reports for product {self.product_id}"
+    
+    @property
+    def by_type(self):
+        return {
+            report_type: getattr(self, f'{report_type}_reports') for report_type, _ in ProductReport.REPORT_TYPES
+        }
+    
+    @classmethod
+    def record_report(cls, product_id, report_type, closed=False, restore=False):
+        """
+        Count a new pending report (or with closed=True, one no longer
+        pending) and apply the thresholds; see apply_thresholds() for restore.
+        """
+        summary, _ = cls.objects.select_for_update().get_or_create(product_id=product_id)
+        type_field = f'{report_type}_reports'
+        if closed:
+            setattr(summary, type_field, max(getattr(summary, type_field) - 1, 0))
+            summary.open_count = max(summary.open_count - 1, 0)
+        else:
+            setattr(summary, type_field, getattr(summary, type_field) + 1)
+            summary.open_count += 1
+            summary.total_count += 1
+            summary.last_reported_at = timezone.now()
+        summary.save()
+        summary.apply_thresholds(restore=restore)
+        return summary
+    
+    def apply_thresholds(self, restore=False):
+        """
+        Escalate or hide the listing once its open reports reach the
+        thresholds. Below the escalation threshold again the marks are
+        cleared, so a later wave of reports escalates anew, and with
+        restore=True (the reports were dismissed) a listing they took
+        offline comes back. Sellers cannot change the status of a hidden
+        listing themselves.
+        """
+        from chat.models import Notification
+        now = timezone.now()
+        product = Product.objects.get(pk=self.product_id)
+        
+        if self.open_count >= settings.REPORT_HIDE_THRESHOLD:
+            if self.hidden_at is None and product.status == 'active':
+                product.status = 'inactive'
+                product.save(update_fields=['status'])
+                self.hidden_at = now
+        elif self.hidden_at is not None and self.open_count < settings.REPORT_ESCALATION_THRESHOLD:
+            if restore and product.status == 'inactive':
+                product.status = 'active'
+                product.save(update_fields=['status'])
+            self.hidden_at = None
+        
+        if self.open_count >= settings.REPORT_ESCALATION_THRESHOLD:
+            if self.escalated_at is None:
+                self.escalated_at = now
+                hidden = ' It has been taken offline until reviewed.' if self.hidden_at else ''
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=admin_id,
+                        notification_type='report_escalated',
+                        title='Listing needs review',
+                        message=f'"{product.title}" has {self.open_count} open reports.{hidden}',
+                        related_product=product,
+                    )
+                    for admin_id in User.objects.filter(is_staff=True, is_active=True).values_list('id', flat=True)
+                ])
+        else:
+            self.escalated_at = None
+        self.save(update_fields=['hidden_at', 'escalated_at'])
+    
+    @classmethod
+    def recount(cls, product_ids):
+        """Reset the counters of the given products from their reports, in one UPDATE"""
+        reports = ProductReport.objects.filter(product=OuterRef('product_id')).order_by().values('product')
+        
+        def count(queryset):
+            return Coalesce(Subquery(queryset.annotate(n=Count('id')).values('n')), 0)
+        
+        pending = reports.filter(status='pending')
+        cls.objects.filter(product_id__in=product_ids).update(
+            open_count=count(pending),
+            total_count=count(reports),
+            **{
+                f'{report_type}_reports': count(pending.filter(report_type=report_type))
+                for report_type, _ in ProductReport.REPORT_TYPES
+            },
+        )
+    
+    @classmethod
+    def close_reports(cls, product_id, status, admin_user, notes=None):
+        """
+        Close every open report of a product at once. Dismissing them brings
+        back a listing the reports took offline. Returns how many were closed.
+        """
+        with transaction.atomic():
+            summary = cls.objects.select_for_update().filter(product_id=product_id).first()
+            if summary is None:
+                return 0
+            changes = {'status': status, 'reviewed_by': admin_user, 'updated_at': timezone.now()}
+            if notes:
+                changes['admin_notes'] = notes
+            closed = ProductReport.objects.filter(product_id=product_id, status='pending').update(**changes)
+            cls.recount([product_id])
+            summary.refresh_from_db()
+            summary.apply_thresholds(restore=status == 'dismissed')
+        return closed
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Popularity and trending rankings. Every visible product has two
+exponentially decayed scores in ProductPopularity, built from views,
+favorites, conversations and offers (POPULARITY_WEIGHTS): a popular score
+with a half-life of POPULARITY_HALF_LIFE_DAYS and a trending score with one
+of TRENDING_HALF_LIFE_HOURS.
+
+refresh() runs periodically. It decays all scores in one UPDATE, adds the
+views and events since the previous run, scores newly listed products
+from their history, then caches the top POPULARITY_LIST_SIZE product ids
+globally and per category. Endpoints read those lists rather than sorting
+products.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+KINDS = ('popular', 'trending')
+BATCH_SIZE = 1000
+
+
+def _half_lives():
+    return {
+        'popular': settings.POPULARITY_HALF_LIFE_DAYS * 24 * 60 * 60,
+        'trending': settings.TRENDING_HALF_LIFE_HOURS * 60 * 60,
+    }
+
+
+def _decay(seconds, half_life):
+    return 0.5 ** (max(seconds, 0) / half_life)
+
+
+def _cache_key(kind, category_id=None):
+    return f'popularity:v1:{kind}:{category_id or "all"}'
+
+
+def _events(since=None, product_ids=None):
+    """(product_id, created_at, weight) for every favorite, conversation and offer"""
+    from chat.models import Conversation
+    from .models import Favorite, Offer
+    weights = settings.POPULARITY_WEIGHTS
+    for model, kind in ((Favorite, 'favorite'), (Conversation, 'conversation'), (Offer, 'offer')):
+        events = model.objects.all()
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        if product_ids is not None:
+            events = events.filter(product_id__in=product_ids)
+        for product_id, created_at in events.values_list('product_id', 'created_at').iterator(chunk_size=BATCH_SIZE):
+            yield product_id, created_at, weights[kind]
+
+
+def _seed(product_ids, now):
+    """
+    Score products from their whole history. Views have no timestamps, so
+    they count as if spread evenly over the listing's life, decayed from
+    its midpoint.
+    """
+    from .models import Product, ProductPopularity
+    half_lives = _half_lives()
+    rows = {}
+    products = Product.objects.filter(pk__in=product_ids).values_list('id', 'category_id', 'views_count', 'created_at')
+    for product_id, category_id, views_count, created_at in products.iterator(chunk_size=BATCH_SIZE):
+        midpoint = (now - created_at).total_seconds() / 2
+        views = views_count * settings.POPULARITY_WEIGHTS['view']
+        rows[product_id] = ProductPopularity(
+            product_id=product_id, category_id=category_id, views_seen=views_count, scored_at=now,
+            popular_score=views * _decay(midpoint, half_lives['popular']),
+            trending_score=views * _decay(midpoint, half_lives['trending']),
+        )
+    for product_id, created_at, weight in _events(product_ids=list(rows)):
+        age = (now - created_at).total_seconds()
+        rows[product_id].popular_score += weight * _decay(age, half_lives['popular'])
+        rows[product_id].trending_score += weight * _decay(age, half_lives['trending'])
+    ProductPopularity.objects.bulk_create(rows.values(), batch_size=BATCH_SIZE)
+    return set(rows)
+
+
+def refresh(now=None):
+    """Bring every score up to date and republish the rankings. Returns the number of products scored."""
+    from .models import Product, ProductPopularity
+    now = now or timezone.now()
+    half_lives = _half_lives()
+    visible = Product.objects.filter(is_active=True, status='active', is_verified=True)
+
+    with transaction.atomic():
+        last = ProductPopularity.objects.aggregate(last=Max('scored_at'))['last']
+        ProductPopularity.objects.exclude(product_id__in=visible.values('id')).delete()
+
+        if last is not None:
+            # Decay everything at once and fold in the views since the last run
+            elapsed = (now - last).total_seconds()
+            product = Product.objects.filter(pk=OuterRef('product_id'))
+            views = Subquery(product.values('views_count')[:1])
+            new_views = Greatest(views - F('views_seen'), Value(0)) * settings.POPULARITY_WEIGHTS['view']
+            ProductPopularity.objects.update(
+                popular_score=F('popular_score') * _decay(elapsed, half_lives['popular']) + new_views,
+                trending_score=F('trending_score') * _decay(elapsed, half_lives['trending']) + new_views,
+                views_seen=views,
+                category_id=Subquery(product.values('category_id')[:1]),
+                scored_at=now,
+            )
+
+        scored = set(ProductPopularity.objects.values_list('product_id', flat=True))
+        seeded = _seed(set(visible.values_list('id', flat=True)) - scored, now)
+
+        if last is not None:
+            added = defaultdict(lambda: [0.0, 0.0])
+            for product_id, created_at, weight in _events(since=last):
+                if product_id in scored:
+                    age = (now - created_at).total_seconds()
+                    added[product_id][0] += weight * _decay(age, half_lives['popular'])
+                    added[product_id][1] += weight * _decay(age, half_lives['trending'])
+            rows = list(ProductPopularity.objects.filter(product_id__in=list(added)))
+            for row in rows:
+                row.popular_score += added[row.product_id][0]
+                row.trending_score += added[row.product_id][1]
+            ProductPopularity.objects.bulk_update(rows, ['popular_score', 'trending_score'], batch_size=BATCH_SIZE)
+
+    publish()
+    return len(scored) + len(seeded)
+
+
+def _top(kind, category_id=None):
+    from .models import ProductPopularity
+    rows = ProductPopularity.objects.all()
+    if category_id is not None:
+        rows = rows.filter(category_id=category_id)
+    return list(rows.order_by(f'-{kind}_score').values_list('product_id', flat=True)[:settings.POPULARITY_LIST_SIZE])
+
+
+def publish():
+    """Cache the ranked product ids, globally and per category"""
+    from .models import ProductPopularity
+    category_ids = ProductPopularity.objects.order_by().values_list('category_id', flat=True).distinct()
+    rankings = {}
+    for kind in KINDS:
+        rankings[_cache_key(kind)] = _top(kind)
+        for category_id in category_ids:
+            rankings[_cache_key(kind, category_id)] = _top(kind, category_id)
+    cache.set_many(rankings, settings.POPULARITY_CACHE_TTL)
+
+
+def ranked(kind, category_id=None):
+    """Product ids, best first, from the cached rankings (read from the score index if not cached)"""
+    key = _cache_key(kind, category_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _top(kind, category_id)
+        cache.set(key, ids, settings.POPULARITY_CACHE_TTL)
+    return ids
@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from django.db.models import Avg
-from .models import Category, Product, ProductImage, Offer, Favorite
-from users.serializers import UserProfileSerializer
+from django.db import IntegrityError, models, transaction
+from django.db.models import Avg, prefetch_related_objects
+from django.conf import settings
+from .models import Category, Product, ProductImage, ProductReportSummary, Offer, Favorite, SavedSearch
+from users.models import SellerReputation
+from users.serializers import PublicProfileField
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -38,11 +41,39 @@ class ProductImageSerializer(serializers.ModelSerializer):
         return data
 
 
+def favorite_ids(context):
+    """The requesting user's favorited product ids, looked up once per serializer context"""
+    if 'favorite_ids' not in context:
+        request = context.get('request')
+        if request and request.user.is_authenticated:
+            context['favorite_ids'] = Favorite.ids_for(request.user.pk)
+        else:
+            context['favorite_ids'] = frozenset()
+    return context['favorite_ids']
+
+
+class ProductPageSerializer(serializers.ListSerializer):
+    """
+    Loads what every row needs (seller, category, images and the sellers'
+    reputations) for a whole page of products up front, a query each
+    """
+    
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_related_objects(products, 'seller', 'category', 'images')
+        self.context.setdefault('seller_reputations', {}).update(
+            SellerReputation.for_users(product.seller_id for product in products)
+        )
+        return super().to_representation(products)
+
+
 class ProductListSerializer(serializers.ModelSerializer):
     """Serializer for listing products"""
-    seller_id = serializers.IntegerField(source='seller.id', read_only=True)
+    seller_id = serializers.IntegerField(read_only=True)
     seller_name = serializers.CharField(source='seller.username', read_only=True)
     seller_rating = serializers.SerializerMethodField()
+    seller_ratings_count = serializers.SerializerMethodField()
+    seller_response_rate = serializers.SerializerMethodField()
     category_name = serializers.CharField(source='category.name', read_only=True)
     main_image = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
@@ -52,12 +83,27 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'price', 'original_price', 'condition', 'brand', 'model',
             'location', 'city', 'country', 'seller_id', 'seller_name', 'seller_rating',
-            'category_name', 'main_image', 'views_count', 'favorites_count',
-            'is_negotiable', 'is_favorited', 'created_at'
+            'seller_ratings_count', 'seller_response_rate', 'category_name',
+            'main_image', 'views_count', 'favorites_count', 'is_negotiable',
+            'is_favorited', 'created_at', 'expires_at'
         ]
+        list_serializer_class = ProductPageSerializer
+    
+    def _seller_reputation(self, obj):
+        reputations = self.context.setdefault('seller_reputations', {})
+        if obj.seller_id not in reputations:
+            # Serialized on its own rather than as part of a page
+            reputations.update(SellerReputation.for_users([obj.seller_id]))
+        return reputations[obj.seller_id]
     
     def get_seller_rating(self, obj):
-        return float(obj.seller.average_rating)
+        return float(round(self._seller_reputation(obj).average, 1))
+    
+    def get_seller_ratings_count(self, obj):
+        return self._seller_reputation(obj).rating_count
+    
+    def get_seller_response_rate(self, obj):
+        return self._seller_reputation(obj).response_rate
     
     def get_main_image(self, obj):
         main_image = obj.get_main_image()
@@ -73,15 +119,12 @@ class ProductListSerializer(serializers.ModelSerializer):
         return None
     
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favorited_by.filter(user=request.user).exists()
-        return False
+        return obj.id in favorite_ids(self.context)
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Serializer for product details"""
-    seller = UserProfileSerializer(read_only=True)
+    seller = PublicProfileField(source='seller_id')
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
@@ -95,17 +138,14 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'location', 'city', 'country', 'latitude', 'longitude',
             'shipping_options', 'shipping_cost', 'status', 'is_active',
             'is_featured', 'views_count', 'favorites_count', 'images',
-            'is_favorited', 'offers_count', 'created_at', 'updated_at'
+            'is_favorited', 'offers_count', 'created_at', 'updated_at', 'expires_at'
         ]
     
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.favorited_by.filter(user=user).exists()
-        return False
+        return obj.id in favorite_ids(self.context)
     
     def get_offers_count(self, obj):
-        return obj.offers.filter(status='pending').count()
+        return obj.pending_offers_count
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
@@ -159,6 +199,16 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['seller', 'views_count', 'favorites_count']
     
+    def validate_status(self, value):
+        # Expired listings come back through renew, hidden ones through moderation
+        if self.instance is None or value == self.instance.status:
+            return value
+        if self.instance.status == 'expired':
+            raise serializers.ValidationError("Renew an expired listing to put it back online")
+        if ProductReportSummary.objects.filter(product=self.instance, hidden_at__isnull=False).exists():
+            raise serializers.ValidationError("This listing was taken offline after reports and stays offline until a moderator reviews them")
+        return value
+    
     def update(self, instance, validated_data):
         images_data = validated_data.pop('images', [])
         
@@ -208,16 +258,21 @@ class OfferSerializer(serializers.ModelSerializer):
         if amount <= 0:
             raise serializers.ValidationError("Offer amount must be greater than 0")
         
-        # Check if user already has a pending offer
-        if Offer.objects.filter(
-            product=product,
-            buyer=self.context['request'].user,
-            status='pending'
-        ).exists():
-            raise serializers.ValidationError("You already have a pending offer for this product")
-        
         attrs['buyer'] = self.context['request'].user
         return attrs
+    
+    def create(self, validated_data):
+        # The offers_one_pending_per_buyer constraint enforces one pending offer per buyer and product
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            pending = Offer.objects.filter(
+                product=validated_data['product'], buyer=validated_data['buyer'], status='pending'
+            )
+            if pending.exists():
+                raise serializers.ValidationError("You already have a pending offer for this product")
+            raise
 
 
 class OfferListSerializer(serializers.ModelSerializer):
@@ -244,6 +299,31 @@ class OfferListSerializer(serializers.ModelSerializer):
         return None
 
 
+class OfferInboxSerializer(serializers.ModelSerializer):
+    """A product in the seller's received-offers inbox, with its offer summary"""
+    main_image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'title', 'price', 'status', 'is_active', 'main_image',
+            'pending_offers_count', 'highest_offer', 'last_offer_at'
+        ]
+    
+    get_main_image = ProductListSerializer.get_main_image
+
+
+class FavoritePageSerializer(serializers.ListSerializer):
+    """Loads the sellers' reputations for a whole page of favorites in one query"""
+    
+    def to_representation(self, data):
+        favorites = list(data.all() if isinstance(data, models.Manager) else data)
+        self.context.setdefault('seller_reputations', {}).update(
+            SellerReputation.for_users(favorite.product.seller_id for favorite in favorites)
+        )
+        return super().to_representation(favorites)
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Serializer for favorites"""
     product = ProductListSerializer(read_only=True)
@@ -252,6 +332,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['id', 'product', 'created_at']
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = FavoritePageSerializer
     
     def validate(self, attrs):
         user = self.context['request'].user
@@ -282,4 +363,31 @@ class ProductSearchSerializer(serializers.Serializer):
         ],
         required=False,
         default='newest'
-    ) 
\ No newline at end of file
+    )
+    facets = serializers.BooleanField(required=False, default=False) 
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    """Serializer for a user's saved searches"""
+    
+    class Meta:
+        model = SavedSearch
+        fields = [
+            'id', 'name', 'query', 'category', 'min_price', 'max_price', 'condition',
+            'location', 'alerts_enabled', 'last_match_at', 'created_at'
+        ]
+        read_only_fields = ['id', 'last_match_at', 'created_at']
+    
+    def validate(self, attrs):
+        def value(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+        
+        if not any(value(field) for field in ('query', 'category', 'min_price', 'max_price', 'condition', 'location')):
+            raise serializers.ValidationError("Set at least one search criterion")
+        if value('min_price') is not None and value('max_price') is not None and value('min_price') > value('max_price'):
+            raise serializers.ValidationError("min_price cannot be greater than max_price")
+        
+        user = self.context['request'].user
+        if self.instance is None and SavedSearch.objects.filter(user=user).count() >= settings.MAX_SAVED_SEARCHES:
+            raise serializers.ValidationError(f"You can save at most {settings.MAX_SAVED_SEARCHES} searches")
+        return attrs
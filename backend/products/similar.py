@@ -0,0 +1,249 @@
+"""
+Similar products ("you might also like") for the product detail page.
+
+Each visible product is a TF-IDF vector over the words of its title, brand,
+model and description (title, brand and model words count extra). Two
+products score TEXT_WEIGHT times the cosine of their vectors, plus
+CATEGORY_WEIGHT when they share a category, plus PRICE_WEIGHT times how
+close their prices are (the lower over the higher). The top
+SIMILAR_PRODUCTS_COUNT neighbours of every product are stored in
+SimilarProduct, so serving them is one indexed lookup.
+
+rebuild() recomputes every list as a sparse product through an inverted
+index, so only pairs sharing one of a product's strongest words are ever
+scored; products with too few of those are topped up with same-category
+products nearest in price. The new lists replace the old ones a batch of
+products at a time.
+Run `rebuild_similar_products` nightly. In between, update_product() fits
+a newly verified product into its category using the document
+frequencies of the last rebuild; verification queues the product for
+`process_verified_products` to do this (see VerifiedProductQueue).
+"""
+import bisect
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+TEXT_WEIGHT = 0.7
+CATEGORY_WEIGHT = 0.2
+PRICE_WEIGHT = 0.1
+
+FIELD_WEIGHTS = (('title', 3), ('brand', 2), ('model', 2), ('description', 1))
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with', 'very', 'new', 'used',
+}
+# Words in more listings than this are skipped when pairing: their postings are
+# the expensive part and their IDF makes them count for almost nothing anyway
+MAX_POSTINGS = 1000
+# Only a product's strongest words are looked up when finding its neighbours,
+# and only the closest texts among those are scored with category and price
+QUERY_WORDS = 8
+SHORTLIST = 50
+# Products of the category compared against by update_product()
+INCREMENTAL_CANDIDATES = 5000
+BATCH_SIZE = 2000
+
+IDF_KEY = 'similar:v1:idf'
+
+_word = re.compile(r'\w+')
+
+
+def tokens(title, brand, model, description):
+    """Weighted word counts of a product's text"""
+    counts = Counter()
+    for (_, weight), text in zip(FIELD_WEIGHTS, (title, brand, model, description)):
+        for word in _word.findall((text or '').lower()):
+            if len(word) > 1 and word not in STOP_WORDS:
+                counts[word] += weight
+    return counts
+
+
+def idf(document_count, document_frequency):
+    return math.log((1 + document_count) / (1 + document_frequency)) + 1
+
+
+def vector(counts, idf_of):
+    """Unit-length TF-IDF vector {word: weight}; idf_of(word) gives each word's IDF"""
+    weights = {word: (1 + math.log(count)) * idf_of(word) for word, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {word: weight / norm for word, weight in weights.items()} if norm else {}
+
+
+def price_proximity(a, b):
+    if a <= 0 or b <= 0:
+        return 0.0
+    return min(a, b) / max(a, b)
+
+
+def score(cosine, same_category, price_a, price_b):
+    return (
+        TEXT_WEIGHT * cosine
+        + (CATEGORY_WEIGHT if same_category else 0.0)
+        + PRICE_WEIGHT * price_proximity(price_a, price_b)
+    )
+
+
+def _visible(queryset):
+    return queryset.filter(is_active=True, status='active', is_verified=True)
+
+
+def _rows(queryset):
+    rows = queryset.values_list('id', 'category_id', 'price', 'title', 'brand', 'model', 'description')
+    for product_id, category_id, price, title, brand, model, description in rows.iterator(chunk_size=BATCH_SIZE):
+        yield product_id, category_id, float(price), tokens(title, brand, model, description)
+
+
+def _top_up(neighbours, position, ids, categories, prices, by_category, count):
+    """Add same-category products nearest in price until there are `count` neighbours"""
+    if len(neighbours) >= count:
+        return neighbours
+    members = by_category[categories[position]]
+    taken = {other for _, other in neighbours} | {position}
+    start = bisect.bisect_left(members, (prices[position], ids[position]))
+    low, high = start - 1, start
+    while len(neighbours) < count and (low >= 0 or high < len(members)):
+        # Walk outwards from the product's own price
+        if high >= len(members) or (low >= 0 and prices[position] - members[low][0] <= members[high][0] - prices[position]):
+            candidate = members[low][2]
+            low -= 1
+        else:
+            candidate = members[high][2]
+            high += 1
+        if candidate not in taken:
+            taken.add(candidate)
+            neighbours.append((score(0.0, True, prices[position], prices[candidate]), candidate))
+    neighbours.sort(reverse=True)
+    return neighbours
+
+
+def rebuild():
+    """Recompute the similar products of every visible product. Returns how many products got a list."""
+    from .models import Product, SimilarProduct
+    count = settings.SIMILAR_PRODUCTS_COUNT
+
+    ids, categories, prices, counts = [], [], [], []
+    frequency = Counter()
+    for product_id, category_id, price, words in _rows(_visible(Product.objects.order_by())):
+        ids.append(product_id)
+        categories.append(category_id)
+        prices.append(price)
+        counts.append(words)
+        frequency.update(words.keys())
+
+    total = len(ids)
+    idf_table = {word: idf(total, df) for word, df in frequency.items()}
+    vectors = [vector(words, idf_table.__getitem__) for words in counts]
+    del counts
+
+    postings = defaultdict(list)
+    for position, weights in enumerate(vectors):
+        for word, weight in weights.items():
+            if frequency[word] <= MAX_POSTINGS:
+                postings[word].append((position, weight))
+
+    by_category = defaultdict(list)
+    for position in range(total):
+        by_category[categories[position]].append((prices[position], ids[position], position))
+    for members in by_category.values():
+        members.sort()
+
+    def lists():
+        for position, weights in enumerate(vectors):
+            dots = defaultdict(float)
+            strongest = heapq.nlargest(QUERY_WORDS, weights.items(), key=lambda item: item[1])
+            for word, weight in strongest:
+                for other, other_weight in postings.get(word, ()):
+                    dots[other] += weight * other_weight
+            dots.pop(position, None)
+            shortlist = heapq.nlargest(SHORTLIST, dots.items(), key=itemgetter(1))
+            neighbours = heapq.nlargest(count, (
+                (score(dot, categories[position] == categories[other], prices[position], prices[other]), other)
+                for other, dot in shortlist
+            ))
+            yield position, _top_up(neighbours, position, ids, categories, prices, by_category, count)
+
+    def swap(product_ids, rows):
+        # A batch of products gets its new lists in one short transaction,
+        # so readers never see a product without its list
+        with transaction.atomic():
+            SimilarProduct.objects.filter(product_id__in=product_ids).delete()
+            SimilarProduct.objects.bulk_create(rows)
+
+    listed, batch_ids, batch = 0, [], []
+    for position, neighbours in lists():
+        listed += bool(neighbours)
+        batch_ids.append(ids[position])
+        batch.extend(
+            SimilarProduct(product_id=ids[position], similar_id=ids[other], rank=rank, score=value)
+            for rank, (value, other) in enumerate(neighbours)
+        )
+        if len(batch) >= BATCH_SIZE or len(batch_ids) >= BATCH_SIZE:
+            swap(batch_ids, batch)
+            batch_ids, batch = [], []
+    swap(batch_ids, batch)
+    # Lists of products that are no longer visible
+    SimilarProduct.objects.exclude(product__in=_visible(Product.objects.all())).delete()
+    cache.set(IDF_KEY, (total, idf_table), None)
+    return listed
+
+
+def update_product(product):
+    """
+    Give a newly visible product its similar products from the newest
+    INCREMENTAL_CANDIDATES products of its category, and add it to their
+    lists where it ranks. Matches in other categories wait for the next
+    rebuild().
+    """
+    from .models import Product, SimilarProduct
+    count = settings.SIMILAR_PRODUCTS_COUNT
+    if not product.is_available():
+        SimilarProduct.objects.filter(product=product).delete()
+        return
+
+    total, idf_table = cache.get(IDF_KEY) or (0, {})
+    default_idf = idf(total, 0)
+
+    def idf_of(word):
+        return idf_table.get(word, default_idf)
+
+    own = vector(tokens(product.title, product.brand, product.model, product.description), idf_of)
+    price = float(product.price)
+    candidates = _visible(Product.objects.filter(category_id=product.category_id).exclude(pk=product.pk))
+    scored = []
+    for product_id, _, other_price, words in _rows(candidates.order_by('-created_at')[:INCREMENTAL_CANDIDATES]):
+        other = vector(words, idf_of)
+        cosine = sum(weight * other.get(word, 0.0) for word, weight in own.items())
+        scored.append((score(cosine, True, price, other_price), product_id))
+
+    # Lists of the candidates the new product now belongs in
+    current = defaultdict(list)
+    for product_id, similar_id, value in SimilarProduct.objects.filter(
+        product_id__in=[product_id for _, product_id in scored]
+    ).values_list('product_id', 'similar_id', 'score'):
+        if similar_id != product.pk:
+            current[product_id].append((value, similar_id))
+    changed = {}
+    for value, product_id in scored:
+        neighbours = current[product_id]
+        if len(neighbours) < count or value > min(neighbours)[0]:
+            changed[product_id] = heapq.nlargest(count, neighbours + [(value, product.pk)])
+
+    rows = [
+        SimilarProduct(product_id=product.pk, similar_id=similar_id, rank=rank, score=value)
+        for rank, (value, similar_id) in enumerate(heapq.nlargest(count, scored))
+    ]
+    rows.extend(
+        SimilarProduct(product_id=product_id, similar_id=similar_id, rank=rank, score=value)
+        for product_id, neighbours in changed.items()
+        for rank, (value, similar_id) in enumerate(neighbours)
+    )
+    with transaction.atomic():
+        SimilarProduct.objects.filter(product_id__in=[product.pk, *changed]).delete()
+        SimilarProduct.objects.bulk_create(rows, batch_size=BATCH_SIZE)
@@ -0,0 +1,140 @@
+"""
+Search suggestions (typeahead). The titles, brands, models and category
+names of visible products are kept as normalized terms in SearchTerm, with
+how many products use each and a popularity weight (per product: one plus
+its views plus FAVORITE_WEIGHT per favorite).
+
+Product saves adjust the terms as listings appear, change or disappear;
+rebuild() recomputes everything, which also brings the weights up to date
+with views and favorites, so run `rebuild_search_terms` periodically.
+
+A lookup is a prefix range scan on the term index ordered by weight, and
+the top suggestions for each prefix are cached. The one- and two-letter
+prefixes, whose ranges are the largest, are computed by rebuild() and kept
+until the next one.
+"""
+from collections import defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+FAVORITE_WEIGHT = 5
+MAX_SUGGESTIONS = 10
+MAX_CACHED_PREFIX = 20
+WARM_PREFIX_LENGTH = 2
+TERM_LENGTH = 200
+BATCH_SIZE = 2000
+
+VERSION_KEY = 'suggest:version'
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())[:TERM_LENGTH]
+
+
+def popularity(views_count, favorites_count):
+    return 1 + views_count + FAVORITE_WEIGHT * favorites_count
+
+
+def _version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def _cache_key(version, prefix):
+    # Quoted so spaces and other characters are valid in any cache backend's keys
+    return f'suggest:v1:{version}:{quote(prefix)}'
+
+
+def _lookup(prefix):
+    from .models import SearchTerm
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    rows = (
+        SearchTerm.objects
+        # The range lets SQLite use the term index too; startswith keeps it exact
+        .filter(term__gte=prefix, term__lt=upper, term__startswith=prefix)
+        .order_by('-weight', 'term')
+        .values('text', 'kind', 'product_count')[:MAX_SUGGESTIONS]
+    )
+    return list(rows)
+
+
+def suggest(query, limit=MAX_SUGGESTIONS):
+    """Most popular terms starting with the query, at most `limit`"""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    if len(prefix) > MAX_CACHED_PREFIX:
+        return _lookup(prefix)[:limit]
+
+    key = _cache_key(_version(), prefix)
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = _lookup(prefix)
+        cache.set(key, suggestions, settings.SUGGEST_CACHE_TTL)
+    return suggestions[:limit]
+
+
+def invalidate(terms):
+    """Drop the cached suggestions of every prefix of the given terms, except the warmed short ones"""
+    version = _version()
+    keys = {
+        _cache_key(version, term[:length])
+        for term in terms
+        for length in range(WARM_PREFIX_LENGTH + 1, min(len(term), MAX_CACHED_PREFIX) + 1)
+    }
+    cache.delete_many(list(keys))
+
+
+def product_terms(title, brand, model, category_name):
+    """The (kind, term, text) suggestions a visible product contributes"""
+    terms = set()
+    for kind, text in (('title', title), ('brand', brand), ('model', model), ('category', category_name)):
+        term = normalize(text)
+        if term:
+            terms.add((kind, term, ' '.join(text.split())[:TERM_LENGTH]))
+    return terms
+
+
+def rebuild_terms(Product, SearchTerm):
+    """
+    Replace every term with ones computed from the visible products. Model
+    classes are passed in so migrations can run it on historical models.
+    Returns the terms.
+    """
+    totals = defaultdict(lambda: [None, 0, 0])
+    rows = Product.objects.filter(is_active=True, status='active', is_verified=True).values_list(
+        'title', 'brand', 'model', 'category__name', 'views_count', 'favorites_count'
+    )
+    for title, brand, model, category_name, views_count, favorites_count in rows.iterator(chunk_size=BATCH_SIZE):
+        weight = popularity(views_count, favorites_count)
+        for kind, term, text in product_terms(title, brand, model, category_name):
+            entry = totals[(kind, term)]
+            entry[0] = entry[0] or text
+            entry[1] += 1
+            entry[2] += weight
+
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(kind=kind, term=term, text=text, product_count=count, weight=weight)
+                for (kind, term), (text, count, weight) in totals.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return {term for _, term in totals}
+
+
+def rebuild():
+    """Recompute every term, then rewarm the short prefixes. Returns the number of distinct terms."""
+    from .models import Product, SearchTerm
+    terms = rebuild_terms(Product, SearchTerm)
+
+    # A new version orphans every cached prefix at once
+    version = _version() + 1
+    prefixes = {term[:length] for term in terms for length in range(1, WARM_PREFIX_LENGTH + 1) if len(term) >= length}
+    cache.set_many({_cache_key(version, prefix): _lookup(prefix) for prefix in prefixes}, None)
+    cache.set(VERSION_KEY, version, None)
+    return len(terms)
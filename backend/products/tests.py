@@ -1,3 +1,874 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.models import Notification
+from marketplace.factories import (
+    AdminChangelistQueryTestCase, CacheClearingTestCase, make_category, make_order, make_product, make_user,
+)
+from . import geo, popularity, similar, suggest
+from .models import (
+    Favorite, Offer, Product, ProductImage, ProductPopularity, ProductRating, ProductReport, ProductReportSummary,
+    SearchTerm,
+    SavedSearch, SimilarProduct, VerifiedProductQueue,
+)
+
+
+class AdminChangelistQueryTests(AdminChangelistQueryTestCase):
+    app_label = 'products'
+
+    @classmethod
+    def create_row(cls, index, seller, buyer, product):
+        Offer.objects.create(product=product, buyer=buyer, amount=90)
+        Favorite.objects.create(user=buyer, product=product)
+        ProductRating.objects.create(product=product, user=buyer, rating=4)
+        ProductReport.objects.create(product=product, reporter=buyer, report_type='spam', description='Spam')
+
+    def test_product_changelist(self):
+        # session, user, count, rows, category filter
+        self.assertChangelistQueries('product', 5)
+
+    def test_category_changelist(self):
+        self.assertChangelistQueries('category', 6)
+
+    def test_category_changelist_uses_annotated_count(self):
+        response = self.assertChangelistQueries('category', 6)
+        self.assertEqual([category.products__count for category in response.context['cl'].result_list], [1] * self.ROWS)
+
+    def test_offer_changelist(self):
+        self.assertChangelistQueries('offer', 6)
+
+    def test_favorite_changelist(self):
+        self.assertChangelistQueries('favorite', 6)
+
+    def test_productrating_changelist(self):
+        self.assertChangelistQueries('productrating', 7)
+
+    def test_productreport_changelist(self):
+        self.assertChangelistQueries('productreport', 5)
+
+
+class OfferTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.buyers = [make_user(f'buyer{index}') for index in range(3)]
+        self.product = make_product(self.seller)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def make_offer(self, buyer, amount='90.00'):
+        return self.client_for(buyer).post(
+            reverse('offer-create'), {'product': self.product.id, 'amount': amount}, format='json'
+        )
+
+    def accept(self, offer):
+        return self.client_for(self.seller).post(reverse('accept-offer', args=[offer.id]))
+
+    def test_one_pending_offer_per_buyer(self):
+        self.assertEqual(self.make_offer(self.buyers[0]).status_code, 201)
+        response = self.make_offer(self.buyers[0], '95.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already have a pending offer', str(response.data))
+
+    def test_accept_rejects_competing_offers(self):
+        for buyer in self.buyers:
+            self.make_offer(buyer)
+        first, second, third = Offer.objects.order_by('id')
+
+        response = self.accept(first)
+
+        self.assertEqual((response.status_code, response.data['rejected_offers']), (200, 2))
+        self.assertEqual(
+            list(Offer.objects.order_by('id').values_list('status', flat=True)), ['accepted', 'rejected', 'rejected']
+        )
+        self.assertEqual(Notification.objects.filter(notification_type='offer_rejected').count(), 2)
+        self.assertEqual(self.accept(second).status_code, 400)
+
+    def test_offer_made_after_an_accept_waits_for_it(self):
+        self.make_offer(self.buyers[0])
+        self.accept(Offer.objects.get())
+
+        self.assertEqual(self.make_offer(self.buyers[1]).status_code, 201)
+        response = self.accept(Offer.objects.get(status='pending'))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('already accepted', str(response.data))
+
+    def test_rejected_or_cancelled_order_frees_the_product(self):
+        for release in ('reject', 'cancel'):
+            Offer.objects.all().delete()
+            self.make_offer(self.buyers[0])
+            offer = Offer.objects.get()
+            self.accept(offer)
+            order = make_order(self.buyers[0], self.product, accepted_offer=offer)
+
+            if release == 'reject':
+                response = self.client_for(self.seller).post(reverse('order-approval', args=[order.id]), {'action': 'reject'})
+            else:
+                response = self.client_for(self.buyers[0]).post(reverse('cancel-order', args=[order.id]))
+
+            self.assertEqual(response.status_code, 200)
+            offer.refresh_from_db()
+            self.assertEqual(offer.status, 'rejected')
+            self.assertEqual(self.make_offer(self.buyers[1]).status_code, 201)
+            self.assertEqual(self.accept(Offer.objects.get(status='pending')).status_code, 200)
+
+    def test_accepted_offer_nobody_ordered_from_expires(self):
+        self.make_offer(self.buyers[0])
+        unordered = Offer.objects.get()
+        self.accept(unordered)
+        ordered = Offer.objects.create(product=make_product(self.seller), buyer=self.buyers[1], amount=Decimal('90.00'))
+        ordered.accept()
+        make_order(self.buyers[1], ordered.product, accepted_offer=ordered)
+
+        self.assertEqual(Offer.expire_due(now=timezone.now() + timedelta(hours=settings.OFFER_EXPIRY_HOURS, minutes=1)), 1)
+
+        unordered.refresh_from_db()
+        ordered.refresh_from_db()
+        self.assertEqual((unordered.status, ordered.status), ('expired', 'accepted'))
+        self.assertIn('before you ordered', Notification.objects.get(notification_type='offer_expired').message)
+        self.assertEqual(self.make_offer(self.buyers[2]).status_code, 201)
+        self.assertEqual(self.accept(Offer.objects.get(status='pending')).status_code, 200)
+
+    def test_second_accept_on_the_same_product_conflicts(self):
+        self.make_offer(self.buyers[0])
+        self.accept(Offer.objects.get())
+        # An offer that slipped in after the accept, e.g. through the admin
+        late = Offer.objects.create(product=self.product, buyer=self.buyers[1], amount=Decimal('120.00'))
+
+        self.assertEqual(self.accept(late).status_code, 409)
+        late.refresh_from_db()
+        self.assertEqual(late.status, 'pending')
+        self.assertEqual(Offer.objects.filter(status='accepted').count(), 1)
+
+    def test_database_allows_one_accepted_offer_per_product(self):
+        Offer.objects.create(product=self.product, buyer=self.buyers[0], amount=Decimal('90.00'), status='accepted')
+        with self.assertRaises(IntegrityError):
+            Offer.objects.create(product=self.product, buyer=self.buyers[1], amount=Decimal('95.00'), status='accepted')
+
+    def test_expire_due_offers_and_notify_buyers(self):
+        for buyer in self.buyers:
+            Offer.objects.create(
+                product=self.product, buyer=buyer, amount=Decimal('90.00'),
+                expires_at=timezone.now() - timedelta(minutes=1),
+            )
+        live = Offer.objects.create(product=self.product, buyer=make_user('late'), amount=Decimal('80.00'))
+
+        call_command('expire_offers', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Offer.objects.filter(status='expired').count(), 3)
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'pending')
+        self.assertEqual(Notification.objects.filter(notification_type='offer_expired').count(), 3)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.pending_offers_count, self.product.highest_offer), (1, Decimal('80.00')))
+
+
+class OfferInboxTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.buyers = [make_user(f'buyer{index}') for index in range(3)]
+        self.products = [make_product(self.seller, title=f'Phone {index}') for index in range(4)]
+        for product in self.products:
+            ProductImage.objects.create(product=product, image_url='https://cdn.example.com/phone.jpg', is_main=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def summary(self, product):
+        product = Product.objects.get(pk=product.pk)
+        return product.pending_offers_count, product.highest_offer
+
+    def offer(self, product, buyer, amount):
+        return Offer.objects.create(product=product, buyer=buyer, amount=Decimal(amount))
+
+    def test_summary_follows_offer_lifecycle(self):
+        product = self.products[0]
+        low = self.offer(product, self.buyers[0], '50.00')
+        high = self.offer(product, self.buyers[1], '80.00')
+        self.offer(product, self.buyers[2], '60.00')
+        self.assertEqual(self.summary(product), (3, Decimal('80.00')))
+
+        high.reject()
+        self.assertEqual(self.summary(product), (2, Decimal('60.00')))
+        low.delete()
+        self.assertEqual(self.summary(product), (1, Decimal('60.00')))
+        Offer.objects.get(product=product, status='pending').accept()
+        self.assertEqual(self.summary(product), (0, None))
+
+    def test_inbox_lists_products_with_offers_newest_first(self):
+        for index, product in enumerate(self.products[:3]):
+            self.offer(product, self.buyers[index], '70.00')
+        Offer.objects.get(product=self.products[1]).accept()
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('received-offers-inbox'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [product.id for product in self.products[2::-1]])
+        self.assertEqual(response.data['results'][0]['main_image'], 'https://cdn.example.com/phone.jpg')
+
+        response = self.client.get(reverse('received-offers-inbox'), {'pending': '1'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.products[2].id, self.products[0].id])
+
+
+class FavoriteTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.buyer = make_user('buyer')
+        self.products = [make_product(self.seller, title=f'Phone {index}') for index in range(4)]
+        self.ids = [product.id for product in self.products]
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def post(self, name, product_ids, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(name), {'product_ids': product_ids}, format='json')
+
+    def counts(self):
+        return list(Product.objects.filter(pk__in=self.ids).order_by('pk').values_list('favorites_count', flat=True))
+
+    def test_bulk_add_skips_unavailable_and_existing(self):
+        unverified = make_product(self.seller, title='Unverified', is_verified=False)
+        response = self.post('bulk-add-favorites', self.ids[:2] + [unverified.id, 10 ** 6])
+        self.assertEqual(response.data['added'], self.ids[:2])
+        self.assertEqual(self.post('bulk-add-favorites', self.ids[:3]).data['added'], [self.ids[2]])
+        self.assertEqual(self.counts(), [1, 1, 1, 0])
+        self.assertEqual(self.client.get(reverse('favorite-ids')).data['product_ids'], self.ids[:3])
+
+    def test_counters_move_by_delta_without_recounting(self):
+        # Drift a repair job would fix is left alone by normal traffic
+        Product.objects.filter(pk=self.ids[0]).update(favorites_count=10)
+        with CaptureQueriesContext(connection) as queries:
+            self.post('bulk-add-favorites', self.ids[:2])
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql'].upper()])
+        self.assertEqual(self.counts(), [11, 1, 0, 0])
+
+        self.post('bulk-add-favorites', self.ids[:1], user=make_user('other'))
+        self.assertEqual(self.post('bulk-remove-favorites', self.ids[:3], user=self.buyer).data['removed'], self.ids[:2])
+        self.assertEqual(self.counts(), [11, 0, 0, 0])
+
+        Favorite.recount(self.ids)
+        self.assertEqual(self.counts(), [1, 0, 0, 0])
+
+    def test_toggle_and_remove(self):
+        url = reverse('toggle-favorite', args=[self.ids[0]])
+        self.assertTrue(self.client.post(url).data['is_favorited'])
+        self.assertFalse(self.client.post(url).data['is_favorited'])
+        self.assertEqual(self.counts()[0], 0)
+        self.assertEqual(self.client.delete(reverse('remove-favorite', args=[self.ids[0]])).status_code, 404)
+
+
+class NearbyProductTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+
+    def place(self, latitude, longitude, **fields):
+        return make_product(
+            self.seller, latitude=Decimal(str(latitude)), longitude=Decimal(str(longitude)), **fields
+        )
+
+    def nearby(self, latitude, longitude, **params):
+        response = self.client.get(reverse('nearby-products'), {'lat': latitude, 'lng': longitude, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_geohash_helpers(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.prefix_range('u4z'), ('u4z', 'u5'))
+        self.assertEqual(geo.prefix_range('zz'), ('zz', None))
+
+    def test_geohash_follows_coordinate_changes(self):
+        product = self.place(52.5, 13.4)
+        self.assertEqual(product.geohash, geo.encode(52.5, 13.4))
+        product.latitude = Decimal('10')
+        product.save(update_fields=['latitude'])
+        product.refresh_from_db()
+        self.assertEqual(product.geohash, geo.encode(10, 13.4))
+
+    def test_radius_boundary_is_inclusive_and_exact(self):
+        product = self.place(52.5, 13.5)
+        distance = geo.haversine_km(52.5, 13.4, 52.5, 13.5)
+        self.assertEqual(self.nearby(52.5, 13.4, radius_km=distance + 0.01), [product.id])
+        self.assertEqual(self.nearby(52.5, 13.4, radius_km=distance - 0.01), [])
+
+    def test_neighbouring_cells_across_the_equator_and_prime_meridian(self):
+        # Each of these sits in a different top-level geohash cell
+        corners = [self.place(latitude, longitude) for latitude, longitude in
+                   [(0.001, 0.001), (0.001, -0.001), (-0.001, 0.001), (-0.001, -0.001)]]
+        self.assertEqual(len({product.geohash[0] for product in corners}), 4)
+        self.assertEqual(sorted(self.nearby(0.0005, 0.0005, radius_km=1)), [product.id for product in corners])
+
+    def test_search_wraps_around_the_antimeridian(self):
+        east, west = self.place(0, 179.995), self.place(0, -179.995)
+        self.place(0, 178)
+        self.assertEqual(sorted(self.nearby(0, 179.999, radius_km=5)), [east.id, west.id])
+
+    def test_k_nearest_matches_brute_force(self):
+        rng = random.Random(1)
+        points = []
+        for index in range(60):
+            latitude, longitude = round(52.5 + rng.uniform(-1.5, 1.5), 6), round(13.4 + rng.uniform(-2, 2), 6)
+            points.append((self.place(latitude, longitude, title=f'Phone {index}').id, latitude, longitude))
+        self.place(52.5, 13.4, title='Unverified', is_verified=False)
+
+        for latitude, longitude, params in [(52.5, 13.4, {'k': 7}), (60, 30, {'k': 5}), (53.9, 15.3, {'radius_km': 40, 'k': 100})]:
+            expected = sorted((geo.haversine_km(latitude, longitude, lat, lon), product_id) for product_id, lat, lon in points)
+            if 'radius_km' in params:
+                expected = [pair for pair in expected if pair[0] <= params['radius_km']]
+            self.assertEqual(self.nearby(latitude, longitude, **params), [product_id for _, product_id in expected[:params['k']]])
+
+    def test_invalid_parameters(self):
+        url = reverse('nearby-products')
+        for params in [{'lat': 'x', 'lng': 1}, {'lat': 91, 'lng': 0}, {'lat': 1, 'lng': 1, 'radius_km': 900}, {'lat': 1, 'lng': 1, 'k': 0}]:
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class FacetCountTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = make_user('seller', user_type='seller')
+        self.phones, self.laptops = make_category('Phones'), make_category('Laptops')
+        for category, condition, price, city, country in [
+            (self.phones, 'new', '10.00', 'Berlin', 'DE'),
+            (self.phones, 'good', '25.00', 'Berlin', 'DE'),
+            (self.laptops, 'good', '60.00', 'Paris', 'FR'),
+            (self.laptops, 'poor', '2000.00', 'Paris', 'FR'),
+            (self.phones, 'good', '300.00', 'Munich', 'DE'),
+        ]:
+            make_product(
+                seller, category=category, condition=condition, price=Decimal(price),
+                city=city, country=country, title='Phone case',
+            )
+        make_product(seller, category=self.phones, title='Hidden', is_verified=False)
+
+    def facets(self, url_name='product-list-create', **params):
+        response = self.client.get(reverse(url_name), {'facets': '1', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['count'], response.data['facets']
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        count, facets = self.facets(category=self.phones.id)
+
+        self.assertEqual(count, 3)
+        self.assertEqual({row['name']: row['count'] for row in facets['category']}, {'Phones': 3, 'Laptops': 2})
+        self.assertEqual({row['value']: row['count'] for row in facets['condition']}, {'new': 1, 'good': 2})
+        self.assertEqual({row['value']: row['count'] for row in facets['city']}, {'Berlin': 2, 'Munich': 1})
+        # A price on a bucket boundary counts towards the bucket it opens
+        self.assertEqual([row['count'] for row in facets['price']], [1, 1, 0, 0, 1, 0, 0])
+
+    def test_price_facet_ignores_the_price_filter(self):
+        count, facets = self.facets(min_price=50)
+        self.assertEqual(count, 3)
+        self.assertEqual([row['count'] for row in facets['price']], [1, 1, 1, 0, 1, 0, 1])
+        self.assertEqual(sum(row['count'] for row in facets['category']), 3)
+
+    def test_search_facets(self):
+        count, facets = self.facets('search-products', query='phone', condition='good')
+        self.assertEqual(count, 3)
+        self.assertEqual({row['value']: row['count'] for row in facets['condition']}, {'new': 1, 'good': 3, 'poor': 1})
+
+    def test_counts_are_cached_per_query_signature(self):
+        _, facets = self.facets(category=self.phones.id)
+        # Paging and flag spelling do not change the signature
+        with mock.patch('products.facets._category_counts') as category_counts:
+            response = self.client.get(reverse('product-list-create'), {'facets': 'true', 'category': self.phones.id, 'page': 1})
+        category_counts.assert_not_called()
+        self.assertEqual(response.data['facets'], facets)
+        self.assertNotEqual(self.facets(category=self.laptops.id)[1], facets)
+
+    def test_facets_are_opt_in(self):
+        self.assertNotIn('facets', self.client.get(reverse('product-list-create')).data)
+
+
+class SuggestionTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.phones = make_category('Phones')
+
+    def suggestions(self, query):
+        response = self.client.get(reverse('suggest-products'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['text'] for row in response.data['suggestions']]
+
+    def save(self, product, **fields):
+        product = Product.objects.get(pk=product.pk)
+        for field, value in fields.items():
+            setattr(product, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        return product
+
+    def test_terms_follow_listing_visibility(self):
+        pro = make_product(self.seller, category=self.phones, title='iPhone 12  Pro', brand='Apple', is_verified=False)
+        self.assertFalse(SearchTerm.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=pro.pk).verify_product(make_user('moderator'))
+        self.assertEqual(
+            set(SearchTerm.objects.values_list('kind', 'term')),
+            {('title', 'iphone 12 pro'), ('brand', 'apple'), ('category', 'phones')},
+        )
+
+        older = make_product(self.seller, category=self.phones, title='iPhone 11', brand='Apple', views_count=50)
+        self.assertEqual(SearchTerm.objects.get(kind='brand').product_count, 2)
+        # Most viewed first
+        self.assertEqual(self.suggestions('IPH'), ['iPhone 11', 'iPhone 12 Pro'])
+
+        self.save(pro, title='Pixel 7')
+        self.assertEqual(self.suggestions('iph'), ['iPhone 11'])
+
+        self.save(older, is_active=False)
+        self.assertEqual(SearchTerm.objects.get(kind='brand').product_count, 1)
+        self.assertFalse(SearchTerm.objects.filter(term='iphone 11').exists())
+
+    def test_view_counts_do_not_touch_terms(self):
+        product = make_product(self.seller, category=self.phones, title='Pixel 7')
+        with self.assertNumQueries(1):
+            product.increment_views()
+
+    def test_rebuild_matches_incremental_terms_and_warms_short_prefixes(self):
+        make_product(self.seller, category=self.phones, title='Pixel 7', brand='Google')
+        make_product(self.seller, category=self.phones, title='Pixel 8', brand='Google')
+        before = set(SearchTerm.objects.values_list('kind', 'term', 'product_count'))
+
+        self.assertEqual(suggest.rebuild(), 4)
+
+        self.assertEqual(set(SearchTerm.objects.values_list('kind', 'term', 'product_count')), before)
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest.suggest('ph'), [{'text': 'Phones', 'kind': 'category', 'product_count': 2}])
+        self.assertEqual(self.suggestions(''), [])
+
+    @override_settings(API_THROTTLE_RATES={
+        'anon': {'burst': (100, 10), 'sustained': (1000, 3600)},
+        'search': {'burst': (2, 10), 'sustained': (100, 3600)},
+        'suggest': {'burst': (5, 10), 'sustained': (100, 3600)},
+    })
+    def test_suggestions_have_their_own_keystroke_budget(self):
+        self.assertEqual(self.client.get(reverse('search-products'), {'query': 'phone'}).status_code, 200)
+        typed = [self.client.get(reverse('suggest-products'), {'q': 'phone'[:length]}).status_code for length in range(1, 6)]
+        self.assertEqual(typed, [200] * 5)
+        self.assertEqual(self.client.get(reverse('suggest-products'), {'q': 'phones'}).status_code, 429)
+        # Typing left the full search budget alone
+        self.assertEqual(self.client.get(reverse('search-products'), {'query': 'phone'}).status_code, 200)
+
+
+@override_settings(
+    POPULARITY_HALF_LIFE_DAYS=14, TRENDING_HALF_LIFE_HOURS=24,
+    POPULARITY_WEIGHTS={'view': 1, 'favorite': 5, 'conversation': 8, 'offer': 10},
+)
+class PopularityTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.tablets = make_category('Tablets')
+        self.most_viewed = make_product(self.seller, title='A', views_count=100)
+        self.some_views = make_product(self.seller, title='B', views_count=10)
+        self.tablet = make_product(self.seller, category=self.tablets, title='C', views_count=1)
+        make_product(self.seller, title='Hidden', status='pending_verification', views_count=1000)
+        self.now = timezone.now()
+
+    def titles(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.data]
+
+    def score(self, product, kind='popular'):
+        return getattr(ProductPopularity.objects.get(pk=product.pk), f'{kind}_score')
+
+    def test_refresh_scores_visible_products(self):
+        self.assertEqual(popularity.refresh(now=self.now), 3)
+        self.assertEqual(popularity.ranked('popular'), [self.most_viewed.id, self.some_views.id, self.tablet.id])
+        self.assertEqual(self.titles('popular-products'), ['A', 'B', 'C'])
+
+    def test_scores_halve_every_half_life(self):
+        popularity.refresh(now=self.now)
+        popular, trending = self.score(self.most_viewed), self.score(self.most_viewed, 'trending')
+
+        popularity.refresh(now=self.now + timedelta(days=14))
+
+        self.assertAlmostEqual(self.score(self.most_viewed), popular / 2, places=6)
+        self.assertAlmostEqual(self.score(self.most_viewed, 'trending'), trending / 2 ** 14, places=6)
+
+    def test_new_activity_is_folded_in(self):
+        popularity.refresh(now=self.now)
+        for index in range(30):
+            Favorite.objects.create(user=make_user(f'fan{index}'), product=self.tablet)
+        Product.objects.filter(pk=self.some_views.pk).update(views_count=500)
+
+        popularity.refresh(now=self.now + timedelta(minutes=10))
+
+        row = ProductPopularity.objects.get(pk=self.some_views.pk)
+        self.assertEqual(row.views_seen, 500)
+        self.assertGreater(row.popular_score, 490)
+        self.assertGreater(self.score(self.tablet, 'trending'), 140)
+        self.assertEqual(self.titles('trending-products', limit=2), ['B', 'C'])
+        self.assertEqual(self.titles('trending-products', category=self.tablets.id), ['C'])
+
+    def test_hidden_products_leave_the_rankings(self):
+        popularity.refresh(now=self.now)
+        Product.objects.filter(pk=self.some_views.pk).update(status='sold')
+        # Filtered out of responses at once, dropped from the table on the next refresh
+        self.assertEqual(self.titles('popular-products'), ['A', 'C'])
+        popularity.refresh(now=self.now + timedelta(minutes=5))
+        self.assertFalse(ProductPopularity.objects.filter(pk=self.some_views.pk).exists())
+
+    def test_cached_rankings_cost_a_fixed_number_of_queries(self):
+        popularity.refresh(now=self.now)
+        self.client.get(reverse('popular-products'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('popular-products'))
+        self.assertEqual(self.client.get(reverse('popular-products'), {'limit': 'x'}).status_code, 400)
+
+
+class SimilarProductTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.phones, books = make_category('Phones'), make_category('Books')
+        self.large = self.listing('Apple iPhone 12 128GB', '500.00', brand='Apple')
+        self.small = self.listing('Apple iPhone 12 64GB', '450.00', brand='Apple')
+        self.galaxy = self.listing('Samsung Galaxy S21', '480.00', brand='Samsung')
+        self.listing('Harry Potter book', '10.00', category=books)
+        self.listing('iPhone 12 case', '15.00', category=books)
+
+    def listing(self, title, price, category=None, **fields):
+        return make_product(
+            self.seller, category=category or self.phones, title=title, price=Decimal(price), **fields
+        )
+
+    def similar_ids(self, product):
+        return list(SimilarProduct.objects.filter(product=product).values_list('similar_id', flat=True))
+
+    def test_rebuild_ranks_by_text_category_and_price(self):
+        self.assertEqual(similar.rebuild(), 5)
+        ranked = self.similar_ids(self.large)
+        self.assertEqual(ranked[0], self.small.id)
+        self.assertIn(self.galaxy.id, ranked)
+
+        response = self.client.get(reverse('similar-products', args=[self.large.id]), {'limit': 1})
+        self.assertEqual([row['id'] for row in response.data], [self.small.id])
+
+    def test_rebuild_swaps_lists_a_batch_at_a_time(self):
+        similar.rebuild()
+        Product.objects.filter(pk=self.galaxy.pk).update(status='sold')
+
+        with mock.patch.object(similar, 'BATCH_SIZE', 3):
+            similar.rebuild()
+        swapped = set(SimilarProduct.objects.values_list('product_id', 'similar_id', 'rank'))
+        SimilarProduct.objects.all().delete()
+        similar.rebuild()
+
+        # Same lists as building from an empty table, and none left for the hidden product
+        self.assertEqual(swapped, set(SimilarProduct.objects.values_list('product_id', 'similar_id', 'rank')))
+        self.assertFalse({row for row in swapped if self.galaxy.id in row[:2]})
+
+    def test_verification_is_processed_outside_the_request(self):
+        similar.rebuild()
+        admin = make_user('moderator')
+        newer = self.listing('Apple iPhone 12 256GB', '520.00', brand='Apple', is_verified=False, status='pending_verification')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newer.verify_product(admin)
+            newer.verify_product(admin)
+
+        self.assertEqual(list(VerifiedProductQueue.objects.values_list('product_id', flat=True)), [newer.id])
+        self.assertEqual(self.similar_ids(newer), [])
+
+        call_command('process_verified_products', stdout=StringIO())
+
+        self.assertFalse(VerifiedProductQueue.objects.exists())
+        self.assertEqual(set(self.similar_ids(newer)[:2]), {self.large.id, self.small.id})
+        ranked = self.similar_ids(self.large)
+        self.assertIn(newer.id, ranked)
+        self.assertEqual(len(ranked), len(set(ranked)))
+
+
+class SavedSearchTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.buyer = make_user('buyer')
+        self.phones = make_category('Phones')
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def save_search(self, **fields):
+        return self.client.post(reverse('saved-search-list'), fields, format='json')
+
+    def listing(self, **fields):
+        fields = {
+            'category': self.phones, 'title': 'Apple iPhone 12', 'price': Decimal('250.00'),
+            'city': 'Berlin', 'country': 'Germany', 'is_verified': False, 'status': 'pending_verification', **fields,
+        }
+        return make_product(self.seller, **fields)
+
+    def matches(self, product):
+        return {search.name for search in SavedSearch.matching(product)}
+
+    def test_anchor_is_the_longest_word_else_category_else_condition(self):
+        self.assertEqual(self.save_search(query='Apple iPhone', max_price='300').status_code, 201)
+        self.assertEqual(SavedSearch.objects.get().anchor, 'word:iphone')
+        search = SavedSearch.objects.create(user=self.buyer, category=self.phones, condition='good')
+        self.assertEqual(search.anchor, f'category:{self.phones.id}')
+        search.category = None
+        search.save(update_fields=['category'])
+        self.assertEqual(SavedSearch.objects.get(pk=search.pk).anchor, 'condition:good')
+
+    def test_invalid_searches_are_rejected(self):
+        self.assertEqual(self.save_search().status_code, 400)
+        self.assertEqual(self.save_search(min_price=5, max_price=1).status_code, 400)
+        with override_settings(MAX_SAVED_SEARCHES=1):
+            self.assertEqual(self.save_search(query='iphone').status_code, 201)
+            self.assertEqual(self.save_search(query='galaxy').status_code, 400)
+
+    def test_every_criterion_must_match(self):
+        for name, fields in {
+            'words': {'query': 'iphone apple'},
+            'price bounds': {'min_price': Decimal('250.00'), 'max_price': Decimal('250.00')},
+            'category and place': {'category': self.phones, 'location': 'berl'},
+            'missing word': {'query': 'iphone case'},
+            'too cheap': {'max_price': Decimal('249.99')},
+            'elsewhere': {'query': 'iphone', 'location': 'paris'},
+            'condition': {'query': 'iphone', 'condition': 'new'},
+            'disabled': {'query': 'iphone', 'alerts_enabled': False},
+        }.items():
+            SavedSearch.objects.create(user=self.buyer, name=name, **fields)
+        SavedSearch.objects.create(user=self.seller, name='own listing', query='iphone')
+
+        self.assertEqual(self.matches(self.listing()), {'words', 'price bounds', 'category and place'})
+
+    def test_verification_notifies_each_user_once(self):
+        SavedSearch.objects.create(user=self.buyer, name='first', query='iphone')
+        SavedSearch.objects.create(user=self.buyer, name='second', category=self.phones)
+        other = make_user('other')
+        SavedSearch.objects.create(user=other, query='galaxy')
+        product = self.listing()
+
+        product.verify_product(make_user('moderator'))
+        self.assertFalse(Notification.objects.filter(notification_type='saved_search').exists())
+        VerifiedProductQueue.process()
+
+        notifications = Notification.objects.filter(notification_type='saved_search')
+        self.assertEqual([notification.recipient_id for notification in notifications], [self.buyer.id])
+        self.assertEqual(SavedSearch.objects.filter(last_match_at__isnull=False).count(), 2)
+
+    def test_hidden_listing_notifies_nobody(self):
+        SavedSearch.objects.create(user=self.buyer, query='iphone')
+        self.assertEqual(SavedSearch.notify_matches(self.listing()), 0)
+
+
+@override_settings(PRODUCT_LISTING_DAYS=60)
+class ListingExpiryTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        moderator = make_user('moderator')
+        self.bike = make_product(self.seller, title='Red Bike', brand='Trek', status='pending_verification')
+        self.other_bike = make_product(self.seller, title='Blue Bike', status='pending_verification')
+        self.lamp = make_product(self.seller, title='Lamp', status='pending_verification')
+        for product in (self.bike, self.other_bike, self.lamp):
+            product.verify_product(moderator)
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def backdate(self, *products):
+        Product.objects.filter(pk__in=[product.pk for product in products]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_verification_sets_the_listing_period(self):
+        self.bike.refresh_from_db()
+        self.assertAlmostEqual((self.bike.expires_at - timezone.now()).days, 59, delta=1)
+
+    def test_sweep_expires_due_listings_and_hides_their_terms(self):
+        self.backdate(self.bike, self.other_bike)
+
+        call_command('expire_products', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(set(Product.objects.filter(status='expired').values_list('pk', flat=True)), {self.bike.pk, self.other_bike.pk})
+        self.assertFalse(SearchTerm.objects.filter(term__in=['trek', 'blue bike']).exists())
+        self.assertTrue(SearchTerm.objects.filter(term='lamp').exists())
+        # One notification per seller per batch
+        self.assertEqual(Notification.objects.filter(notification_type='product_expired', recipient=self.seller).count(), 2)
+        self.assertEqual(Product.expire_due(), 0)
+
+    def test_one_notification_per_seller_in_a_batch(self):
+        self.backdate(self.bike, self.other_bike)
+        self.assertEqual(Product.expire_due(), 2)
+        notification = Notification.objects.get(notification_type='product_expired')
+        self.assertEqual(notification.title, '2 of your listings expired')
+
+    def test_renew_brings_an_expired_listing_back(self):
+        self.backdate(self.bike)
+        Product.expire_due()
+        # Editing the status is no way around renewing
+        response = self.client.patch(reverse('product-update', args=[self.bike.pk]), {'status': 'active'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('renew-product', args=[self.bike.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.bike.refresh_from_db()
+        self.assertEqual(self.bike.status, 'active')
+        self.assertGreater(self.bike.expires_at, timezone.now() + timedelta(days=59))
+        self.assertEqual(SearchTerm.objects.get(term='trek').product_count, 1)
+
+    def test_bulk_renew_only_touches_own_renewable_listings(self):
+        self.backdate(self.other_bike)
+        Product.expire_due()
+        other_seller = make_user('other', user_type='seller')
+        theirs = make_product(other_seller)
+
+        response = self.client.post(
+            reverse('bulk-renew-products'), {'product_ids': [self.other_bike.pk, self.lamp.pk, theirs.pk, 10 ** 6]}, format='json'
+        )
+
+        self.assertEqual(response.data['renewed'], sorted([self.other_bike.pk, self.lamp.pk]))
+        self.client.force_authenticate(other_seller)
+        self.assertEqual(self.client.post(reverse('renew-product', args=[self.bike.pk])).status_code, 404)
+        pending = make_product(other_seller, status='pending_verification', is_verified=False)
+        self.assertEqual(self.client.post(reverse('renew-product', args=[pending.pk])).status_code, 400)
+
+
+@override_settings(REPORT_ESCALATION_THRESHOLD=3, REPORT_HIDE_THRESHOLD=5)
+class ProductReportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = make_user('moderator', is_staff=True)
+        self.product = make_product(make_user('seller', user_type='seller'), title='Shady Watch')
+        self.reporters = 0
+        self.staff_client = APIClient()
+        self.staff_client.force_authenticate(self.staff)
+
+    def report(self, count=1, report_type='fraud'):
+        for _ in range(count):
+            self.reporters += 1
+            client = APIClient()
+            client.force_authenticate(make_user(f'reporter{self.reporters}'))
+            response = client.post(
+                reverse('report_product', args=[self.product.id]),
+                {'report_type': report_type, 'description': 'Looks fake'}, format='json',
+            )
+        return response
+
+    def summary(self):
+        return ProductReportSummary.objects.get(pk=self.product.pk)
+
+    def status(self):
+        return Product.objects.get(pk=self.product.pk).status
+
+    def escalations(self):
+        return Notification.objects.filter(notification_type='report_escalated', recipient=self.staff).count()
+
+    def close_one(self, action):
+        report = ProductReport.objects.filter(product=self.product, status='pending').first()
+        response = self.staff_client.post(f'/api/users/admin/reports/{report.id}/update/', {'action': action}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_reports_escalate_then_hide_the_listing(self):
+        self.assertEqual(self.report(report_type='bogus').status_code, 400)
+        self.report(3)
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.fraud_reports), (3, 3))
+        self.assertIsNotNone(summary.escalated_at)
+        self.assertIsNone(summary.hidden_at)
+        self.assertEqual(self.escalations(), 1)
+
+        self.report(2, 'spam')
+        self.assertIsNotNone(self.summary().hidden_at)
+        self.assertEqual(self.status(), 'inactive')
+        self.assertFalse(SearchTerm.objects.filter(term='shady watch').exists())
+        self.assertEqual(self.escalations(), 1)
+
+    def test_dismissing_reports_one_at_a_time_restores_the_listing(self):
+        self.report(5)
+
+        # Four open reports still keep it offline
+        self.close_one('dismiss')
+        summary = self.summary()
+        self.assertEqual(summary.open_count, 4)
+        self.assertIsNotNone(summary.hidden_at)
+        self.assertEqual(self.status(), 'inactive')
+
+        self.close_one('dismiss')
+        self.close_one('dismiss')
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.hidden_at, summary.escalated_at), (2, None, None))
+        self.assertEqual(self.status(), 'active')
+        self.assertTrue(SearchTerm.objects.filter(term='shady watch').exists())
+        # A new wave of reports escalates again
+        self.report()
+        self.assertEqual(self.escalations(), 2)
+
+    def test_resolved_reports_keep_the_listing_offline(self):
+        self.report(5)
+        for _ in range(3):
+            self.close_one('resolve')
+        self.assertIsNone(self.summary().hidden_at)
+        self.assertEqual(self.status(), 'inactive')
+
+    def test_seller_cannot_bring_a_hidden_listing_back(self):
+        self.report(5)
+        client = APIClient()
+        client.force_authenticate(self.product.seller)
+
+        response = client.patch(reverse('product-update', args=[self.product.id]), {'status': 'active'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.status(), 'inactive')
+        # Other edits still go through
+        response = client.patch(reverse('product-update', args=[self.product.id]), {'title': 'Genuine Watch'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_closing_twice_counts_once(self):
+        self.report(2)
+        report = ProductReport.objects.filter(product=self.product).first()
+        report.dismiss(self.staff)
+        report.dismiss(self.staff)
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.fraud_reports, summary.total_count), (1, 1, 2))
+
+    def test_dismissing_all_reports_at_once_restores_the_listing(self):
+        self.report(3)
+        self.report(2, 'spam')
+
+        response = self.staff_client.post(
+            f'/api/users/admin/reports/by-product/{self.product.id}/', {'action': 'dismiss'}, format='json'
+        )
+
+        self.assertEqual(response.data['closed'], 5)
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.total_count, summary.hidden_at, summary.escalated_at), (0, 5, None, None))
+        self.assertEqual(self.status(), 'active')
+
+    def test_moderation_queue_is_one_row_per_product(self):
+        self.report(3)
+        self.report(1, 'spam')
+        other = make_product(self.product.seller, title='Other')
+        ProductReport.objects.create(product=other, reporter=self.staff, report_type='spam', description='Spam')
+
+        with self.assertNumQueries(2):
+            response = self.staff_client.get('/api/users/admin/reports/by-product/')
+
+        self.assertEqual([row['product_id'] for row in response.data['results']], [self.product.id, other.id])
+        self.assertEqual(response.data['results'][0]['by_type'], {'fraud': 3, 'spam': 1})
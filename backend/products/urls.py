@@ -16,11 +16,14 @@ urlpatterns = [
     # User products
     path('user/<int:user_id>/', views.UserProductsView.as_view(), name='user-products'),
     path('my-products/', views.MyProductsView.as_view(), name='my-products'),
+    path('<int:product_id>/renew/', views.renew_product, name='renew-product'),
+    path('renew/', views.bulk_renew_products, name='bulk-renew-products'),
     
     # Offers
     path('offers/create/', views.OfferCreateView.as_view(), name='offer-create'),
     path('offers/my-offers/', views.MyOffersView.as_view(), name='my-offers'),
     path('offers/received/', views.MyReceivedOffersView.as_view(), name='my-received-offers'),
+    path('offers/received/by-product/', views.ReceivedOffersInboxView.as_view(), name='received-offers-inbox'),
     path('offers/<int:pk>/', views.OfferDetailView.as_view(), name='offer-detail'),
     path('<int:product_id>/offers/', views.OfferListView.as_view(), name='product-offers'),
     path('offers/<int:offer_id>/accept/', views.accept_offer, name='accept-offer'),
@@ -30,13 +33,22 @@ urlpatterns = [
     # Favorites
     path('favorites/', views.FavoriteListView.as_view(), name='favorite-list'),
     path('favorites/add/', views.FavoriteCreateView.as_view(), name='add-favorite'),
+    path('favorites/ids/', views.favorite_ids, name='favorite-ids'),
+    path('favorites/bulk-add/', views.bulk_add_favorites, name='bulk-add-favorites'),
+    path('favorites/bulk-remove/', views.bulk_remove_favorites, name='bulk-remove-favorites'),
     path('favorites/<int:product_id>/remove/', views.remove_favorite, name='remove-favorite'),
     path('<int:product_id>/toggle-favorite/', views.toggle_favorite, name='toggle-favorite'),
     
     # Search and discovery
     path('search/', views.search_products, name='search-products'),
+    path('suggest/', views.suggest_products, name='suggest-products'),
+    path('saved-searches/', views.SavedSearchListCreateView.as_view(), name='saved-search-list'),
+    path('saved-searches/<int:pk>/', views.SavedSearchDetailView.as_view(), name='saved-search-detail'),
+    path('nearby/', views.nearby_products, name='nearby-products'),
     path('featured/', views.featured_products, name='featured-products'),
     path('popular/', views.popular_products, name='popular-products'),
+    path('trending/', views.trending_products, name='trending-products'),
+    path('<int:product_id>/similar/', views.similar_products, name='similar-products'),
     
     # report URL patterns
     path('products/<int:product_id>/report/', views.report_product, name='report_product'),
@@ -3,14 +3,20 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q, Count, Avg
 from django.shortcuts import get_object_or_404
+from marketplace.throttling import throttle_scope
 from users.views import CanSellPermission, CanBuyPermission
-from .models import Category, Product, Offer, Favorite, ProductRating, ProductReport
+from . import popularity, suggest
+from .facets import facet_counts, without_facet
+from .models import Category, Product, Offer, Favorite, ProductRating, ProductReport, SavedSearch
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
     ProductCreateSerializer, ProductUpdateSerializer, OfferSerializer,
-    OfferListSerializer, FavoriteSerializer, ProductSearchSerializer
+    OfferListSerializer, OfferInboxSerializer, FavoriteSerializer, ProductSearchSerializer,
+    SavedSearchSerializer
 )
 
 
@@ -45,17 +51,19 @@ class ProductListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         # Only show verified products to regular users
         queryset = Product.objects.filter(is_active=True, status='active', is_verified=True)
-        
+        return self.filter_products(queryset, self.request.query_params)
+    
+    def filter_products(self, queryset, params):
         # Price filtering
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
+        min_price = params.get('min_price')
+        max_price = params.get('max_price')
         if min_price:
             queryset = queryset.filter(price__gte=min_price)
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
             
         # Location filtering
-        location = self.request.query_params.get('location')
+        location = params.get('location')
         if location:
             queryset = queryset.filter(
                 Q(city__icontains=location) |
@@ -64,6 +72,21 @@ class ProductListCreateView(generics.ListCreateAPIView):
             )
             
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = facet_counts('list', request.query_params, self.facet_queryset)
+        return response
+    
+    def facet_queryset(self, facet):
+        """Listed products matching every filter in the request except the facet's own"""
+        params = without_facet(self.request.query_params, facet)
+        queryset = Product.objects.filter(is_active=True, status='active', is_verified=True)
+        queryset = self.filter_products(queryset, params)
+        filterset_class = DjangoFilterBackend().get_filterset_class(self, queryset)
+        queryset = filterset_class(params, queryset=queryset, request=self.request).qs
+        return filters.SearchFilter().filter_queryset(self.request, queryset, self)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -158,6 +181,7 @@ class OfferCreateView(generics.CreateAPIView):
     """Create an offer for a product"""
     serializer_class = OfferSerializer
     permission_classes = [CanBuyPermission]
+    throttle_scope = 'offer'
     
     def create(self, request, *args, **kwargs):
         # Add debug logging
@@ -211,7 +235,9 @@ class OfferListView(generics.ListAPIView):
         if product.seller != self.request.user:
             return Offer.objects.none()
         
-        return Offer.objects.filter(product=product).order_by('-created_at')
+        return Offer.objects.filter(product=product).select_related(
+            'product', 'buyer'
+        ).prefetch_related('product__images').order_by('-created_at')
 
 
 class MyOffersView(generics.ListAPIView):
@@ -220,7 +246,9 @@ class MyOffersView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Offer.objects.filter(buyer=self.request.user).order_by('-created_at')
+        return Offer.objects.filter(buyer=self.request.user).select_related(
+            'product', 'buyer'
+        ).prefetch_related('product__images').order_by('-created_at')
 
 
 class MyReceivedOffersView(generics.ListAPIView):
@@ -232,7 +260,27 @@ class MyReceivedOffersView(generics.ListAPIView):
         # Get all offers for products owned by the current user
         return Offer.objects.filter(
             product__seller=self.request.user
-        ).order_by('-created_at')
+        ).select_related('product', 'buyer').prefetch_related('product__images').order_by('-created_at')
+
+
+class ReceivedOffersInboxView(generics.ListAPIView):
+    """
+    Seller's received offers grouped by product: pending count, highest
+    pending offer and latest offer time, newest activity first. Reads the
+    summary kept on Product, so a page costs the same whatever the number
+    of listings or offers. Pass ?pending=1 to hide products with nothing
+    pending.
+    """
+    serializer_class = OfferInboxSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Product.objects.filter(
+            seller=self.request.user, last_offer_at__isnull=False
+        )
+        if self.request.query_params.get('pending') in ('1', 'true'):
+            queryset = queryset.filter(pending_offers_count__gt=0)
+        return queryset.prefetch_related('images').order_by('-last_offer_at')
 
 
 class OfferDetailView(generics.RetrieveAPIView):
@@ -250,10 +298,10 @@ class OfferDetailView(generics.RetrieveAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def accept_offer(request, offer_id):
-    """Accept an offer (seller only)"""
-    offer = get_object_or_404(Offer, id=offer_id)
+    """Accept an offer (seller only); other pending offers on the product are rejected"""
+    offer = get_object_or_404(Offer.objects.select_related('product'), id=offer_id)
     
-    if offer.product.seller != request.user:
+    if offer.product.seller_id != request.user.id:
         return Response(
             {'error': 'You can only accept offers for your own products'}, 
             status=status.HTTP_403_FORBIDDEN
@@ -265,20 +313,36 @@ def accept_offer(request, offer_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    offer.accept()
+    try:
+        rejected = offer.accept()
+    except ValueError as e:
+        # Lost a race with another accept, or the product is not verified
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     
-    # Create notification for buyer
+    # Notify the winning buyer and, in one insert, everyone whose offer was rejected
     from chat.models import Notification
-    Notification.objects.create(
-        recipient=offer.buyer,
-        sender=request.user,
-        notification_type='offer_accepted',
-        title=f'Your offer was accepted!',
-        message=f'Your offer of ${offer.amount} for "{offer.product.title}" has been accepted',
-        related_product=offer.product
-    )
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=offer.buyer_id,
+            sender=request.user,
+            notification_type='offer_accepted',
+            title=f'Your offer was accepted!',
+            message=f'Your offer of ${offer.amount} for "{offer.product.title}" has been accepted',
+            related_product=offer.product
+        )
+    ] + [
+        Notification(
+            recipient_id=buyer_id,
+            sender=request.user,
+            notification_type='offer_rejected',
+            title=f'Your offer was rejected',
+            message=f'The seller accepted another offer for "{offer.product.title}"',
+            related_product=offer.product
+        )
+        for _, buyer_id in rejected
+    ])
     
-    return Response({'message': 'Offer accepted successfully'})
+    return Response({'message': 'Offer accepted successfully', 'rejected_offers': len(rejected)})
 
 
 @api_view(['POST'])
@@ -354,95 +418,123 @@ class FavoriteListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user).order_by('-created_at')
+        return Favorite.objects.filter(user=self.request.user).select_related(
+            'product__seller', 'product__category'
+        ).prefetch_related('product__images').order_by('-created_at')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def favorite_ids(request):
+    """Ids of every product the current user has favorited, for checking favorite state client-side"""
+    return Response({'product_ids': sorted(Favorite.ids_for(request.user.pk))})
+
+
+def _requested_product_ids(request):
+    product_ids = request.data.get('product_ids')
+    if not isinstance(product_ids, list) or not product_ids:
+        return None, Response({'error': 'product_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        product_ids = {int(product_id) for product_id in product_ids}
+    except (TypeError, ValueError):
+        return None, Response({'error': 'product_ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(product_ids) > 100:
+        return None, Response({'error': 'At most 100 products per request'}, status=status.HTTP_400_BAD_REQUEST)
+    return product_ids, None
+
+
+@throttle_scope('favorite')
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_add_favorites(request):
+    """Favorite several products at once; unavailable and already favorited ones are skipped"""
+    product_ids, error = _requested_product_ids(request)
+    if error:
+        return error
+    added = Favorite.add_many(request.user, product_ids)
+    return Response({'added': sorted(added)})
+
+
+@throttle_scope('favorite')
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_remove_favorites(request):
+    """Unfavorite several products at once"""
+    product_ids, error = _requested_product_ids(request)
+    if error:
+        return error
+    removed = Favorite.remove_many(request.user, product_ids)
+    return Response({'removed': sorted(removed)})
 
 
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def remove_favorite(request, product_id):
     """Remove product from favorites"""
-    try:
-        favorite = Favorite.objects.get(
-            user=request.user, 
-            product_id=product_id
-        )
-        favorite.delete()
+    if Favorite.remove_many(request.user, [product_id]):
         return Response({'message': 'Product removed from favorites'})
-    except Favorite.DoesNotExist:
-        return Response(
-            {'error': 'Product not in favorites'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
+    return Response(
+        {'error': 'Product not in favorites'}, 
+        status=status.HTTP_404_NOT_FOUND
+    )
 
 
+@throttle_scope('favorite')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_favorite(request, product_id):
     """Toggle product in favorites (add if not favorited, remove if favorited)"""
-    try:
-        favorite = Favorite.objects.get(
-            user=request.user, 
-            product_id=product_id
-        )
-        # Product is already favorited, remove it
-        favorite.delete()
+    if Favorite.remove_many(request.user, [product_id]):
         return Response({'message': 'Product removed from favorites', 'is_favorited': False})
-    except Favorite.DoesNotExist:
-        # Product is not favorited, add it
-        try:
-            product = Product.objects.get(id=product_id, is_verified=True)  # Only allow favoriting verified products
-            Favorite.objects.create(user=request.user, product=product)
-            return Response({'message': 'Product added to favorites', 'is_favorited': True})
-        except Product.DoesNotExist:
-            return Response(
-                {'error': 'Product not found or not available'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+    
+    # Not favorited yet; only verified products can be added
+    if Favorite.add_many(request.user, [product_id]):
+        return Response({'message': 'Product added to favorites', 'is_favorited': True})
+    return Response(
+        {'error': 'Product not found or not available'}, 
+        status=status.HTTP_404_NOT_FOUND
+    )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def renew_product(request, product_id):
+    """Keep one of your listings up for another listing period, relisting it if it expired"""
+    product = get_object_or_404(Product, pk=product_id, seller=request.user)
+    if not product.can_renew():
+        return Response(
+            {'error': 'Only verified listings that are active or expired can be renewed'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    product.renew()
+    return Response({'message': 'Listing renewed', 'status': product.status, 'expires_at': product.expires_at})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_renew_products(request):
+    """Renew several of your listings: {"product_ids": [...]} (up to 100)"""
+    product_ids, error = _requested_product_ids(request)
+    if error:
+        return error
+    renewed = []
+    with transaction.atomic():
+        for product in Product.objects.filter(pk__in=product_ids, seller=request.user):
+            if product.can_renew():
+                product.renew()
+                renewed.append(product.pk)
+    return Response({'renewed': sorted(renewed)})
+
+
+@throttle_scope('search')
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def search_products(request):
-    """Advanced product search"""
+    """Advanced product search; pass facets=1 to get facet counts with the results"""
     serializer = ProductSearchSerializer(data=request.query_params)
     if serializer.is_valid():
         data = serializer.validated_data
-        
-        # Only search verified products
-        queryset = Product.objects.filter(is_active=True, status='active', is_verified=True)
-        
-        # Text search
-        if data.get('query'):
-            query = data['query']
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(brand__icontains=query) |
-                Q(model__icontains=query)
-            )
-        
-        # Category filter
-        if data.get('category'):
-            queryset = queryset.filter(category_id=data['category'])
-        
-        # Price range
-        if data.get('min_price'):
-            queryset = queryset.filter(price__gte=data['min_price'])
-        if data.get('max_price'):
-            queryset = queryset.filter(price__lte=data['max_price'])
-        
-        # Condition filter
-        if data.get('condition'):
-            queryset = queryset.filter(condition=data['condition'])
-        
-        # Location filter
-        if data.get('location'):
-            location = data['location']
-            queryset = queryset.filter(
-                Q(city__icontains=location) |
-                Q(country__icontains=location) |
-                Q(location__icontains=location)
-            )
+        queryset = _search_queryset(data)
         
         # Sorting
         sort_by = data.get('sort_by', 'newest')
@@ -457,11 +549,132 @@ def search_products(request):
         
         # Return results
         serializer = ProductListSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        if not data.get('facets'):
+            return Response(serializer.data)
+        
+        facets = facet_counts('search', data, lambda facet: _search_queryset(without_facet(data, facet)))
+        return Response({'results': serializer.data, 'count': len(serializer.data), 'facets': facets})
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _search_queryset(data):
+    # Only search verified products
+    queryset = Product.objects.filter(is_active=True, status='active', is_verified=True)
+    
+    # Text search
+    if data.get('query'):
+        query = data['query']
+        queryset = queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(brand__icontains=query) |
+            Q(model__icontains=query)
+        )
+    
+    # Category filter
+    if data.get('category'):
+        queryset = queryset.filter(category_id=data['category'])
+    
+    # Price range
+    if data.get('min_price'):
+        queryset = queryset.filter(price__gte=data['min_price'])
+    if data.get('max_price'):
+        queryset = queryset.filter(price__lte=data['max_price'])
+    
+    # Condition filter
+    if data.get('condition'):
+        queryset = queryset.filter(condition=data['condition'])
+    
+    # Location filter
+    if data.get('location'):
+        location = data['location']
+        queryset = queryset.filter(
+            Q(city__icontains=location) |
+            Q(country__icontains=location) |
+            Q(location__icontains=location)
+        )
+    
+    return queryset
+
+
+class SavedSearchListCreateView(generics.ListCreateAPIView):
+    """List the current user's saved searches (GET) and save a new one (POST)"""
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class SavedSearchDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """View, change (e.g. turn alerts off) or delete one of the current user's saved searches"""
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+
+
+@throttle_scope('suggest')
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def suggest_products(request):
+    """
+    Typeahead suggestions for a partial query (?q=ipho&limit=8): the most
+    popular product titles, brands, models and categories starting with it
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 8)), 1), suggest.MAX_SUGGESTIONS)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'suggestions': suggest.suggest(request.query_params.get('q', ''), limit)})
+
+
+@throttle_scope('search')
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def nearby_products(request):
+    """
+    Verified products near a point, nearest first, each with distance_km.
+    ?lat=&lng= plus radius_km (only products within it, max 500) and/or
+    k (how many, default 20, max 100); without radius_km this is a
+    k-nearest search.
+    """
+    params = request.query_params
+    try:
+        latitude = float(params['lat'])
+        longitude = float(params['lng'])
+        radius_km = float(params['radius_km']) if params.get('radius_km') else None
+        k = int(params.get('k', 20))
+    except (KeyError, ValueError):
+        return Response(
+            {'error': 'lat and lng are required; lat, lng, radius_km and k must be numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return Response({'error': 'lat or lng out of range'}, status=status.HTTP_400_BAD_REQUEST)
+    if radius_km is not None and not 0 < radius_km <= 500:
+        return Response({'error': 'radius_km must be between 0 and 500'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= k <= 100:
+        return Response({'error': 'k must be between 1 and 100'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    visible = Product.objects.filter(is_active=True, status='active', is_verified=True)
+    nearest = Product.nearby(latitude, longitude, radius_km=radius_km, limit=k, queryset=visible)
+    products = visible.in_bulk([product_id for product_id, _ in nearest])
+    nearest = [(products[product_id], distance) for product_id, distance in nearest if product_id in products]
+    
+    results = ProductListSerializer(
+        [product for product, _ in nearest], many=True, context={'request': request}
+    ).data
+    for row, (_, distance) in zip(results, nearest):
+        row['distance_km'] = round(distance, 3)
+    return Response({'results': results, 'count': len(results)})
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def featured_products(request):
@@ -485,12 +698,64 @@ def featured_products(request):
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def popular_products(request):
-    """Get popular products based on views"""
-    products = Product.objects.filter(
-        is_active=True, 
+    """
+    Most popular verified products (?category=&limit=, max 100), ranked by
+    views, favorites, conversations and offers with older activity decayed
+    """
+    return _ranked_products(request, 'popular')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def trending_products(request):
+    """Products gaining attention fastest right now (?category=&limit=, max 100)"""
+    return _ranked_products(request, 'trending')
+
+
+def _ranked_products(request, kind):
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+    except ValueError:
+        return Response({'error': 'limit and category must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    visible = Product.objects.filter(
+        is_active=True,
         status='active',
         is_verified=True  # Only show verified popular products
-    ).order_by('-views_count')[:10]
+    ).select_related('seller', 'category').prefetch_related('images')
+    if category_id is not None:
+        visible = visible.filter(category_id=category_id)
+    
+    ranked_ids = popularity.ranked(kind, category_id)
+    if ranked_ids:
+        # Rankings lag behind by up to a refresh, so skip products hidden since
+        found = visible.in_bulk(ranked_ids[:limit * 2])
+        products = [found[product_id] for product_id in ranked_ids if product_id in found][:limit]
+    else:
+        # Not scored yet (before the first refresh_popularity run)
+        products = visible.order_by('-views_count')[:limit]
+    
+    serializer = ProductListSerializer(products, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def similar_products(request, product_id):
+    """Products most like the given one (?limit=, default and max SIMILAR_PRODUCTS_COUNT), best first"""
+    try:
+        limit = min(max(int(request.query_params.get('limit', settings.SIMILAR_PRODUCTS_COUNT)), 1),
+                    settings.SIMILAR_PRODUCTS_COUNT)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    products = Product.objects.filter(
+        similar_to__product_id=product_id,
+        is_active=True,
+        status='active',
+        is_verified=True
+    ).select_related('seller', 'category').prefetch_related('images').order_by('similar_to__rank')[:limit]
     
     serializer = ProductListSerializer(products, many=True, context={'request': request})
     return Response(serializer.data)
@@ -614,6 +879,7 @@ def get_product_ratings(request, product_id):
 
 # NEW VIEWS FOR PRODUCT REPORTING
 
+@throttle_scope('report')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def report_product(request, product_id):
@@ -628,6 +894,12 @@ def report_product(request, product_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if request.data.get('report_type') not in dict(ProductReport.REPORT_TYPES):
+            return Response(
+                {'error': 'Invalid report type'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Check if user has already reported this product
         existing_report = ProductReport.objects.filter(
             reporter=request.user,
@@ -669,7 +941,7 @@ def report_product(request, product_id):
 @permission_classes([permissions.IsAuthenticated])
 def my_reports(request):
     """Get current user's reports"""
-    reports = ProductReport.objects.filter(reporter=request.user).order_by('-created_at')
+    reports = ProductReport.objects.filter(reporter=request.user).select_related('product__seller').order_by('-created_at')
     
     reports_data = []
     for report in reports:
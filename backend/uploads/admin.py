@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Upload
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = ['key', 'owner', 'purpose', 'size', 'status', 'created_at']
+    list_filter = ['purpose', 'status', 'created_at']
+    search_fields = ['key', 'filename', 'owner__username']
+    ordering = ['-created_at']
+    list_select_related = ['owner']
+    readonly_fields = ['created_at', 'expires_at', 'finalized_at']
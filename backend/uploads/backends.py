@@ -0,0 +1,105 @@
+"""
+Upload backends issue the URL a client uploads to and inspect the stored
+object afterwards. The S3 backend works with AWS or any S3-compatible
+service (MinIO, moto server); the local backend emulates presigned URLs
+with signed tokens so development needs no bucket.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+LOCAL_UPLOAD_SALT = 'uploads.local'
+
+
+class S3UploadBackend:
+    """Presigned POST uploads straight to an S3-compatible bucket"""
+
+    def __init__(self):
+        import boto3
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.location = getattr(settings, 'AWS_LOCATION', '')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+            region_name=settings.AWS_S3_REGION_NAME or None,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+        )
+
+    def _object_key(self, key):
+        return f"{self.location.strip('/')}/{key}" if self.location else key
+
+    def presign(self, upload, max_size, request=None):
+        post = self.client.generate_presigned_post(
+            self.bucket,
+            self._object_key(upload.key),
+            Fields={'Content-Type': upload.content_type},
+            Conditions=[
+                {'Content-Type': upload.content_type},
+                ['content-length-range', 1, max_size],
+            ],
+            ExpiresIn=settings.UPLOAD_URL_EXPIRY,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+    def stat(self, key):
+        """Return (size, content_type) of the stored object, or None if missing"""
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError:
+            return None
+        return head['ContentLength'], head.get('ContentType', '')
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+class LocalUploadBackend:
+    """Signed PUT URLs served by the app itself, writing to default_storage"""
+
+    def presign(self, upload, max_size, request=None):
+        token = signing.dumps({'id': upload.id, 'key': upload.key}, salt=LOCAL_UPLOAD_SALT)
+        url = f"{reverse('upload-blob', args=[upload.id])}?token={token}"
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Type': upload.content_type}}
+
+    @staticmethod
+    def check_token(upload, token):
+        try:
+            payload = signing.loads(token, salt=LOCAL_UPLOAD_SALT, max_age=settings.UPLOAD_URL_EXPIRY)
+        except signing.BadSignature:
+            return False
+        return payload == {'id': upload.id, 'key': upload.key}
+
+    def receive(self, upload, stream):
+        """Stream the request body into storage under the reserved key"""
+        # Another PUT to the same URL replaces the object, as it would in a bucket,
+        # instead of being saved under a new name next to it
+        default_storage.delete(upload.key)
+        saved = default_storage.save(upload.key, File(stream, name=upload.key))
+        if saved != upload.key:
+            # Storage renamed the file; keep the row pointing at what was written
+            upload.key = saved
+            upload.save(update_fields=['key'])
+
+    def stat(self, key):
+        if not default_storage.exists(key):
+            return None
+        return default_storage.size(key), ''
+
+    def delete(self, key):
+        default_storage.delete(key)
+
+
+_backends = {
+    's3': S3UploadBackend,
+    'local': LocalUploadBackend,
+}
+
+
+def get_upload_backend():
+    return _backends[settings.UPLOAD_BACKEND]()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from uploads.backends import get_upload_backend
+from uploads.models import Upload
+
+
+class Command(BaseCommand):
+    help = "Expire upload tickets that were never finalized and delete any orphaned objects. Run periodically from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="How many stale uploads to process per batch.")
+
+    def handle(self, *args, **options):
+        backend = get_upload_backend()
+        batch_size = options["batch_size"]
+        purged = 0
+
+        while True:
+            stale = list(
+                Upload.objects.filter(status='pending', expires_at__lt=timezone.now())
+                .values_list('id', 'key')[:batch_size]
+            )
+            if not stale:
+                break
+            for _, key in stale:
+                if backend.stat(key) is not None:
+                    backend.delete(key)
+            purged += Upload.objects.filter(id__in=[pk for pk, _ in stale]).update(status='expired')
+
+        self.stdout.write(self.style.SUCCESS(f"Expired {purged} stale uploads."))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(choices=[('profile_image', 'Profile Image'), ('product_image', 'Product Image'), ('dispute_evidence', 'Dispute Evidence'), ('id_card_front', 'ID Card Front'), ('id_card_back', 'ID Card Back')], max_length=20)),
+                ('target_id', models.PositiveIntegerField(blank=True, help_text='Product or dispute the file belongs to', null=True)),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.PositiveBigIntegerField(help_text='Size in bytes declared by the client')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('finalized', 'Finalized'), ('expired', 'Expired')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('finalized_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'uploads',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='uploads_status_expiry_idx')],
+            },
+        ),
+    ]
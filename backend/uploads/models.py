@@ -0,0 +1,48 @@
+from django.db import models
+from users.models import User
+
+
+class Upload(models.Model):
+    """A file the client uploads straight to object storage, attached on finalize"""
+    PURPOSE_CHOICES = [
+        ('profile_image', 'Profile Image'),
+        ('product_image', 'Product Image'),
+        ('dispute_evidence', 'Dispute Evidence'),
+        ('id_card_front', 'ID Card Front'),
+        ('id_card_back', 'ID Card Back'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('finalized', 'Finalized'),
+        ('expired', 'Expired'),
+    ]
+    
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    target_id = models.PositiveIntegerField(blank=True, null=True, help_text="Product or dispute the file belongs to")
+    
+    # Object storage key, relative to the storage root like any FileField name
+    key = models.CharField(max_length=255, unique=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField(help_text="Size in bytes declared by the client")
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    finalized_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'uploads'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='uploads_status_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_purpose_display()} upload by {self.owner.username} - {self.status}"
+    
+    def is_expired(self):
+        from django.utils import timezone
+        return self.expires_at <= timezone.now()
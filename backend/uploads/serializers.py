@@ -0,0 +1,52 @@
+import os
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from .models import Upload
+from .targets import PURPOSES
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """Serializer for upload tickets"""
+    
+    class Meta:
+        model = Upload
+        fields = [
+            'id', 'purpose', 'target_id', 'key', 'filename', 'content_type',
+            'size', 'status', 'created_at', 'expires_at', 'finalized_at'
+        ]
+        read_only_fields = fields
+
+
+class UploadCreateSerializer(serializers.ModelSerializer):
+    """Serializer for requesting a direct upload URL"""
+    
+    class Meta:
+        model = Upload
+        fields = ['purpose', 'target_id', 'filename', 'content_type', 'size']
+    
+    def validate(self, attrs):
+        rules = PURPOSES[attrs['purpose']]
+        
+        if attrs['content_type'] not in rules['content_types']:
+            raise serializers.ValidationError(
+                f"Content type {attrs['content_type']} is not allowed for {attrs['purpose']}"
+            )
+        if attrs['size'] < 1 or attrs['size'] > rules['max_size']:
+            raise serializers.ValidationError(
+                f"File size must be between 1 and {rules['max_size']} bytes"
+            )
+        
+        # Raises NotFound / PermissionDenied for targets the user can't touch
+        rules['resolve'](self.context['request'].user, attrs.get('target_id'))
+        return attrs
+    
+    def create(self, validated_data):
+        rules = PURPOSES[validated_data['purpose']]
+        extension = os.path.splitext(validated_data['filename'])[1].lower()[:10]
+        validated_data['key'] = f"{rules['prefix']}{uuid.uuid4().hex}{extension}"
+        validated_data['owner'] = self.context['request'].user
+        validated_data['expires_at'] = timezone.now() + timedelta(seconds=settings.UPLOAD_URL_EXPIRY)
+        return super().create(validated_data)
@@ -0,0 +1,107 @@
+"""
+What each upload purpose may contain, who may upload it, and how a
+finalized object is attached to its model field.
+"""
+from rest_framework.exceptions import NotFound, PermissionDenied
+
+IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/webp', 'image/gif']
+DOCUMENT_TYPES = IMAGE_TYPES + ['application/pdf']
+
+MB = 1024 * 1024
+
+
+def _own_profile(user, target_id):
+    return user
+
+
+def _own_product(user, target_id):
+    from products.models import Product
+    product = Product.objects.filter(id=target_id, seller=user).first()
+    if product is None:
+        raise NotFound('Product not found')
+    return product
+
+
+def _involved_dispute(user, target_id):
+    from orders.models import Dispute
+    dispute = Dispute.involving(user).filter(id=target_id).first()
+    if dispute is None:
+        raise NotFound('Dispute not found')
+    return dispute
+
+
+def _seller_account(user, target_id):
+    if not user.needs_verification():
+        raise PermissionDenied('Only seller accounts submit ID cards')
+    return user
+
+
+def _attach_profile_image(user, upload):
+    user.profile_image.name = upload.key
+    user.save(update_fields=['profile_image', 'updated_at'])
+
+
+def _attach_product_image(product, upload):
+    from products.models import ProductImage
+    ProductImage.objects.create(
+        product=product,
+        image=upload.key,
+        is_main=not product.images.exists(),
+    )
+
+
+def _attach_dispute_evidence(dispute, upload):
+    dispute.evidence.name = upload.key
+    dispute.save(update_fields=['evidence', 'updated_at'])
+
+
+def _attach_id_card(side):
+    def attach(user, upload):
+        from users.models import VerificationRequest
+        request, created = VerificationRequest.objects.get_or_create(
+            user=user, defaults={side: upload.key}
+        )
+        if not created:
+            setattr(request, side, upload.key)
+            request.status = 'pending'
+            request.save(update_fields=[side, 'status', 'updated_at'])
+    return attach
+
+
+PURPOSES = {
+    'profile_image': {
+        'prefix': 'profile_images/',
+        'content_types': IMAGE_TYPES,
+        'max_size': 5 * MB,
+        'resolve': _own_profile,
+        'attach': _attach_profile_image,
+    },
+    'product_image': {
+        'prefix': 'product_images/',
+        'content_types': IMAGE_TYPES,
+        'max_size': 20 * MB,
+        'resolve': _own_product,
+        'attach': _attach_product_image,
+    },
+    'dispute_evidence': {
+        'prefix': 'dispute_evidence/',
+        'content_types': DOCUMENT_TYPES + ['video/mp4'],
+        'max_size': 200 * MB,
+        'resolve': _involved_dispute,
+        'attach': _attach_dispute_evidence,
+    },
+    'id_card_front': {
+        'prefix': 'verification/id_cards/front/',
+        'content_types': IMAGE_TYPES,
+        'max_size': 20 * MB,
+        'resolve': _seller_account,
+        'attach': _attach_id_card('id_card_front'),
+    },
+    'id_card_back': {
+        'prefix': 'verification/id_cards/back/',
+        'content_types': IMAGE_TYPES,
+        'max_size': 20 * MB,
+        'resolve': _seller_account,
+        'attach': _attach_id_card('id_card_back'),
+    },
+}
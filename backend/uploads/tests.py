@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from marketplace.factories import CacheClearingTestCase, make_product, make_user
+from products.models import ProductImage
+from .backends import get_upload_backend
+from .models import Upload
+from .targets import PURPOSES
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 64
+BUCKET = 'marketplace-test'
+
+
+class UploadFlowMixin:
+    """The create/finalize round trip, independent of where the bytes go"""
+
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.product = make_product(self.seller)
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def request_upload(self):
+        response = self.client.post(reverse('upload-create'), {
+            'purpose': 'product_image', 'target_id': self.product.id,
+            'filename': 'phone.png', 'content_type': 'image/png', 'size': len(PNG),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Upload.objects.get(pk=response.data['upload']['id']), response.data['upload_request']
+
+    def finalize(self, upload):
+        return self.client.post(reverse('upload-finalize', args=[upload.id]))
+
+    def test_finalize_before_upload_is_rejected(self):
+        upload, _ = self.request_upload()
+        self.assertEqual(self.finalize(upload).status_code, 400)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'pending')
+
+    def test_finalize_attaches_once(self):
+        upload, upload_request = self.request_upload()
+        self.store(upload, upload_request, PNG)
+
+        first, second = self.finalize(upload), self.finalize(upload)
+
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(second.data['status'], 'finalized')
+        image = ProductImage.objects.get(product=self.product)
+        self.assertEqual((image.image.name, image.is_main), (upload.key, True))
+
+    def test_finalize_that_lost_a_race_does_not_attach_again(self):
+        upload, upload_request = self.request_upload()
+        self.store(upload, upload_request, PNG)
+        backend = get_upload_backend()
+        stat = backend.stat
+
+        def stat_while_another_request_finalizes(key):
+            Upload.objects.filter(pk=upload.pk).update(status='finalized')
+            return stat(key)
+
+        with mock.patch.object(backend, 'stat', stat_while_another_request_finalizes), \
+                mock.patch('uploads.views.get_upload_backend', return_value=backend):
+            response = self.finalize(upload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_finalize_after_expiry_is_rejected(self):
+        upload, upload_request = self.request_upload()
+        self.store(upload, upload_request, PNG)
+        Upload.objects.filter(pk=upload.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.finalize(upload)
+
+        self.assertEqual(response.status_code, 400)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'expired')
+        self.assertIsNone(get_upload_backend().stat(upload.key))
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_oversized_object_expires_upload(self):
+        upload, upload_request = self.request_upload()
+        self.store(upload, upload_request, PNG)
+
+        # The stored size is what counts, whatever the client declared
+        with mock.patch.dict(PURPOSES['product_image'], max_size=len(PNG) - 1):
+            response = self.finalize(upload)
+
+        self.assertEqual(response.status_code, 400)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'expired')
+        self.assertFalse(ProductImage.objects.exists())
+
+
+class LocalUploadTests(UploadFlowMixin, CacheClearingTestCase):
+    """The filesystem backend stands in for the bucket in development"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_BACKEND='local', MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
+
+    def store(self, upload, upload_request, body):
+        self.assertEqual(upload_request['method'], 'PUT')
+        response = self.client.generic('PUT', upload_request['url'], body, content_type='image/png')
+        self.assertEqual(response.status_code, 204)
+
+    def test_second_put_replaces_the_file(self):
+        upload, upload_request = self.request_upload()
+        self.store(upload, upload_request, PNG)
+        self.store(upload, upload_request, PNG + b'\0')
+
+        key = upload.key
+        upload.refresh_from_db()
+        self.assertEqual(upload.key, key)
+        folder, _ = os.path.split(os.path.join(settings.MEDIA_ROOT, upload.key))
+        self.assertEqual(os.listdir(folder), [os.path.basename(upload.key)])
+        self.assertEqual(self.finalize(upload).data['size'], len(PNG) + 1)
+
+    def test_blob_url_needs_a_valid_token(self):
+        upload, upload_request = self.request_upload()
+        url = upload_request['url'].split('?')[0]
+        response = self.client.generic('PUT', f'{url}?token=forged', PNG, content_type='image/png')
+        self.assertEqual(response.status_code, 403)
+
+
+@skipUnless(mock_aws, "moto is not installed")
+class S3UploadTests(UploadFlowMixin, CacheClearingTestCase):
+    """The S3 backend against moto's in-process S3"""
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        settings_override = override_settings(
+            UPLOAD_BACKEND='s3', AWS_STORAGE_BUCKET_NAME=BUCKET, AWS_S3_REGION_NAME='us-east-1',
+            AWS_S3_ENDPOINT_URL='', AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket=BUCKET)
+        super().setUp()
+
+    def store(self, upload, upload_request, body):
+        self.assertEqual(upload_request['method'], 'POST')
+        self.assertEqual(upload_request['fields']['key'], upload.key)
+        self.s3.put_object(Bucket=BUCKET, Key=upload.key, Body=body, ContentType='image/png')
+
+    def test_content_type_mismatch_deletes_object(self):
+        upload, upload_request = self.request_upload()
+        self.s3.put_object(Bucket=BUCKET, Key=upload.key, Body=PNG, ContentType='text/html')
+
+        self.assertEqual(self.finalize(upload).status_code, 400)
+        self.assertEqual(self.s3.list_objects_v2(Bucket=BUCKET).get('KeyCount'), 0)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.UploadCreateView.as_view(), name='upload-create'),
+    path('mine/', views.MyUploadsView.as_view(), name='my-uploads'),
+    path('<int:upload_id>/finalize/', views.finalize_upload, name='upload-finalize'),
+    path('<int:upload_id>/blob/', views.upload_blob, name='upload-blob'),
+]
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status, generics, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from .backends import LocalUploadBackend, get_upload_backend
+from .models import Upload
+from .serializers import UploadSerializer, UploadCreateSerializer
+from .targets import PURPOSES
+
+
+class UploadCreateView(generics.CreateAPIView):
+    """Reserve a storage key and return a presigned URL for a direct upload"""
+    serializer_class = UploadCreateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save()
+        
+        max_size = PURPOSES[upload.purpose]['max_size']
+        return Response({
+            'upload': UploadSerializer(upload).data,
+            'upload_request': get_upload_backend().presign(upload, max_size, request=request),
+        }, status=status.HTTP_201_CREATED)
+
+
+class MyUploadsView(generics.ListAPIView):
+    """List current user's uploads"""
+    serializer_class = UploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Upload.objects.filter(owner=self.request.user).order_by('-created_at')
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def finalize_upload(request, upload_id):
+    """Verify an uploaded object landed in storage and attach it to its target"""
+    upload = get_object_or_404(Upload, id=upload_id, owner=request.user)
+    
+    if upload.status == 'finalized':
+        return Response(UploadSerializer(upload).data)
+    if upload.status != 'pending':
+        return Response({'error': 'Upload has expired'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    backend = get_upload_backend()
+    if upload.is_expired():
+        # purge_stale_uploads deletes the objects of expired uploads; never attach one
+        backend.delete(upload.key)
+        Upload.objects.filter(pk=upload.pk, status='pending').update(status='expired')
+        return Response({'error': 'Upload has expired'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    stored = backend.stat(upload.key)
+    if stored is None:
+        return Response({'error': 'File has not been uploaded yet'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    size, content_type = stored
+    rules = PURPOSES[upload.purpose]
+    if size > rules['max_size'] or (content_type and content_type != upload.content_type):
+        backend.delete(upload.key)
+        Upload.objects.filter(pk=upload.pk, status='pending').update(status='expired')
+        return Response({'error': 'Uploaded file does not match the upload request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    with transaction.atomic():
+        # Re-read under a row lock: of two concurrent finalizes only one attaches the file
+        upload = Upload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'finalized':
+            return Response(UploadSerializer(upload).data)
+        if upload.status != 'pending':
+            return Response({'error': 'Upload has expired'}, status=status.HTTP_400_BAD_REQUEST)
+        target = rules['resolve'](request.user, upload.target_id)
+        rules['attach'](target, upload)
+        upload.size = size
+        upload.status = 'finalized'
+        upload.finalized_at = timezone.now()
+        upload.save(update_fields=['size', 'status', 'finalized_at'])
+    
+    return Response(UploadSerializer(upload).data)
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+def upload_blob(request, upload_id):
+    """Receive a file PUT to a local signed URL (development stand-in for a bucket)"""
+    if settings.UPLOAD_BACKEND != 'local':
+        return JsonResponse({'error': 'Direct uploads go to object storage'}, status=404)
+    
+    upload = get_object_or_404(Upload, id=upload_id, status='pending')
+    if upload.is_expired() or not LocalUploadBackend.check_token(upload, request.GET.get('token', '')):
+        return JsonResponse({'error': 'Invalid or expired upload URL'}, status=403)
+    
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if not 0 < content_length <= PURPOSES[upload.purpose]['max_size']:
+        return JsonResponse({'error': 'File size not allowed'}, status=400)
+    
+    LocalUploadBackend().receive(upload, request)
+    return HttpResponse(status=204)
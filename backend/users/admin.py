@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserRating
+from .models import SellerReputation, User, UserRating
 
 
 @admin.register(User)
@@ -55,6 +55,7 @@ class UserAdmin(BaseUserAdmin):
             verification_date=timezone.now(),
             is_active_seller=True
         )
+        User.invalidate_caches_for(*queryset.values_list('id', flat=True))
         self.message_user(request, f'{updated} sellers have been verified.')
     verify_sellers.short_description = "Verify selected sellers"
     
@@ -63,16 +64,19 @@ class UserAdmin(BaseUserAdmin):
             verification_status='rejected',
             is_active_seller=False
         )
+        User.invalidate_caches_for(*queryset.values_list('id', flat=True))
         self.message_user(request, f'{updated} sellers have been unverified.')
     unverify_sellers.short_description = "Unverify selected sellers"
     
     def activate_sellers(self, request, queryset):
         updated = queryset.update(is_active_seller=True)
+        User.invalidate_caches_for(*queryset.values_list('id', flat=True))
         self.message_user(request, f'{updated} sellers have been activated.')
     activate_sellers.short_description = "Activate selected sellers"
     
     def deactivate_sellers(self, request, queryset):
         updated = queryset.update(is_active_seller=False)
+        User.invalidate_caches_for(*queryset.values_list('id', flat=True))
         self.message_user(request, f'{updated} sellers have been deactivated.')
     deactivate_sellers.short_description = "Deactivate selected sellers"
 
@@ -85,6 +89,8 @@ class UserRatingAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'created_at']
     search_fields = ['from_user__username', 'to_user__username', 'review']
     ordering = ['-created_at']
+    list_select_related = ['from_user', 'to_user']
+    autocomplete_fields = ['from_user', 'to_user']
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -96,3 +102,14 @@ class UserRatingAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(SellerReputation)
+class SellerReputationAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'rating_count', 'rating_sum', 'conversations_received',
+        'conversations_responded', 'updated_at'
+    ]
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+    readonly_fields = [field.name for field in SellerReputation._meta.fields]
@@ -1,13 +1,21 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Count, Sum, Avg, Q
+from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.db.models import Count, Sum, Avg, Q, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from collections import defaultdict
 from datetime import timedelta
 from users.models import User
 from products.models import Product, Category
 from orders.models import Order, Dispute
 from chat.models import Notification
+from marketplace.throttling import throttle_stats
+
+# Most products one bulk verify or reject request may touch
+BULK_MODERATION_LIMIT = 500
 
 
 @api_view(['GET'])
@@ -93,7 +101,7 @@ def admin_stats(request):
     # Product statistics
     product_stats = {
         'products_pending_review': Product.objects.filter(is_active=False).count(),
-        'expired_listings': Product.objects.filter(expires_at__lt=now).count(),
+        'expired_listings': Product.objects.filter(status='expired').count(),
         'featured_products': Product.objects.filter(is_featured=True).count(),
     }
     
@@ -117,11 +125,13 @@ def admin_stats(request):
         for cat in top_categories
     ]
     
-    # Dispute statistics
+    # Dispute statistics (published by the refresh_dispute_queue command)
+    queue_stats = Dispute.cached_queue_stats()
     dispute_stats = {
-        'avg_resolution_time': 3,  # This would need actual calculation
-        'resolution_rate': 85,      # This would need actual calculation
+        'avg_resolution_time': queue_stats['avg_resolution_time'],
+        'resolution_rate': queue_stats['resolution_rate'],
         'satisfaction_rate': 92,    # This would need actual calculation
+        'sla_breached_disputes': queue_stats['sla_breached'],
     }
     
     return Response({
@@ -169,7 +179,7 @@ def admin_activities(request):
     # Open disputes
     open_disputes = Dispute.objects.select_related('order', 'complainant').filter(
         status='open'
-    )[:10]
+    ).order_by('-created_at')[:10]
     dispute_data = [
         {
             'id': dispute.id,
@@ -177,6 +187,8 @@ def admin_activities(request):
             'order_number': dispute.order.order_number,
             'complainant': dispute.complainant.username,
             'status': dispute.status,
+            'age_bucket': dispute.age_bucket,
+            'sla_breached': dispute.sla_breached,
             'created_at': dispute.created_at,
         }
         for dispute in open_disputes
@@ -225,15 +237,72 @@ def system_health(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def throttle_metrics(request):
+    """How many requests each throttle scope has rejected"""
+    return Response({'throttled': throttle_stats()})
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def pending_products(request):
-    """List all products pending admin verification"""
-    from products.models import Product
+    """
+    The moderation queue, paginated: products pending verification with
+    open reports first, then those of sellers with approved listings, then
+    oldest first. Each row has open_reports and trusted_seller.
+    """
+    from products.models import Product, ProductReport
     from products.serializers import ProductListSerializer
 
-    products = Product.objects.filter(is_verified=False, status='pending_verification').order_by('-created_at')
-    return Response(ProductListSerializer(products, many=True, context={'request': request}).data)
+    reports = (
+        ProductReport.objects.filter(product=OuterRef('pk'), status='pending')
+        .order_by().values('product').annotate(n=Count('id')).values('n')
+    )
+    approved = Product.objects.filter(seller=OuterRef('seller'), is_verified=True)
+    products = (
+        Product.objects.filter(is_verified=False, status='pending_verification')
+        .annotate(open_reports=Coalesce(Subquery(reports), 0), trusted_seller=Exists(approved))
+        .select_related('seller', 'category').prefetch_related('images')
+        .order_by(F('open_reports').desc(), F('trusted_seller').desc(), 'created_at', 'id')
+    )
+
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(products, request)
+    data = ProductListSerializer(page, many=True, context={'request': request}).data
+    for row, product in zip(data, page):
+        row['open_reports'] = product.open_reports
+        row['trusted_seller'] = product.trusted_seller
+    return paginator.get_paginated_response(data)
+
+
+def _notify_sellers(products, approved, reason=None):
+    """One verification notification per seller for the given (id, seller_id, title) rows"""
+    by_seller = defaultdict(list)
+    for product_id, seller_id, title in products:
+        by_seller[seller_id].append((product_id, title))
+
+    outcome = 'approved' if approved else 'rejected'
+    notifications = []
+    for seller_id, listings in by_seller.items():
+        if len(listings) == 1:
+            title = f'Your listing was {outcome}'
+            message = f'"{listings[0][1]}" was {outcome}'
+        else:
+            title = f'{len(listings)} of your listings were {outcome}'
+            message = ', '.join(f'"{name}"' for _, name in listings[:5]) + (' and others' if len(listings) > 5 else '')
+        if approved:
+            message += ' and is now visible to buyers.' if len(listings) == 1 else ' are now visible to buyers.'
+        else:
+            message += f'. Reason: {reason}'
+        notifications.append(Notification(
+            recipient_id=seller_id,
+            notification_type='verification',
+            title=title,
+            message=message,
+            related_product_id=listings[0][0] if len(listings) == 1 else None,
+        ))
+    Notification.objects.bulk_create(notifications)
 
 
 @api_view(['POST'])
@@ -247,6 +316,7 @@ def verify_product(request, product_id):
         return Response({'error': 'Product not found'}, status=404)
 
     product.verify_product(admin_user=request.user, notes=request.data.get('notes'))
+    _notify_sellers([(product.id, product.seller_id, product.title)], approved=True)
     return Response({'message': 'Product verified successfully'})
 
 
@@ -262,14 +332,59 @@ def reject_product(request, product_id):
 
     reason = request.data.get('reason', 'Rejected by admin')
     product.reject_product(admin_user=request.user, reason=reason)
+    _notify_sellers([(product.id, product.seller_id, product.title)], approved=False, reason=reason)
     return Response({'message': 'Product rejected successfully'})
 
+
+def _moderation_ids(request):
+    product_ids = request.data.get('product_ids')
+    if not isinstance(product_ids, list) or not product_ids:
+        return None, Response({'error': 'product_ids must be a non-empty list'}, status=400)
+    try:
+        product_ids = {int(product_id) for product_id in product_ids}
+    except (TypeError, ValueError):
+        return None, Response({'error': 'product_ids must be integers'}, status=400)
+    if len(product_ids) > BULK_MODERATION_LIMIT:
+        return None, Response({'error': f'At most {BULK_MODERATION_LIMIT} products per request'}, status=400)
+    return product_ids, None
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def bulk_verify_products(request):
+    """Verify many products in one transaction: {"product_ids": [...], "notes": "..."}"""
+    from products.models import Product
+    product_ids, error = _moderation_ids(request)
+    if error:
+        return error
+
+    with transaction.atomic():
+        verified = Product.verify_many(product_ids, request.user, notes=request.data.get('notes'))
+        _notify_sellers(verified, approved=True)
+    return Response({'verified': sorted(product_id for product_id, _, _ in verified)})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def bulk_reject_products(request):
+    """Reject many products in one transaction: {"product_ids": [...], "reason": "..."}"""
+    from products.models import Product
+    product_ids, error = _moderation_ids(request)
+    if error:
+        return error
+
+    reason = request.data.get('reason') or 'Rejected by admin'
+    with transaction.atomic():
+        rejected = Product.reject_many(product_ids, request.user, reason)
+        _notify_sellers(rejected, approved=False, reason=reason)
+    return Response({'rejected': sorted(product_id for product_id, _, _ in rejected)})
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def pending_reports(request):
     """List all product reports pending review"""
     from products.models import ProductReport
-    reports = ProductReport.objects.filter(status='pending').order_by('-created_at')
+    reports = ProductReport.objects.filter(status='pending').select_related('product', 'reporter').order_by('-created_at')
 
     data = []
     for r in reports:
@@ -285,6 +400,55 @@ def pending_reports(request):
     return Response(data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def reported_products(request):
+    """
+    Reported listings with open reports, one row per product with its
+    counts by type, most reported first; paginated, two queries per page
+    """
+    from products.models import ProductReportSummary
+    summaries = (
+        ProductReportSummary.objects.filter(open_count__gt=0)
+        .select_related('product__seller')
+        .order_by('-open_count', '-last_reported_at')
+    )
+
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(summaries, request)
+    return paginator.get_paginated_response([
+        {
+            'product_id': summary.product_id,
+            'product_title': summary.product.title,
+            'product_status': summary.product.status,
+            'seller': summary.product.seller.username,
+            'open_reports': summary.open_count,
+            'total_reports': summary.total_count,
+            'by_type': {report_type: count for report_type, count in summary.by_type.items() if count},
+            'last_reported_at': summary.last_reported_at,
+            'escalated_at': summary.escalated_at,
+            'hidden_at': summary.hidden_at,
+        }
+        for summary in page
+    ])
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def close_product_reports(request, product_id):
+    """Review, resolve or dismiss every open report of a product at once"""
+    from products.models import ProductReportSummary
+    statuses = {'review': 'reviewed', 'resolve': 'resolved', 'dismiss': 'dismissed'}
+    action = request.data.get('action')
+    if action not in statuses:
+        return Response({'error': 'Invalid action'}, status=400)
+
+    closed = ProductReportSummary.close_reports(
+        product_id, statuses[action], request.user, request.data.get('notes', '')
+    )
+    return Response({'message': f'{closed} reports {statuses[action]}', 'closed': closed})
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def update_report_status(request, report_id):
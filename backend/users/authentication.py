@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+# Fields kept in the cached principal: everything permission checks and the
+# profile serializers read. Other fields (password, documents, ...) stay
+# deferred and are only loaded if a view touches them.
+PRINCIPAL_FIELDS = {
+    'id', 'username', 'email', 'first_name', 'last_name', 'user_type',
+    'phone_number', 'address', 'city', 'country', 'postal_code',
+    'verification_status', 'account_approved', 'is_active', 'is_staff',
+    'is_superuser', 'is_active_seller', 'is_premium', 'profile_image',
+    'average_rating', 'total_ratings', 'created_at',
+}
+
+
+def principal_cache_key(user_id):
+    return f'users:principal:v1:{user_id}'
+
+
+def invalidate_principal(*user_ids):
+    """Drop cached principals so the next request reloads them from the database"""
+    cache.delete_many([principal_cache_key(user_id) for user_id in user_ids])
+
+
+def _principal_attnames(model):
+    # Model.from_db expects values in concrete field order
+    return [f.attname for f in model._meta.concrete_fields if f.attname in PRINCIPAL_FIELDS]
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from a cached principal
+    instead of fetching the user row on every request. User.save() drops the
+    cached entry, so changes to type, approval or verification apply on the
+    next request. With USER_PRINCIPAL_CACHE_TTL at 0 (no shared cache) it
+    loads the user like JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN or not settings.USER_PRINCIPAL_CACHE_TTL:
+            # Revocation needs the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        attnames = _principal_attnames(self.user_model)
+        key = principal_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = (
+                self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*attnames)
+                .first()
+            )
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, values, settings.USER_PRINCIPAL_CACHE_TTL)
+
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, attnames, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
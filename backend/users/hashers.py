@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher as BaseArgon2PasswordHasher
+
+
+class Argon2PasswordHasher(BaseArgon2PasswordHasher):
+    """
+    Argon2id with cost parameters taken from settings. Existing hashes made
+    with other parameters (or by PBKDF2) are upgraded on the user's next
+    successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
@@ -0,0 +1,157 @@
+import contextlib
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from marketplace import benchmark
+from marketplace.loadgen import LoadPlan, generate
+from users.models import User
+
+UNLIMITED = (10 ** 9, 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints in-process with the Django test client: p50/p95/p99 latency, "
+        "queries per request and throughput for listing, search, detail, favorites, offers, orders, "
+        "chat and dashboards. Seeds a dataset with the load generator on first run and reuses it after; "
+        "writes are rolled back and each run gets an empty cache of its own, so runs on the same data are "
+        "comparable. Results are saved as JSON and can be compared against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20_000, help="Dataset size when seeding.")
+        parser.add_argument("--products", type=int, default=20_000, help="Dataset size when seeding.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="bench", help="Username prefix of the benchmark dataset.")
+        parser.add_argument("--iterations", type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per endpoint first.")
+        parser.add_argument(
+            "--endpoint", action="append", choices=sorted(benchmark.SCENARIOS),
+            help="Only benchmark this endpoint (repeatable).",
+        )
+        parser.add_argument("--output", help="Where to write the JSON results.")
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.2, help="p95 growth that counts as a regression.")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            self.stdout.write(f"Reusing the {prefix}* dataset.")
+        else:
+            self.seed(options)
+
+        try:
+            actors = benchmark.Actors(prefix, options["seed"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        names = options["endpoint"] or list(benchmark.SCENARIOS)
+
+        def progress(name, result):
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{name:<18} p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms "
+                f"queries={result['queries']['mean']:.1f} {result['throughput_rps']:.0f} req/s errors={result['errors']}"
+            )
+
+        throttle_rates = {scope: {'burst': UNLIMITED, 'sustained': UNLIMITED} for scope in settings.API_THROTTLE_RATES}
+        # Writes are rolled back, so on_commit invalidations never run: cache fills go to a
+        # private cache that starts empty and is dropped with them, never the shared one
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-api'}}
+        # Views print debugging output; keep it out of the report
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['*'], DATABASE_REPLICAS=[], API_THROTTLE_RATES=throttle_rates,
+                               CACHES=caches), \
+                open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), transaction.atomic():
+            cache.clear()
+            try:
+                endpoints = benchmark.run(
+                    actors, names, options["iterations"], options["warmup"], options["seed"], progress,
+                )
+            finally:
+                transaction.set_rollback(True)
+                cache.clear()
+
+        commit = _git_commit()
+        started = datetime.now(dt_timezone.utc)
+        results = {
+            'meta': {
+                'commit': commit,
+                'timestamp': started.isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'seed': options["seed"],
+                'prefix': prefix,
+                'users': User.objects.filter(username__startswith=prefix).count(),
+                'products': len(actors.products),
+                'iterations': options["iterations"],
+                'warmup': options["warmup"],
+            },
+            'endpoints': endpoints,
+        }
+        output = options["output"] or f'benchmark-api-{commit}-{started:%Y%m%d%H%M%S}.json'
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if baseline is not None:
+            self.report_comparison(baseline, results, options["threshold"], options["fail_on_regression"])
+
+    def seed(self, options):
+        # Keep the load generator's proportions between users, listings and activity
+        users, products = options["users"], options["products"]
+        try:
+            plan = LoadPlan(
+                seed=options["seed"], users=users, products=products, favorites=3 * users,
+                offers=users, conversations=users, orders=users * 3 // 10, prefix=options["prefix"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"Seeding {users:,} users and {products:,} listings as {options['prefix']}*...")
+        start = time.perf_counter()
+        generate(plan)
+        self.stdout.write(f"Seeded in {time.perf_counter() - start:.1f}s.")
+
+    def report_comparison(self, baseline, results, threshold, fail):
+        meta = baseline.get('meta', {})
+        self.stdout.write(f"Compared with {meta.get('commit', '?')} ({meta.get('timestamp', '?')}):")
+        regressions = []
+        for name, field, before, after, regressed in benchmark.compare(baseline, results, threshold):
+            change = f"{(after - before) / before:+.0%}" if before else "n/a"
+            line = f"{name:<18} {field:<8} {before:>10} -> {after:<10} {change}"
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions and fail:
+            raise CommandError(f"Regressed: {', '.join(sorted(set(regressions)))}")
@@ -0,0 +1,91 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login cost. Without --url, times password verification for each configured hasher. "
+        "With --url, sends concurrent logins to a running server and reports latency, throughput and 429s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Hash verifications per hasher.")
+        parser.add_argument("--url", help="Login endpoint of a running server, e.g. http://localhost:8000/api/auth/login/")
+        parser.add_argument("--username", default="benchmark")
+        parser.add_argument("--password", default="benchmark-password")
+        parser.add_argument("--requests", type=int, default=200, help="Total login requests to send.")
+        parser.add_argument("--concurrency", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options["url"]:
+            self.benchmark_endpoint(options)
+        else:
+            self.benchmark_hashers(options["iterations"])
+
+    def benchmark_hashers(self, iterations):
+        self.stdout.write(f"Password verification cost ({iterations} iterations each):")
+        for path in settings.PASSWORD_HASHERS:
+            try:
+                hasher = import_string(path)()
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except (ValueError, ImportError) as exc:
+                self.stdout.write(f"  {path}: unavailable ({exc})")
+                continue
+
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                hasher.verify('benchmark-password', encoded)
+                timings.append(time.perf_counter() - start)
+
+            mean = statistics.mean(timings)
+            self.stdout.write(
+                f"  {hasher.algorithm:<16} {mean * 1000:8.2f} ms/verify  "
+                f"~{1 / mean:8.1f} logins/s per core"
+            )
+
+    def benchmark_endpoint(self, options):
+        body = json.dumps({'username': options["username"], 'password': options["password"]}).encode()
+
+        def login(_):
+            request = urllib.request.Request(
+                options["url"], data=body, headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    code = response.status
+            except urllib.error.HTTPError as exc:
+                code = exc.code
+            return code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(login, range(options["requests"])))
+        elapsed = time.perf_counter() - start
+
+        codes = {}
+        for code, _ in results:
+            codes[code] = codes.get(code, 0) + 1
+        latencies = [duration * 1000 for _, duration in results]
+
+        self.stdout.write(f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+        self.stdout.write(
+            f"latency ms: p50={_percentile(latencies, 50):.1f} "
+            f"p95={_percentile(latencies, 95):.1f} p99={_percentile(latencies, 99):.1f}"
+        )
+        self.stdout.write("status codes: " + ", ".join(f"{code}={count}" for code, count in sorted(codes.items())))
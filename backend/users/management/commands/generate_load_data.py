@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from marketplace.loadgen import PASSWORD, LoadPlan, generate
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic dataset for load testing: users, listings with images, favorites, "
+        "offers, conversations, orders and notifications, skewed like real traffic and deterministic "
+        "from --seed. Inserts with bulk_create, optionally from several processes (PostgreSQL only). "
+        "Run it on a scratch database; use create_sample_data for a small demo catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--seller-share", type=float, default=0.1, help="Share of users who sell.")
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument("--favorites", type=int, default=3_000_000)
+        parser.add_argument("--offers", type=int, default=1_000_000)
+        parser.add_argument("--conversations", type=int, default=1_000_000, help="Each gets 1-60 messages.")
+        parser.add_argument("--orders", type=int, default=300_000)
+        parser.add_argument("--days", type=int, default=90, help="How far back listings and activity go.")
+        parser.add_argument("--workers", type=int, default=1, help="Processes inserting in parallel.")
+        parser.add_argument("--prefix", default="load", help="Username prefix of the generated users.")
+        parser.add_argument("--similar", action="store_true", help="Also rebuild similar products (slow).")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users named {prefix}* already exist; use another --prefix or a fresh database.")
+        workers = options["workers"]
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("SQLite serializes writers; generating with one process."))
+            workers = 1
+
+        try:
+            plan = LoadPlan(
+                seed=options["seed"], users=options["users"], seller_share=options["seller_share"],
+                products=options["products"], favorites=options["favorites"], offers=options["offers"],
+                conversations=options["conversations"], orders=options["orders"], days=options["days"],
+                prefix=prefix,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        start = time.perf_counter()
+
+        def progress(phase, done, total):
+            if done == total or done % 50 == 0:
+                self.stdout.write(f"{phase}: {done}/{total} chunks ({time.perf_counter() - start:.0f}s)")
+
+        totals = generate(plan, workers=workers, similar=options["similar"], progress=progress)
+        for table, rows in totals.items():
+            self.stdout.write(f"{table:<14} {rows:>12,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated in {time.perf_counter() - start:.1f}s. Users log in as {prefix}<n> / {PASSWORD}."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh tokens that have expired anyway. Run periodically (e.g. daily from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="How many rows to delete per batch.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        purged = 0
+
+        while True:
+            expired = list(
+                RevokedToken.objects.filter(expires_at__lt=timezone.now())
+                .values_list('jti', flat=True)[:batch_size]
+            )
+            if not expired:
+                break
+            purged += RevokedToken.objects.filter(jti__in=expired).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired revoked tokens."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from chat.models import Conversation, Message
+from users.models import SellerReputation, User, UserRating
+from users.reputation import rebuild_reputations
+
+
+class Command(BaseCommand):
+    help = "Recompute every seller's reputation counters from ratings and conversations. Use to repair drift."
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_reputations(User, UserRating, SellerReputation, Conversation, Message)
+        # bulk_update skipped User.save(), so drop the cached cards it would have invalidated
+        User.invalidate_caches_for(*SellerReputation.objects.values_list('user_id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt reputation for {rebuilt} users."))
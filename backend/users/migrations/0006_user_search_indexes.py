@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:10
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+TRIGRAM_INDEXES = [
+    ('users_username_trgm_idx', 'username'),
+    ('users_first_name_trgm_idx', 'first_name'),
+    ('users_last_name_trgm_idx', 'last_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """pg_trgm GIN indexes serve User.search() prefix and substring matches on PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON users USING gin (lower({column}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_revoked_tokens'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='users_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at'], name='users_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', '-created_at'], name='users_type_created_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
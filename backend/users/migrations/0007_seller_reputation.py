@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerReputation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reputation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('decayed_sum', models.FloatField(default=0)),
+                ('decayed_weight', models.FloatField(default=0)),
+                ('decayed_at', models.DateTimeField(blank=True, null=True)),
+                ('conversations_received', models.PositiveIntegerField(default=0)),
+                ('conversations_responded', models.PositiveIntegerField(default=0)),
+                ('response_seconds_total', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'seller_reputations',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_seller_reputation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_type_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='users_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', '-created_at', '-id'], name='users_type_created_id_idx'),
+        ),
+    ]
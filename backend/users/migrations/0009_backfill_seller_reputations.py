@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from django.db import migrations
+
+
+def backfill_reputations(apps, schema_editor):
+    from users.reputation import rebuild_reputations
+    rebuild_reputations(
+        apps.get_model('users', 'User'),
+        apps.get_model('users', 'UserRating'),
+        apps.get_model('users', 'SellerReputation'),
+        apps.get_model('chat', 'Conversation'),
+        apps.get_model('chat', 'Message'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_created_id_indexes'),
+        ('chat', '0004_conversation_seller_responded_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_reputations, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -72,10 +76,49 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            models.Index(Lower('email'), name='users_email_lower_idx'),
+            # id breaks created_at ties for the admin list's cursor pagination
+            models.Index(fields=['-created_at', '-id'], name='users_created_id_idx'),
+            models.Index(fields=['user_type', '-created_at', '-id'], name='users_type_created_id_idx'),
+        ]
+    
+    # Username/name columns matched by search(); on PostgreSQL migration 0006
+    # adds lowercase trigram indexes on them
+    SEARCH_FIELDS = ('username', 'first_name', 'last_name')
     
     def __str__(self):
         return f"{self.username} ({self.get_user_type_display()})"
     
+    @classmethod
+    def search(cls, query, queryset=None):
+        """
+        Look users up by exact email (queries containing '@'), otherwise by
+        username/name prefix, or substring from three characters on. Results
+        carry a `search_rank` alias (0 for prefix matches) to order by.
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        query = query.strip().lower()
+        if not query:
+            return queryset.alias(search_rank=Value(0))
+        
+        if '@' in query:
+            return queryset.alias(email_lower=Lower('email'), search_rank=Value(0)).filter(email_lower=query)
+        
+        queryset = queryset.alias(**{f'{field}_lower': Lower(field) for field in cls.SEARCH_FIELDS})
+        prefix = Q()
+        substring = Q()
+        for field in cls.SEARCH_FIELDS:
+            prefix |= Q(**{f'{field}_lower__startswith': query})
+            substring |= Q(**{f'{field}_lower__contains': query})
+        
+        if len(query) < 3:
+            # Too short for trigrams to narrow anything down
+            return queryset.filter(prefix).alias(search_rank=Value(0))
+        return queryset.filter(substring).alias(
+            search_rank=Case(When(prefix, then=Value(0)), default=Value(1), output_field=IntegerField())
+        )
+    
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.username
     
@@ -107,6 +150,14 @@ class User(AbstractUser):
         return self.user_type in ['seller', 'both']
     
     def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Cached principals (users.authentication) defer most columns, and a
+            # plain save() of a deferred instance writes only the loaded ones,
+            # skipping updated_at. Load the rest so the whole row is saved.
+            deferred = self.get_deferred_fields()
+            if deferred:
+                self.refresh_from_db(fields=deferred)
+        
         # Set verification status based on user type
         if self.user_type == 'buyer':
             self.verification_status = 'not_required'
@@ -121,18 +172,34 @@ class User(AbstractUser):
             self.is_superuser = True
         
         super().save(*args, **kwargs)
+        self.invalidate_caches()
     
-    def update_average_rating(self):
-        """Update average rating based on all received ratings"""
-        from django.db.models import Avg
-        ratings = self.ratings_received.all()
-        if ratings.exists():
-            avg_rating = ratings.aggregate(Avg('rating'))['rating__avg']
-            self.average_rating = round(avg_rating, 1) if avg_rating else 0
-            self.total_ratings = ratings.count()
-        else:
-            self.average_rating = 0
-            self.total_ratings = 0
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        User.invalidate_caches_for(user_id)
+        return result
+    
+    def invalidate_caches(self):
+        """Drop the cached auth principal and public profile once the current transaction commits"""
+        User.invalidate_caches_for(self.pk)
+    
+    @staticmethod
+    def invalidate_caches_for(*user_ids):
+        from .authentication import invalidate_principal
+        from .serializers import invalidate_public_profiles
+        
+        def invalidate():
+            invalidate_principal(*user_ids)
+            invalidate_public_profiles(*user_ids)
+        transaction.on_commit(invalidate)
+    
+    def update_average_rating(self, reputation=None):
+        """Copy average rating and count from the user's reputation counters"""
+        if reputation is None:
+            reputation = SellerReputation.objects.filter(user=self).first() or SellerReputation(user=self)
+        self.average_rating = round(reputation.average, 1)
+        self.total_ratings = reputation.rating_count
         self.save(update_fields=['average_rating', 'total_ratings'])
 
 
@@ -168,17 +235,155 @@ class UserRating(models.Model):
     
     def save(self, *args, **kwargs):
         is_new = self.pk is None
-        super().save(*args, **kwargs)
+        previous = None
+        if not is_new:
+            previous = UserRating.objects.filter(pk=self.pk).values_list('rating', 'created_at').first()
         
-        if is_new:
-            # Update the recipient's average rating
-            self.to_user.update_average_rating()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                SellerReputation.record_rating(self.to_user, self.rating, self.created_at)
+            elif previous and previous[0] != self.rating:
+                SellerReputation.record_rating(self.to_user, previous[0], previous[1], removed=True)
+                SellerReputation.record_rating(self.to_user, self.rating, previous[1])
     
     def delete(self, *args, **kwargs):
         to_user = self.to_user
-        super().delete(*args, **kwargs)
-        # Update the recipient's average rating after deletion
-        to_user.update_average_rating()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            SellerReputation.record_rating(to_user, self.rating, self.created_at, removed=True)
+        return result
+
+
+class SellerReputation(models.Model):
+    """
+    Running reputation counters for a user, updated in O(1) per rating or
+    conversation event instead of re-aggregating their history: a star
+    histogram, a recency-decayed rating and how often they answer buyers.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reputation'
+    )
+    
+    # Star histogram
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    
+    # Exponentially decayed sums as of decayed_at; their ratio is the recent average
+    decayed_sum = models.FloatField(default=0)
+    decayed_weight = models.FloatField(default=0)
+    decayed_at = models.DateTimeField(null=True, blank=True)
+    
+    # Buyer conversations received as seller, and how many got a reply
+    conversations_received = models.PositiveIntegerField(default=0)
+    conversations_responded = models.PositiveIntegerField(default=0)
+    response_seconds_total = models.PositiveBigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'seller_reputations'
+    
+    def __str__(self):
+        return f"Reputation of user {self.user_id}: {self.average:.2f} ({self.rating_count})"
+    
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+    
+    @property
+    def average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+    
+    @property
+    def weighted_score(self):
+        """Bayesian average: few ratings are pulled towards the prior"""
+        prior_weight = settings.REPUTATION_PRIOR_WEIGHT
+        return (
+            (settings.REPUTATION_PRIOR_MEAN * prior_weight + self.rating_sum)
+            / (prior_weight + self.rating_count)
+        )
+    
+    @property
+    def recent_score(self):
+        """Average with each rating weighted by 0.5 ** (age / half-life)"""
+        return self.decayed_sum / self.decayed_weight if self.decayed_weight > 1e-9 else 0
+    
+    @property
+    def response_rate(self):
+        if not self.conversations_received:
+            return None
+        return self.conversations_responded / self.conversations_received
+    
+    @property
+    def average_response_seconds(self):
+        if not self.conversations_responded:
+            return None
+        return self.response_seconds_total // self.conversations_responded
+    
+    @staticmethod
+    def _decay(age):
+        half_life = settings.REPUTATION_HALF_LIFE_DAYS * 24 * 60 * 60
+        return 0.5 ** (max(age.total_seconds(), 0) / half_life)
+    
+    @classmethod
+    def record_rating(cls, user, rating, rated_at, removed=False):
+        """Add (or with removed=True, take back) one rating and sync the user's average"""
+        now = timezone.now()
+        reputation, _ = cls.objects.select_for_update().get_or_create(user=user)
+        sign = -1 if removed else 1
+        
+        star_field = f'stars_{rating}'
+        setattr(reputation, star_field, max(getattr(reputation, star_field) + sign, 0))
+        reputation.rating_count = max(reputation.rating_count + sign, 0)
+        reputation.rating_sum = max(reputation.rating_sum + sign * rating, 0)
+        
+        # Bring the decayed sums forward to now, then add or remove this rating's share
+        if reputation.decayed_at is not None:
+            factor = cls._decay(now - reputation.decayed_at)
+            reputation.decayed_sum *= factor
+            reputation.decayed_weight *= factor
+        weight = cls._decay(now - rated_at) if rated_at else 1
+        reputation.decayed_sum = max(reputation.decayed_sum + sign * weight * rating, 0)
+        reputation.decayed_weight = max(reputation.decayed_weight + sign * weight, 0)
+        reputation.decayed_at = now
+        reputation.save()
+        
+        user.update_average_rating(reputation)
+        return reputation
+    
+    @classmethod
+    def record_conversation(cls, seller_id):
+        cls.objects.get_or_create(user_id=seller_id)
+        cls.objects.filter(user_id=seller_id).update(conversations_received=F('conversations_received') + 1)
+    
+    @classmethod
+    def record_response(cls, seller_id, response_seconds):
+        cls.objects.get_or_create(user_id=seller_id)
+        cls.objects.filter(user_id=seller_id).update(
+            conversations_responded=F('conversations_responded') + 1,
+            response_seconds_total=F('response_seconds_total') + max(int(response_seconds), 0),
+        )
+    
+    @classmethod
+    def for_users(cls, user_ids):
+        """
+        Reputations for a page of users in one query, keyed by user id.
+        Users without any events get an empty, unsaved reputation.
+        """
+        user_ids = set(user_ids)
+        reputations = {reputation.user_id: reputation for reputation in cls.objects.filter(user_id__in=user_ids)}
+        for user_id in user_ids - reputations.keys():
+            reputations[user_id] = cls(user_id=user_id)
+        return reputations
 
 
 class VerificationRequest(models.Model):
@@ -229,3 +434,19 @@ class VerificationRequest(models.Model):
     
     def __str__(self):
         return f"Verification request for {self.user.username} - {self.status}"
+
+
+class RevokedToken(models.Model):
+    """
+    Refresh token JTIs that may no longer be used. Rows are kept only until
+    the token would have expired anyway; purge_revoked_tokens removes the rest.
+    """
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'revoked_tokens'
+    
+    def __str__(self):
+        return f"Revoked token {self.jti} (expires {self.expires_at})"
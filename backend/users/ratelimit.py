@@ -0,0 +1,46 @@
+"""
+Brute-force protection for login endpoints, built on the same cache-backed
+sliding windows as API throttling. Requests are rejected before the
+password is hashed, which is what keeps a credential-stuffing burst from
+eating worker CPU.
+"""
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from marketplace.throttling import SlidingWindowLimiter
+
+
+def _limiter(scope):
+    limit, window = settings.LOGIN_RATE_LIMITS[scope]
+    return SlidingWindowLimiter(f'login-{scope}', limit, window)
+
+
+def client_ident(request):
+    # Same client address DRF throttles use, honouring NUM_PROXIES
+    return BaseThrottle().get_ident(request)
+
+
+def check_login_allowed(request, username):
+    """
+    Raise Throttled (429 with Retry-After) if this client or account is over
+    its login budget; otherwise count the attempt against the client.
+    """
+    ip = client_ident(request)
+    username = (username or '').lower()
+    by_ip, by_username = _limiter('ip'), _limiter('username')
+
+    wait = max(by_ip.wait(ip), by_username.wait(username) if username else 0)
+    if wait:
+        raise Throttled(wait=wait, detail='Too many login attempts. Please try again later.')
+    by_ip.hit(ip)
+
+
+def login_failed(username):
+    if username:
+        _limiter('username').hit(username.lower())
+
+
+def login_succeeded(username):
+    if username:
+        _limiter('username').reset(username.lower())
@@ -0,0 +1,85 @@
+"""
+Full recomputation of seller reputation counters from ratings and
+conversations. Normal traffic updates the counters incrementally (see
+SellerReputation); this is for the initial backfill and for repairing drift.
+Model classes are passed in so migrations can run it on historical models.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def rebuild_reputations(User, UserRating, SellerReputation, Conversation, Message, now=None):
+    now = now or timezone.now()
+    half_life = settings.REPUTATION_HALF_LIFE_DAYS * 24 * 60 * 60
+    fields = defaultdict(lambda: {
+        'stars_1': 0, 'stars_2': 0, 'stars_3': 0, 'stars_4': 0, 'stars_5': 0,
+        'rating_count': 0, 'rating_sum': 0, 'decayed_sum': 0.0, 'decayed_weight': 0.0,
+        'conversations_received': 0, 'conversations_responded': 0, 'response_seconds_total': 0,
+    })
+
+    # Everyone who has counters now starts from zero, so users whose ratings were
+    # all deleted are reset rather than left with their old numbers
+    for user_id in SellerReputation.objects.values_list('user_id', flat=True).iterator(chunk_size=BATCH_SIZE):
+        fields[user_id]
+    rated = User.objects.filter(Q(total_ratings__gt=0) | ~Q(average_rating=0)).values_list('pk', flat=True)
+    for user_id in rated.iterator(chunk_size=BATCH_SIZE):
+        fields[user_id]
+
+    ratings = UserRating.objects.values_list('to_user_id', 'rating', 'created_at')
+    for user_id, rating, created_at in ratings.iterator(chunk_size=BATCH_SIZE):
+        counters = fields[user_id]
+        weight = 0.5 ** (max((now - created_at).total_seconds(), 0) / half_life)
+        counters[f'stars_{rating}'] += 1
+        counters['rating_count'] += 1
+        counters['rating_sum'] += rating
+        counters['decayed_sum'] += weight * rating
+        counters['decayed_weight'] += weight
+
+    # Stamp each conversation with the seller's first reply
+    first_replies = (
+        Message.objects.filter(sender_id=F('conversation__seller_id'))
+        .values('conversation_id')
+        .annotate(first=Min('created_at'))
+        .values_list('conversation_id', 'first')
+    )
+    pending = []
+    for conversation_id, first in first_replies.iterator(chunk_size=BATCH_SIZE):
+        pending.append(Conversation(pk=conversation_id, seller_responded_at=first))
+        if len(pending) >= BATCH_SIZE:
+            Conversation.objects.bulk_update(pending, ['seller_responded_at'])
+            pending = []
+    if pending:
+        Conversation.objects.bulk_update(pending, ['seller_responded_at'])
+
+    conversations = Conversation.objects.values_list('seller_id', 'created_at', 'seller_responded_at')
+    for seller_id, created_at, responded_at in conversations.iterator(chunk_size=BATCH_SIZE):
+        counters = fields[seller_id]
+        counters['conversations_received'] += 1
+        if responded_at is not None:
+            counters['conversations_responded'] += 1
+            counters['response_seconds_total'] += max(int((responded_at - created_at).total_seconds()), 0)
+
+    reputations = [
+        SellerReputation(user_id=user_id, decayed_at=now, **counters)
+        for user_id, counters in fields.items()
+    ]
+    users = [
+        User(
+            pk=user_id,
+            average_rating=round(counters['rating_sum'] / counters['rating_count'], 1) if counters['rating_count'] else 0,
+            total_ratings=counters['rating_count'],
+        )
+        for user_id, counters in fields.items()
+    ]
+    # Readers see the old counters until the new ones are complete
+    with transaction.atomic():
+        SellerReputation.objects.all().delete()
+        SellerReputation.objects.bulk_create(reputations, batch_size=BATCH_SIZE)
+        User.objects.bulk_update(users, ['average_rating', 'total_ratings'], batch_size=BATCH_SIZE)
+    return len(reputations)
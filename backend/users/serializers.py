@@ -1,8 +1,20 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.core.cache import cache
 from django.utils import timezone
-from .models import User, UserRating, VerificationRequest
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+    TokenVerifySerializer as BaseTokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .models import SellerReputation, User, UserRating, VerificationRequest
+from .ratelimit import check_login_allowed, login_failed, login_succeeded
+from .tokens import RevocableRefreshToken, is_revoked
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -97,9 +109,14 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            request = self.context.get('request')
+            if request is not None:
+                check_login_allowed(request, username)
+            user = authenticate(request, username=username, password=password)
             if not user:
+                login_failed(username)
                 raise serializers.ValidationError('Invalid credentials')
+            login_succeeded(username)
             if not user.is_active:
                 raise serializers.ValidationError('User account is disabled')
             
@@ -157,12 +174,93 @@ class UserProfileSerializer(serializers.ModelSerializer):
     
     def get_needs_verification(self, obj):
         return obj.needs_verification()
+
+
+def public_profile_cache_key(user_id):
+    return f'users:public:v1:{user_id}'
+
+
+def invalidate_public_profiles(*user_ids):
+    cache.delete_many([public_profile_cache_key(user_id) for user_id in user_ids])
+
+
+class PublicUserSerializer(serializers.ModelSerializer):
+    """What other users may see about an account: no contact details or permissions"""
+    full_name = serializers.SerializerMethodField()
+    is_verified_seller = serializers.SerializerMethodField()
+    profile_image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'full_name', 'user_type',
+            'city', 'country', 'profile_image', 'average_rating', 'total_ratings',
+            'verification_status', 'account_approved', 'is_verified_seller',
+            'is_premium', 'created_at'
+        ]
     
     def get_full_name(self, obj):
         return obj.get_full_name()
     
     def get_is_verified_seller(self, obj):
         return obj.is_verified_seller()
+    
+    def get_profile_image(self, obj):
+        # Stored URL, not request-absolute, so the cached card is the same for every request
+        return obj.profile_image.url if obj.profile_image else None
+
+
+def public_profile(user_id, request=None):
+    """
+    Cached PublicUserSerializer rendering of a user, or None if there is no
+    such user. With a request, a relative profile image URL is made absolute.
+    """
+    key = public_profile_cache_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        data = dict(PublicUserSerializer(user).data)
+        cache.set(key, data, settings.PUBLIC_PROFILE_CACHE_TTL)
+    
+    image = data['profile_image']
+    if request is not None and image and image.startswith('/'):
+        data = {**data, 'profile_image': request.build_absolute_uri(image)}
+    return data
+
+
+class PublicProfileField(serializers.Field):
+    """
+    Embedded public profile read from cache by id, so the related user row
+    is not loaded. Point `source` at the foreign key column, e.g.
+    `seller = PublicProfileField(source='seller_id')`.
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, user_id):
+        return public_profile(user_id, self.context.get('request'))
+
+
+class SellerReputationSerializer(serializers.ModelSerializer):
+    """Rating histogram, scores and responsiveness of a user"""
+    histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    average = serializers.FloatField(read_only=True)
+    weighted_score = serializers.FloatField(read_only=True)
+    recent_score = serializers.FloatField(read_only=True)
+    response_rate = serializers.FloatField(read_only=True)
+    average_response_seconds = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = SellerReputation
+        fields = [
+            'user', 'histogram', 'rating_count', 'average', 'weighted_score',
+            'recent_score', 'conversations_received', 'response_rate',
+            'average_response_seconds', 'updated_at'
+        ]
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -337,4 +435,37 @@ class ChangePasswordSerializer(serializers.Serializer):
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
         user.save()
-        return user 
\ No newline at end of file
+        return user 
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Obtain a token pair, subject to the same login rate limits as /login/"""
+    token_class = RevocableRefreshToken
+    
+    def validate(self, attrs):
+        username = attrs.get(self.username_field)
+        request = self.context.get('request')
+        if request is not None:
+            check_login_allowed(request, username)
+        try:
+            data = super().validate(attrs)
+        except AuthenticationFailed:
+            login_failed(username)
+            raise
+        login_succeeded(username)
+        return data
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Rotate refresh tokens, revoking the one presented"""
+    token_class = RevocableRefreshToken
+
+
+class TokenVerifySerializer(BaseTokenVerifySerializer):
+    """Verify a token and reject it if it has been revoked"""
+    
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and is_revoked(jti):
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
@@ -1,3 +1,401 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Conversation, Message, Notification
+from marketplace.factories import PASSWORD, CacheClearingTestCase, make_admin, make_order, make_product, make_user
+from products.models import Product, SavedSearch, SearchTerm, VerifiedProductQueue
+from .authentication import principal_cache_key
+from .models import RevokedToken, SellerReputation, User, UserRating
+from .serializers import public_profile, public_profile_cache_key
+from .tokens import RevocableRefreshToken, revoked_cache_key
+
+
+@override_settings(USER_PRINCIPAL_CACHE_TTL=300)
+class CachedPrincipalTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('anna', first_name='Anna')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def profile(self):
+        response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_principal_is_cached_between_requests(self):
+        self.profile()
+        self.assertIsNotNone(cache.get(principal_cache_key(self.user.id)))
+        # The user row is not read again
+        with self.assertNumQueries(0):
+            self.profile()
+
+    def test_profile_update_saves_the_whole_row_and_invalidates_the_principal(self):
+        self.profile()
+        before = User.objects.get(pk=self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('user-profile'), {'first_name': 'Annette'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        after = User.objects.get(pk=self.user.pk)
+        self.assertEqual(after.first_name, 'Annette')
+        self.assertGreater(after.updated_at, before.updated_at)
+        self.assertIsNone(cache.get(principal_cache_key(self.user.id)))
+        self.assertEqual(self.profile()['first_name'], 'Annette')
+
+    def test_deactivated_user_is_rejected_on_next_request(self):
+        self.profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+    @override_settings(USER_PRINCIPAL_CACHE_TTL=0)
+    def test_without_a_shared_cache_every_request_reads_the_user(self):
+        self.profile()
+        self.assertIsNone(cache.get(principal_cache_key(self.user.id)))
+        # Another worker deactivated the user; no invalidation reaches this one
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+
+class PublicProfileTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller', phone_number='+100200300', first_name='Sam')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('buyer'))
+
+    def test_card_is_cached_and_omits_contact_details(self):
+        card = public_profile(self.seller.id)
+        self.assertEqual(card['username'], 'seller')
+        self.assertFalse({'email', 'phone_number', 'is_staff'} & card.keys())
+        self.assertEqual(cache.get(public_profile_cache_key(self.seller.id)), card)
+        with self.assertNumQueries(0):
+            public_profile(self.seller.id)
+
+    def test_missing_user_is_not_found(self):
+        self.assertIsNone(public_profile(10 ** 6))
+        self.assertEqual(self.client.get(reverse('user-detail', args=[10 ** 6])).status_code, 404)
+
+    def test_saving_the_user_invalidates_the_card(self):
+        public_profile(self.seller.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.first_name = 'Samira'
+            self.seller.save()
+        self.assertIsNone(cache.get(public_profile_cache_key(self.seller.id)))
+        response = self.client.get(reverse('user-detail', args=[self.seller.id]))
+        self.assertEqual(response.data['first_name'], 'Samira')
+
+    def test_product_listing_embeds_the_cached_card(self):
+        product = make_product(self.seller)
+        public_profile(self.seller.id)
+        response = self.client.get(reverse('product-detail', args=[product.id]))
+        self.assertEqual(response.data['seller']['username'], 'seller')
+        self.assertNotIn('phone_number', response.data['seller'])
+
+
+class SellerReputationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller', user_type='seller')
+        self.buyers = [make_user(f'buyer{index}') for index in range(2)]
+        self.product = make_product(self.seller)
+        self.order = make_order(self.buyers[0], self.product)
+
+    def rate(self, buyer, rating):
+        return UserRating.objects.create(from_user=buyer, to_user=self.seller, order=self.order, rating=rating)
+
+    def reputation(self):
+        return SellerReputation.objects.get(user=self.seller)
+
+    def test_ratings_update_counters_incrementally(self):
+        self.rate(self.buyers[0], 5)
+        rating = self.rate(self.buyers[1], 2)
+        rating.rating = 4
+        rating.save()
+
+        reputation = self.reputation()
+        self.assertEqual(reputation.histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+        self.assertEqual(reputation.average, 4.5)
+        self.seller.refresh_from_db()
+        self.assertEqual((self.seller.average_rating, self.seller.total_ratings), (4.5, 2))
+
+        rating.delete()
+        self.assertEqual(self.reputation().histogram[4], 0)
+
+    def test_conversations_count_towards_response_rate(self):
+        answered = Conversation.objects.create(product=self.product, buyer=self.buyers[0], seller=self.seller)
+        Message.objects.create(conversation=answered, sender=self.buyers[0], content='Still available?')
+        Message.objects.create(conversation=answered, sender=self.seller, content='Yes')
+        Message.objects.create(conversation=answered, sender=self.seller, content='Come by today')
+        Conversation.objects.create(product=self.product, buyer=self.buyers[1], seller=self.seller)
+
+        self.assertEqual(self.reputation().response_rate, 0.5)
+        response = APIClient().get(reverse('user-reputation', args=[self.seller.id]))
+        self.assertEqual(response.data['response_rate'], 0.5)
+
+    def test_rebuild_repairs_drift(self):
+        self.rate(self.buyers[0], 5)
+        self.rate(self.buyers[1], 3)
+        SellerReputation.objects.filter(user=self.seller).update(stars_5=7, rating_count=9, rating_sum=40)
+
+        call_command('rebuild_reputation', stdout=StringIO())
+
+        reputation = self.reputation()
+        self.assertEqual((reputation.stars_5, reputation.rating_count, reputation.rating_sum), (1, 2, 8))
+        self.assertAlmostEqual(reputation.recent_score, 4, places=3)
+
+    def test_rebuild_resets_sellers_whose_ratings_were_all_deleted(self):
+        self.rate(self.buyers[0], 5)
+        # Deleted without the model hooks, e.g. in bulk
+        UserRating.objects.all().delete()
+
+        call_command('rebuild_reputation', stdout=StringIO())
+
+        reputation = self.reputation()
+        self.assertEqual((reputation.rating_count, reputation.histogram[5]), (0, 0))
+        self.seller.refresh_from_db()
+        self.assertEqual((self.seller.average_rating, self.seller.total_ratings), (0, 0))
+
+    def test_failed_rebuild_keeps_the_previous_counters(self):
+        self.rate(self.buyers[0], 5)
+        SellerReputation.objects.filter(user=self.seller).update(rating_count=9)
+        with mock.patch.object(User.objects, 'bulk_update', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            call_command('rebuild_reputation', stdout=StringIO())
+        self.assertEqual(self.reputation().rating_count, 9)
+
+
+class RefreshRevocationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('anna')
+        self.refresh = RevocableRefreshToken.for_user(self.user)
+        self.client = APIClient()
+
+    def rotate(self, refresh):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+
+    def test_rotation_revokes_the_presented_token(self):
+        response = self.rotate(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(RevokedToken.objects.filter(jti=self.refresh['jti']).exists())
+
+        self.assertEqual(self.rotate(self.refresh).status_code, 401)
+        self.assertEqual(self.rotate(response.data['refresh']).status_code, 200)
+
+    def test_revoked_token_is_rejected_on_a_cold_cache(self):
+        self.rotate(self.refresh)
+        cache.clear()
+        self.assertEqual(self.rotate(self.refresh).status_code, 401)
+        # The database hit is cached for the token's remaining lifetime
+        self.assertTrue(cache.get(revoked_cache_key(self.refresh['jti'])))
+
+    def test_logout_revokes_and_is_idempotent(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('user-logout'), {'refresh_token': str(self.refresh)}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        self.assertEqual(self.rotate(self.refresh).status_code, 401)
+        response = self.client.post(reverse('token_verify'), {'token': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_purge_drops_only_expired_rows(self):
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        call_command('purge_revoked_tokens', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+@override_settings(LOGIN_RATE_LIMITS={'ip': (8, 60), 'username': (3, 300)})
+class LoginRateLimitTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('anna')
+        self.client = APIClient()
+
+    def login(self, username='anna', password=PASSWORD, **extra):
+        return self.client.post(
+            reverse('user-login'), {'username': username, 'password': password}, format='json', **extra
+        )
+
+    def test_account_locks_after_failed_attempts(self):
+        for _ in range(3):
+            self.assertEqual(self.login(password='wrong').status_code, 400)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Usernames are matched case-insensitively
+        self.assertEqual(self.login('ANNA').status_code, 429)
+        # The lock is per account, not per client
+        make_user('ben')
+        self.assertEqual(self.login('ben').status_code, 200)
+
+    def test_successful_login_clears_failures(self):
+        for _ in range(2):
+            self.login(password='wrong')
+        self.assertEqual(self.login().status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_client_address_budget_counts_every_attempt(self):
+        for _ in range(8):
+            self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    def test_token_endpoint_shares_the_budget(self):
+        for _ in range(3):
+            self.login(password='wrong')
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'anna', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+
+class PasswordHasherTests(CacheClearingTestCase):
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher'])
+    def make_legacy_user(self):
+        return make_user('legacy')
+
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=8192)
+    def test_hashes_use_configured_argon2_costs(self):
+        user = make_user('anna')
+        self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=8192,t=1,p=1$'))
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        user = self.make_legacy_user()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        response = APIClient().post(reverse('user-login'), {'username': 'legacy', 'password': PASSWORD}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+
+
+class AdminUserListTests(CacheClearingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_admin()
+        for index in range(7):
+            make_user(f'user{index}', first_name='Maria' if index % 2 else 'Jonas')
+        # Every row shares one timestamp, the worst case for keyset pagination
+        User.objects.update(created_at=timezone.now())
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def list_all(self, **params):
+        usernames, url = [], reverse('admin-users-list')
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            usernames += [user['username'] for user in response.data['results']]
+            url, params = response.data['next'], {}
+        return usernames
+
+    @mock.patch('users.views.AdminUserPagination.page_size', 3)
+    def test_pages_cover_tied_timestamps_exactly_once(self):
+        # Newest id first among equal timestamps, each user once
+        self.assertEqual(self.list_all(), [f'user{index}' for index in reversed(range(7))])
+
+    def test_search_matches_prefixes_and_exact_email(self):
+        self.assertEqual(sorted(self.list_all(q='mar')), ['user1', 'user3', 'user5'])
+        self.assertEqual(self.list_all(q='USER4@example.com'), ['user4'])
+        self.assertEqual(self.list_all(q='zz'), [])
+
+
+class BulkModerationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sellers = [make_user(f'seller{index}', user_type='seller') for index in range(2)]
+        self.pending = [
+            make_product(self.sellers[index % 2], title=f'Phone {index}', is_verified=False, status='pending_verification')
+            for index in range(3)
+        ]
+        self.live = make_product(self.sellers[0], title='Live phone')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('moderator', is_staff=True))
+
+    def moderate(self, action, product_ids, **data):
+        return self.client.post(f'/api/users/admin/products/bulk-{action}/', {'product_ids': product_ids, **data}, format='json')
+
+    def test_bulk_verify_notifies_each_seller_once_and_queues_the_rest(self):
+        SavedSearch.objects.create(user=make_user('buyer'), query='phone')
+        ids = [product.id for product in self.pending]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.moderate('verify', ids + [self.live.id])
+
+        self.assertEqual(response.data['verified'], ids)
+        self.assertEqual(Product.objects.filter(pk__in=ids, status='active', is_verified=True).count(), 3)
+        self.assertEqual(Notification.objects.filter(notification_type='verification').count(), 2)
+        self.assertTrue(SearchTerm.objects.filter(term='phone 0').exists())
+        # Similar products and saved-search alerts are left to process_verified_products
+        self.assertEqual(set(VerifiedProductQueue.objects.values_list('product_id', flat=True)), set(ids))
+        self.assertFalse(Notification.objects.filter(notification_type='saved_search').exists())
+
+        call_command('process_verified_products', stdout=StringIO())
+
+        self.assertFalse(VerifiedProductQueue.objects.exists())
+        self.assertEqual(Notification.objects.filter(notification_type='saved_search').count(), 3)
+
+    def test_bulk_reject_leaves_live_listings_alone(self):
+        response = self.moderate('reject', [self.pending[0].id, self.live.id], reason='Blurry photos')
+
+        self.assertEqual(response.data['rejected'], [self.pending[0].id])
+        self.pending[0].refresh_from_db()
+        self.assertEqual((self.pending[0].status, self.pending[0].rejection_reason), ('inactive', 'Blurry photos'))
+        self.live.refresh_from_db()
+        self.assertEqual((self.live.status, self.live.is_verified), ('active', True))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.moderate('verify', []).status_code, 400)
+        self.assertEqual(self.moderate('verify', ['x']).status_code, 400)
+        with mock.patch('users.admin_views.BULK_MODERATION_LIMIT', 2):
+            self.assertEqual(self.moderate('reject', [product.id for product in self.pending]).status_code, 400)
+        self.client.force_authenticate(self.sellers[0])
+        self.assertEqual(self.moderate('verify', [self.pending[0].id]).status_code, 403)
+
+
+class BenchmarkApiTests(CacheClearingTestCase):
+    def test_runs_use_a_private_empty_cache(self):
+        make_user('bench0')
+        cache.set('shared', 'kept')
+        seen = []
+
+        def run(*args):
+            seen.append(cache.get('shared'))
+            cache.set('filled', 'stale')
+            return {}
+
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        self.addCleanup(os.remove, output)
+        with mock.patch('marketplace.benchmark.Actors'), mock.patch('marketplace.benchmark.run', side_effect=run):
+            for _ in range(2):
+                call_command('benchmark_api', output=output, stdout=StringIO())
+
+        # Each run starts empty, fills from the last one are gone, and the shared cache is untouched
+        self.assertEqual(seen, [None, None])
+        self.assertEqual((cache.get('shared'), cache.get('filled')), ('kept', None))
@@ -0,0 +1,68 @@
+"""
+Refresh token revocation by JTI. Revoking stores a compact (jti, expires_at)
+row plus a cache entry that lives exactly as long as the token would, so the
+check on refresh is a cache hit or a primary-key lookup. Rows are dropped by
+`purge_revoked_tokens` once the token has expired anyway.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+def revoked_cache_key(jti):
+    return f'users:revoked:{jti}'
+
+
+def _cache_revoked(jti, expires_at):
+    remaining = int((expires_at - timezone.now()).total_seconds())
+    if remaining > 0:
+        cache.set(revoked_cache_key(jti), True, remaining)
+
+
+def is_revoked(jti):
+    if cache.get(revoked_cache_key(jti)):
+        return True
+
+    from .models import RevokedToken
+    expires_at = RevokedToken.objects.filter(jti=jti).values_list('expires_at', flat=True).first()
+    if expires_at is None:
+        return False
+    _cache_revoked(jti, expires_at)
+    return True
+
+
+def revoke(jti, exp):
+    """
+    Revoke a token by JTI. Returns False if it was already revoked, which
+    lets rotation reject a refresh token that is replayed concurrently.
+    """
+    from .models import RevokedToken
+    expires_at = datetime_from_epoch(exp)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    transaction.on_commit(lambda: _cache_revoked(jti, expires_at))
+    return True
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh token checked against, and revocable into, the JTI blacklist"""
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        if not revoke(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
@@ -1,8 +1,8 @@
 from django.urls import path
 from . import views
 from .admin_views import (
-    pending_products, verify_product, reject_product,
-    pending_reports, update_report_status
+    pending_products, verify_product, reject_product, bulk_verify_products, bulk_reject_products,
+    pending_reports, update_report_status, reported_products, close_product_reports, throttle_metrics
 )
 
 urlpatterns = [
@@ -25,6 +25,8 @@ urlpatterns = [
     path('<int:user_id>/rate/', views.UserRatingCreateView.as_view(), name='rate-user'),
     path('<int:user_id>/ratings/', views.UserRatingListView.as_view(), name='user-ratings'),
     path('ratings/<int:user_id>/', views.UserRatingListView.as_view(), name='user-ratings-alt'),
+    path('<int:user_id>/reputation/', views.user_reputation, name='user-reputation'),
+    path('reputations/', views.user_reputations, name='user-reputations'),
     
     # User search
     path('search/', views.UserSearchView.as_view(), name='user-search'),
@@ -47,6 +49,11 @@ urlpatterns = [
     path('admin/products/pending/', pending_products),
     path('admin/products/<int:product_id>/verify/', verify_product),
     path('admin/products/<int:product_id>/reject/', reject_product),
+    path('admin/products/bulk-verify/', bulk_verify_products),
+    path('admin/products/bulk-reject/', bulk_reject_products),
     path('admin/reports/pending/', pending_reports),
     path('admin/reports/<int:report_id>/update/', update_report_status),
+    path('admin/reports/by-product/', reported_products),
+    path('admin/reports/by-product/<int:product_id>/', close_product_reports),
+    path('admin/throttle-stats/', throttle_metrics, name='admin-throttle-stats'),
 ]
\ No newline at end of file
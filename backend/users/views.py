@@ -2,18 +2,20 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import authenticate
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
-from .models import User, UserRating, VerificationRequest
+from .models import SellerReputation, User, UserRating, VerificationRequest
+from .tokens import RevocableRefreshToken
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     UserUpdateSerializer, UserRatingSerializer, UserRatingListSerializer,
     SellerVerificationSerializer, ChangePasswordSerializer,
     VerificationRequestSerializer, VerificationRequestUpdateSerializer,
-    AdminDashboardStatsSerializer
+    AdminDashboardStatsSerializer, SellerReputationSerializer, public_profile
 )
 from products.serializers import ProductListSerializer
 from orders.serializers import OrderListSerializer
@@ -61,7 +63,7 @@ class UserRegistrationView(APIView):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = RevocableRefreshToken.for_user(user)
             
             # Special message for sellers who need verification
             message = 'User registered successfully'
@@ -84,10 +86,10 @@ class UserLoginView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
+            refresh = RevocableRefreshToken.for_user(user)
             
             response_data = {
                 'message': 'Login successful',
@@ -125,12 +127,15 @@ class UserProfileView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserDetailView(generics.RetrieveAPIView):
-    """Get user details by ID"""
-    queryset = User.objects.all()
-    serializer_class = UserProfileSerializer
+class UserDetailView(APIView):
+    """Get another user's public profile by ID"""
     permission_classes = [permissions.IsAuthenticated]
-    lookup_field = 'id'
+    
+    def get(self, request, id):
+        data = public_profile(id, request)
+        if data is None:
+            raise NotFound('User not found')
+        return Response(data)
 
 
 class ChangePasswordView(APIView):
@@ -248,34 +253,56 @@ class UserSearchView(generics.ListAPIView):
         query = self.request.query_params.get('q', '')
         user_type = self.request.query_params.get('user_type', '')
         
-        queryset = User.objects.filter(is_active=True)
-        
-        if query:
-            queryset = queryset.filter(
-                Q(username__icontains=query) |
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(email__icontains=query)
-            )
+        queryset = User.search(query, User.objects.filter(is_active=True))
         
         if user_type:
             queryset = queryset.filter(user_type=user_type)
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('search_rank', '-created_at')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def user_reputation(request, user_id):
+    """Reputation of one user"""
+    reputation = SellerReputation.objects.filter(user_id=user_id).first()
+    if reputation is None:
+        if not User.objects.filter(id=user_id).exists():
+            raise NotFound('User not found')
+        reputation = SellerReputation(user_id=user_id)
+    return Response(SellerReputationSerializer(reputation).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def user_reputations(request):
+    """Reputations for a comma-separated list of user ids (?ids=1,2,3), in one query"""
+    try:
+        user_ids = [int(user_id) for user_id in request.query_params.get('ids', '').split(',') if user_id]
+    except ValueError:
+        return Response({'error': 'ids must be comma-separated integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(user_ids) > 100:
+        return Response({'error': 'At most 100 ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    reputations = SellerReputation.for_users(user_ids)
+    return Response({
+        str(user_id): SellerReputationSerializer(reputation).data
+        for user_id, reputation in reputations.items()
+    })
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def logout_view(request):
-    """User logout"""
-    try:
-        refresh_token = request.data.get('refresh_token')
-        if refresh_token:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-        return Response({'message': 'Logout successful'})
-    except Exception:
-        return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
+    """User logout: revoke the refresh token so it can no longer be rotated"""
+    refresh_token = request.data.get('refresh_token') or request.data.get('refresh')
+    if refresh_token:
+        try:
+            RevocableRefreshToken(refresh_token).blacklist()
+        except TokenError:
+            # Already revoked or expired; logging out again is a no-op
+            pass
+    return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -482,6 +509,12 @@ def reject_user(request, user_id):
         )
 
 
+class AdminUserPagination(CursorPagination):
+    page_size = 50
+    # created_at alone is not unique; id keeps pages from skipping or repeating ties
+    ordering = ('-created_at', '-id')
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def users_list(request):
@@ -489,7 +522,11 @@ def users_list(request):
     user_type = request.query_params.get('type', None)
     verification_status = request.query_params.get('verification_status', None)
     
-    queryset = User.objects.exclude(user_type='admin').order_by('-created_at')
+    query = request.query_params.get('q', '')
+    
+    queryset = User.objects.exclude(user_type='admin')
+    if query:
+        queryset = User.search(query, queryset)
     
     if user_type:
         queryset = queryset.filter(user_type=user_type)
@@ -497,5 +534,7 @@ def users_list(request):
     if verification_status:
         queryset = queryset.filter(verification_status=verification_status)
     
-    users = queryset[:50]  # Limit to 50 users
-    return Response(UserProfileSerializer(users, many=True).data)
+    # Keyset pagination on (created_at, id): no COUNT(*) and no deep OFFSET scans
+    paginator = AdminUserPagination()
+    users = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(UserProfileSerializer(users, many=True).data)
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Box,
   Container,
@@ -37,6 +37,9 @@ import { CheckIcon, CloseIcon, ViewIcon } from '@chakra-ui/icons';
 import { apiService, Product } from '../services/api';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 
+// The backend's page size for the moderation queue
+const PENDING_PAGE_SIZE = 20;
+
 const AdminProductVerificationPage: React.FC = () => {
   const toast = useToast();
   const queryClient = useQueryClient();
@@ -44,12 +47,24 @@ const AdminProductVerificationPage: React.FC = () => {
   const [selectedProduct, setSelectedProduct] = useState<Product | null>(null);
   const [actionType, setActionType] = useState<'verify' | 'reject'>('verify');
   const [notes, setNotes] = useState('');
+  const [page, setPage] = useState(1);
 
-  // Fetch pending products
-  const { data: pendingProducts, isLoading } = useQuery({
-    queryKey: ['pendingProducts'],
-    queryFn: () => apiService.getPendingProducts(),
+  // Fetch a page of the moderation queue
+  const { data: pendingData, isLoading } = useQuery({
+    queryKey: ['pendingProducts', page],
+    queryFn: () => apiService.getPendingProducts(page),
+    placeholderData: (previousData) => previousData,
   });
+  const pendingProducts = pendingData?.results;
+  const pendingCount = pendingData?.count || 0;
+  const totalPages = Math.max(1, Math.ceil(pendingCount / PENDING_PAGE_SIZE));
+
+  // Clearing the last products on the last page leaves it empty; step back
+  useEffect(() => {
+    if (page > totalPages) {
+      setPage(totalPages);
+    }
+  }, [page, totalPages]);
 
   // Verify product mutation
   const verifyMutation = useMutation({
@@ -185,7 +200,7 @@ const AdminProductVerificationPage: React.FC = () => {
           <>
             <Flex align="center" mb={4}>
               <Text fontSize="lg" fontWeight="semibold">
-                {pendingProducts.length} product{pendingProducts.length !== 1 ? 's' : ''} pending verification
+                {pendingCount} product{pendingCount !== 1 ? 's' : ''} pending verification
               </Text>
             </Flex>
 
@@ -269,6 +284,30 @@ const AdminProductVerificationPage: React.FC = () => {
                 </Card>
               ))}
             </SimpleGrid>
+
+            {totalPages > 1 && (
+              <Flex justify="center" align="center" w="full">
+                <HStack spacing={4}>
+                  <Button
+                    variant="outline"
+                    onClick={() => setPage(page - 1)}
+                    isDisabled={!pendingData?.previous}
+                  >
+                    Previous
+                  </Button>
+                  <Text>
+                    Page {page} of {totalPages}
+                  </Text>
+                  <Button
+                    variant="outline"
+                    onClick={() => setPage(page + 1)}
+                    isDisabled={!pendingData?.next}
+                  >
+                    Next
+                  </Button>
+                </HStack>
+              </Flex>
+            )}
           </>
         )}
       </VStack>
@@ -8,6 +8,14 @@ export interface ApiResponse<T = any> {
   previous?: string;
 }
 
+export interface ProductFacets {
+  category: { id: number; name: string; count: number }[];
+  condition: { value: string; label: string; count: number }[];
+  price: { min: number | null; max: number | null; count: number }[];
+  city: { value: string; count: number }[];
+  country: { value: string; count: number }[];
+}
+
 export interface LoginResponse {
   access: string;
   refresh: string;
@@ -85,6 +93,7 @@ export interface Product {
   verification_notes?: string;
   rejection_reason?: string;
   created_at: string;
+  expires_at?: string | null;
   updated_at: string;
 }
 
@@ -113,6 +122,45 @@ export interface Offer {
   created_at: string;
 }
 
+export interface OfferInboxItem {
+  id: number;
+  title: string;
+  price: number;
+  status: string;
+  is_active: boolean;
+  main_image?: string | null;
+  pending_offers_count: number;
+  highest_offer?: number | null;
+  last_offer_at: string;
+}
+
+export interface SavedSearch {
+  id: number;
+  name: string;
+  query: string;
+  category?: number | null;
+  min_price?: number | null;
+  max_price?: number | null;
+  condition: string;
+  location: string;
+  alerts_enabled: boolean;
+  last_match_at?: string | null;
+  created_at: string;
+}
+
+export interface ReportedProduct {
+  product_id: number;
+  product_title: string;
+  product_status: string;
+  seller: string;
+  open_reports: number;
+  total_reports: number;
+  by_type: Record<string, number>;
+  last_reported_at: string | null;
+  escalated_at: string | null;
+  hidden_at: string | null;
+}
+
 export interface Conversation {
   id: number;
   product: number;
@@ -343,8 +391,12 @@ class ApiService {
               { refresh: refreshToken }
             );
 
-            const { access } = response.data;
+            const { access, refresh } = response.data;
             localStorage.setItem('access_token', access);
+            if (refresh) {
+              // Refresh tokens rotate; the one just used is now revoked
+              localStorage.setItem('refresh_token', refresh);
+            }
 
             originalRequest.headers.Authorization = `Bearer ${access}`;
             return this.api(originalRequest);
@@ -374,7 +426,9 @@ class ApiService {
   }
 
   async logout(): Promise<void> {
-    await this.api.post('/auth/logout/');
+    await this.api.post('/auth/logout/', {
+      refresh_token: localStorage.getItem('refresh_token'),
+    });
   }
 
   async getProfile(): Promise<User> {
@@ -436,6 +490,11 @@ class ApiService {
     return response.data;
   }
 
+  async getProductsWithFacets(params?: any): Promise<ApiResponse<Product> & { facets: ProductFacets }> {
+    const response = await this.api.get('/products/', { params: { ...params, facets: 1 } });
+    return response.data;
+  }
+
   async getProduct(productId: number): Promise<Product> {
     const response = await this.api.get(`/products/${productId}/`);
     return response.data;
@@ -457,6 +516,16 @@ class ApiService {
     await this.api.delete(`/products/${productId}/`);
   }
 
+  async renewProduct(productId: number): Promise<{ status: string; expires_at: string }> {
+    const response = await this.api.post(`/products/${productId}/renew/`);
+    return response.data;
+  }
+
+  async renewProducts(productIds: number[]): Promise<number[]> {
+    const response = await this.api.post('/products/renew/', { product_ids: productIds });
+    return response.data.renewed;
+  }
+
   async getUserProducts(params?: any): Promise<ApiResponse<Product>> {
     const response = await this.api.get('/products/my-products/', { params });
     return response.data;
@@ -467,13 +536,33 @@ class ApiService {
     return response.data;
   }
 
+  async getSearchSuggestions(q: string, limit = 8): Promise<{ text: string; kind: 'title' | 'brand' | 'model' | 'category'; product_count: number }[]> {
+    const response = await this.api.get('/products/suggest/', { params: { q, limit } });
+    return response.data.suggestions;
+  }
+
+  async getNearbyProducts(params: { lat: number; lng: number; radius_km?: number; k?: number }): Promise<{ results: (Product & { distance_km: number })[]; count: number }> {
+    const response = await this.api.get('/products/nearby/', { params });
+    return response.data;
+  }
+
   async getFeaturedProducts(): Promise<ApiResponse<Product>> {
     const response = await this.api.get('/products/featured/');
     return response.data;
   }
 
-  async getPopularProducts(): Promise<ApiResponse<Product>> {
-    const response = await this.api.get('/products/popular/');
+  async getPopularProducts(params?: { category?: number; limit?: number }): Promise<ApiResponse<Product>> {
+    const response = await this.api.get('/products/popular/', { params });
+    return response.data;
+  }
+
+  async getSimilarProducts(productId: number, limit?: number): Promise<Product[]> {
+    const response = await this.api.get(`/products/${productId}/similar/`, { params: { limit } });
+    return response.data;
+  }
+
+  async getTrendingProducts(params?: { category?: number; limit?: number }): Promise<Product[]> {
+    const response = await this.api.get('/products/trending/', { params });
     return response.data;
   }
 
@@ -528,6 +617,13 @@ class ApiService {
     return response.data.results || response.data;
   }
 
+  async getReceivedOffersInbox(params?: { page?: number; pending?: boolean }): Promise<{ count: number; next: string | null; results: OfferInboxItem[] }> {
+    const response = await this.api.get('/products/offers/received/by-product/', {
+      params: { page: params?.page, pending: params?.pending ? 1 : undefined },
+    });
+    return response.data;
+  }
+
   async getOffer(offerId: number): Promise<Offer> {
     const response = await this.api.get(`/products/offers/${offerId}/`);
     return response.data;
@@ -565,6 +661,41 @@ class ApiService {
     await this.api.post(`/products/${productId}/toggle-favorite/`);
   }
 
+  async getFavoriteIds(): Promise<number[]> {
+    const response = await this.api.get('/products/favorites/ids/');
+    return response.data.product_ids;
+  }
+
+  async addFavorites(productIds: number[]): Promise<number[]> {
+    const response = await this.api.post('/products/favorites/bulk-add/', { product_ids: productIds });
+    return response.data.added;
+  }
+
+  async removeFavorites(productIds: number[]): Promise<number[]> {
+    const response = await this.api.post('/products/favorites/bulk-remove/', { product_ids: productIds });
+    return response.data.removed;
+  }
+
+  // Saved search endpoints
+  async getSavedSearches(): Promise<SavedSearch[]> {
+    const response = await this.api.get('/products/saved-searches/');
+    return response.data.results || response.data;
+  }
+
+  async createSavedSearch(search: Partial<SavedSearch>): Promise<SavedSearch> {
+    const response = await this.api.post('/products/saved-searches/', search);
+    return response.data;
+  }
+
+  async updateSavedSearch(searchId: number, changes: Partial<SavedSearch>): Promise<SavedSearch> {
+    const response = await this.api.patch(`/products/saved-searches/${searchId}/`, changes);
+    return response.data;
+  }
+
+  async deleteSavedSearch(searchId: number): Promise<void> {
+    await this.api.delete(`/products/saved-searches/${searchId}/`);
+  }
+
   // Chat endpoints
   async getConversations(): Promise<Conversation[]> {
     const response = await this.api.get('/chat/conversations/');
@@ -775,9 +906,14 @@ class ApiService {
     return response.data.results;
   }
 
-  async getAdminUsersList(params?: { type?: string; verification_status?: string }): Promise<User[]> {
+  // Cursor-paginated: pass the returned next_cursor as `cursor` to load the following page
+  async getAdminUsersList(params?: { type?: string; verification_status?: string; q?: string; cursor?: string }): Promise<{ results: User[]; next_cursor: string | null }> {
     const response = await this.api.get('/users/admin/users/', { params });
-    return response.data;
+    const next = response.data.next;
+    return {
+      results: response.data.results,
+      next_cursor: next ? new URL(next).searchParams.get('cursor') : null,
+    };
   }
 
   async approveUser(userId: number): Promise<{ message: string; user: User }> {
@@ -844,8 +980,8 @@ class ApiService {
   }
 
   // Product verification methods (Admin)
-  async getPendingProducts(): Promise<Product[]> {
-    const response = await this.api.get('/users/admin/products/pending/');
+  async getPendingProducts(page?: number): Promise<ApiResponse<Product>> {
+    const response = await this.api.get('/users/admin/products/pending/', { params: { page } });
     return response.data;
   }
 
@@ -859,6 +995,16 @@ class ApiService {
     return response.data;
   }
 
+  async verifyProducts(productIds: number[], notes?: string): Promise<number[]> {
+    const response = await this.api.post('/users/admin/products/bulk-verify/', { product_ids: productIds, notes });
+    return response.data.verified;
+  }
+
+  async rejectProducts(productIds: number[], reason: string): Promise<number[]> {
+    const response = await this.api.post('/users/admin/products/bulk-reject/', { product_ids: productIds, reason });
+    return response.data.rejected;
+  }
+
   // Product reporting methods
   async reportProduct(productId: number, reportData: { report_type: string; description: string }): Promise<{ message: string; report_id: number }> {
     const response = await this.api.post(`/products/products/${productId}/report/`, reportData);
@@ -880,6 +1026,16 @@ class ApiService {
     const response = await this.api.post(`/users/admin/reports/${reportId}/update/`, { action, notes });
     return response.data;
   }
+
+  async getReportedProducts(page?: number): Promise<ApiResponse<ReportedProduct>> {
+    const response = await this.api.get('/users/admin/reports/by-product/', { params: { page } });
+    return response.data;
+  }
+
+  async closeProductReports(productId: number, action: 'review' | 'resolve' | 'dismiss', notes?: string): Promise<{ message: string; closed: number }> {
+    const response = await this.api.post(`/users/admin/reports/by-product/${productId}/`, { action, notes });
+    return response.data;
+  }
 }
 
 export const apiService = new ApiService();
\ No newline at end of file